@@ -0,0 +1 @@
+"""ConvertIO Client benchmarks, run against `convertio.testing.FakeConvertIO`"""
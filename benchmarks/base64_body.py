@@ -0,0 +1,75 @@
+"""
+    Buffered vs incremental base64 request body for input = base64
+
+    Each mode runs in its own process, so peak RSS isn't shared between them.
+
+    Usage:
+        python -m benchmarks.base64_body [size_mb]
+"""
+import base64
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from convertio import client
+from convertio.models import parameters
+
+
+class DiscardTransport(httpx.BaseTransport):
+    """Consumes request bodies as a server would, without keeping them"""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for _ in request.stream:
+            pass
+        return httpx.Response(200, json={"code": 200, "status": "ok",
+                                         "data": {"id": "bench", "minutes": 10}})
+
+
+def payload(mode: str, path: pathlib.Path) -> parameters.NewConversionParameters:
+    """Conversion payload, the file is encoded up front in buffered mode"""
+    file = path if mode == 'streaming' else base64.b64encode(path.read_bytes()).decode()
+    return parameters.NewConversionParameters(
+        file=file,
+        filename=path.name,
+        outputformat="pdf",
+        input="base64"
+    )
+
+
+def run(mode: str, path: pathlib.Path) -> None:
+    """Send one conversion and print throughput and peak RSS"""
+    size = path.stat().st_size
+    with client.ConvertIO(api_key="bench", transport=DiscardTransport()) as convertio:
+        started = time.perf_counter()
+        convertio.new_conversion(payload=payload(mode, path))
+        elapsed = time.perf_counter() - started
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("%-10s %8.1f MB/s  peak RSS %8.1f MB" % (mode, size / elapsed / 2 ** 20, peak_rss))
+
+
+def main(size_mb: int = 100):
+    """Run both modes on a {size_mb} MB file"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory, "input.bin")
+        with open(path, "wb") as file:
+            # Written in chunks, children inherit the parent peak RSS on Linux
+            for _ in range(size_mb):
+                file.write(os.urandom(2 ** 20))
+        for mode in ('buffered', 'streaming'):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.base64_body", "--mode", mode, str(path)],
+                check=True
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--mode"]:
+        run(sys.argv[2], pathlib.Path(sys.argv[3]))
+    else:
+        main(*map(int, sys.argv[1:]))
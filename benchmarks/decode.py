@@ -0,0 +1,58 @@
+"""
+    Validated vs fast decoding of large `list_conversions` payloads
+
+    Usage:
+        python -m benchmarks.decode [rows] [repeat]
+"""
+import json
+import sys
+import time
+
+from convertio import decode
+from convertio.models import responses
+
+
+def payload(rows: int) -> bytes:
+    """ListConversionResponse body with {rows} conversions"""
+    return json.dumps({
+        "code": 200,
+        "status": "ok",
+        "data": [{
+            "id": "%032x" % index,
+            "status": "finished",
+            "minutes": 1,
+            "inputformat": "PNG",
+            "outputformat": "PDF",
+            "filename": "file-%s.png" % index
+        } for index in range(rows)]
+    }).encode()
+
+
+def validated(content: bytes, repeat: int) -> float:
+    """Seconds per decode through `json` and pydantic validation (default path)"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        responses.ListConversionResponse(**json.loads(content))
+    return (time.perf_counter() - started) / repeat
+
+
+def fast(content: bytes, repeat: int) -> float:
+    """Seconds per decode through `decode.parse`"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        decode.parse(responses.ListConversionResponse, content)
+    return (time.perf_counter() - started) / repeat
+
+
+def main(rows: int = 10000, repeat: int = 20):
+    """Run benchmark"""
+    content = payload(rows)
+    before = validated(content, repeat)
+    after = fast(content, repeat)
+    print("%s rows, %.1f MB, orjson: %s" % (rows, len(content) / 1e6, decode.orjson is not None))
+    print("validated: %8.1f ms" % (before * 1000))
+    print("fast:      %8.1f ms (x%.1f)" % (after * 1000, before / after))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,78 @@
+"""
+    Thread vs process pool decoding of large `get_result_file` results
+
+    {concurrency} threads each parse and decode a {size_mb} MB result at once,
+    on their own thread (default) and through `ProcessOffload`. A ticker
+    thread measures how long other threads are stalled meanwhile.
+
+    Usage:
+        python -m benchmarks.offload [size_mb] [concurrency] [workers]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import json
+import os
+import sys
+import threading
+import time
+
+from convertio.models import responses
+from convertio.offload import ProcessOffload
+
+
+def payload(size_mb: int) -> bytes:
+    """GetResultResponse body with {size_mb} MB of content"""
+    content = base64.b64encode(os.urandom(size_mb * 2 ** 20)).decode()
+    return json.dumps({
+        "code": 200,
+        "status": "ok",
+        "data": {"id": "bench", "encode": "base64", "content": content}
+    }).encode()
+
+
+def max_stall(stop: threading.Event, stalls: list, interval: float = 0.001) -> None:
+    """Longest gap between {interval} sleeps until {stop}, appended to {stalls}"""
+    longest = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        time.sleep(interval)
+        longest = max(longest, time.perf_counter() - started - interval)
+    stalls.append(longest)
+
+
+def run(parse, body: bytes, concurrency: int):
+    """Seconds to parse {concurrency} results at once, and longest stall of another thread"""
+    stop, stalls = threading.Event(), []
+    ticker = threading.Thread(target=max_stall, args=(stop, stalls))
+    ticker.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for result in executor.map(lambda _: parse(body), range(concurrency)):
+            del result
+    elapsed = time.perf_counter() - started
+    stop.set()
+    ticker.join()
+    return elapsed, stalls[0]
+
+
+def main(size_mb: int = 200, concurrency: int = 8, workers: int = 0):
+    """Run benchmark"""
+    body = payload(size_mb)
+    total = size_mb * concurrency
+    print("%s x %s MB results, %s CPUs" % (concurrency, size_mb, os.cpu_count()))
+    variants = [("threads", lambda content: responses.GetResultResponse(**json.loads(content)))]
+    offload = ProcessOffload(workers or None)
+    variants.append(("processes", offload.parse_result))
+    # Start the workers before timing
+    offload.b64decode(b"A" * offload.threshold)
+    try:
+        for name, parse in variants:
+            elapsed, stall = run(parse, body, concurrency)
+            print("%-10s %8.2f s %8.1f MB/s  longest stall %8.1f ms"
+                  % (name, elapsed, total / elapsed, stall * 1000))
+    finally:
+        offload.close()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
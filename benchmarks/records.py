@@ -0,0 +1,53 @@
+"""
+    Memory per row of listed conversions: pydantic models vs compact containers
+
+    Usage:
+        python -m benchmarks.records [rows]
+"""
+import sys
+import time
+import tracemalloc
+
+from convertio import decode
+from convertio.models import responses
+from convertio.records import ConversionTable
+
+from .decode import payload
+
+
+def measure(build) -> int:
+    """Bytes held by what {build} returns"""
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main(rows: int = 50000):
+    """Run benchmark"""
+    content = payload(rows)
+    rows_data = decode.loads(content)['data']
+    for index, row in enumerate(rows_data):
+        row['status'] = ('finished', 'converting', 'failed')[index % 3]
+        row['outputformat'] = ('PDF', 'DOCX', 'JPG', 'PNG')[index % 4]
+    table = ConversionTable(rows_data)
+    results = {
+        "ListConversionResponse": measure(
+            lambda: responses.ListConversionResponse(code=200, status='ok', data=rows_data)
+        ),
+        "ConversionRecord list": measure(lambda: list(table.records())),
+        "ConversionTable": measure(lambda: ConversionTable(rows_data)),
+    }
+    # Strings shared with the decoded payload (ids, filenames) aren't counted
+    print("%s rows" % rows)
+    for name, size in results.items():
+        print("%-24s %6.0f bytes/row" % (name, size / rows))
+    started = time.perf_counter()
+    matched = len(table.filter(status='finished', outputformat=['PDF', 'DOCX']))
+    print("filter: %s rows in %.1f ms" % (matched, (time.perf_counter() - started) * 1000))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,50 @@
+"""
+    Pooled session vs per-call `httpx.request`
+
+    Usage:
+        python -m benchmarks.session [calls]
+"""
+from urllib.parse import urljoin
+import sys
+import time
+
+import httpx
+
+from convertio import client
+from convertio.models import parameters
+from convertio.testing import FakeConvertIO
+
+
+def per_call(base_url: str, conversion_id: str, calls: int) -> float:
+    """Calls per second with a fresh connection per call (previous behaviour)"""
+    url = urljoin(base_url, client.GET_STATUS_ENDPOINT % conversion_id)
+    started = time.perf_counter()
+    for _ in range(calls):
+        httpx.request(method='GET', url=url, timeout=client.REQUEST_TIMEOUT)
+    return calls / (time.perf_counter() - started)
+
+
+def pooled(convertio_client: client.ConvertIO, conversion_id: str, calls: int) -> float:
+    """Calls per second through the client connection pool"""
+    payload = parameters.GetStatusParameters(id=conversion_id)
+    started = time.perf_counter()
+    for _ in range(calls):
+        convertio_client.get_conversion_status(payload=payload)
+    return calls / (time.perf_counter() - started)
+
+
+def main(calls: int = 500):
+    """Run benchmark"""
+    fake = FakeConvertIO()
+    with fake.serve() as base_url, client.ConvertIO(api_key="bench", base_url=base_url) as convertio:
+        conversion_id = convertio.new_conversion(
+            payload=parameters.NewConversionParameters(file="http://file/a.png", outputformat="pdf")
+        ).data.id
+        before = per_call(base_url, conversion_id, calls)
+        after = pooled(convertio, conversion_id, calls)
+    print("per-call httpx.request: %8.1f calls/s" % before)
+    print("pooled ConvertIO:       %8.1f calls/s (x%.1f)" % (after, after / before))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
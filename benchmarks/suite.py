@@ -0,0 +1,244 @@
+"""
+    Scenario benchmarks against `FakeConvertIO` served on a local socket
+
+    Every scenario runs in its own process, so peak RSS isn't shared between
+    them, and reports a JSON object per variant:
+
+        {"scenario": "single_call", "variant": "get_conversion_status",
+         "operations": 500, "seconds": 0.61, "throughput": 820.3, "unit": "calls/s",
+         "latency_ms": {"p50": 1.1, "p90": 1.4, "p99": 2.3, "max": 5.2},
+         "peak_rss_mb": 48.2}
+
+    Usage:
+        python -m benchmarks.suite [--scenario NAME]... [--latency SECONDS]
+                                   [--scale FACTOR] [--output FILE]
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from convertio import client
+from convertio.models import parameters
+from convertio.poller import StatusPoller
+from convertio.testing import FakeConvertIO
+
+
+URL_PAYLOAD = parameters.NewConversionParameters(file="http://file/a.png", outputformat="pdf")
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max of {latencies} in milliseconds"""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {"p50": at(0.5), "p90": at(0.9), "p99": at(0.99), "max": round(ordered[-1] * 1000, 3)}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def report( # pylint: disable=too-many-arguments
+    scenario: str,
+    variant: str,
+    operations: int,
+    seconds: float,
+    unit: str,
+    latencies: Optional[List[float]] = None,
+    **extra
+) -> dict:
+    """Result of a variant, in the machine-readable format"""
+    return {
+        "scenario": scenario,
+        "variant": variant,
+        "operations": operations,
+        "seconds": round(seconds, 4),
+        "throughput": round(operations / seconds, 2) if seconds else None,
+        "unit": unit,
+        "latency_ms": percentiles(latencies or []),
+        "peak_rss_mb": peak_rss_mb(),
+        **extra
+    }
+
+
+def timed(calls: int, call: Callable[[], object]) -> List[float]:
+    """Latency of {calls} sequential calls"""
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def single_call(options: argparse.Namespace) -> List[dict]:
+    """Per-request overhead of each endpoint through the pooled client"""
+    calls = int(500 * options.scale)
+    fake = FakeConvertIO(minutes=calls * 4, latency=options.latency)
+    results = []
+    with fake.serve() as base_url, client.ConvertIO(api_key="bench", base_url=base_url) as convertio:
+        conversion_id = convertio.new_conversion(payload=URL_PAYLOAD).data.id
+        variants = {
+            "new_conversion": lambda: convertio.new_conversion(payload=URL_PAYLOAD),
+            "get_conversion_status": lambda: convertio.get_conversion_status(
+                payload=parameters.GetStatusParameters(id=conversion_id)
+            ),
+            "get_result_file": lambda: convertio.get_result_file(
+                payload=parameters.GetResultParameters(id=conversion_id)
+            ),
+            "list_conversions": lambda: convertio.list_conversions(
+                parameters.ListConversionParameters(count=1)
+            ),
+        }
+        for variant, call in variants.items():
+            latencies = timed(calls, call)
+            results.append(report("single_call", variant, calls, sum(latencies), "calls/s",
+                                  latencies))
+    return results
+
+
+def polling_fleet(options: argparse.Namespace) -> List[dict]:
+    """Many concurrent conversions tracked by one StatusPoller"""
+    conversions = int(200 * options.scale)
+    fake = FakeConvertIO(minutes=conversions, convert_time=1.0, latency=options.latency)
+    with fake.serve() as base_url, client.ConvertIO(api_key="bench", base_url=base_url) as convertio:
+        started = time.perf_counter()
+        with StatusPoller(convertio, max_interval=1.0) as poller:
+            watched = []
+            for _ in range(conversions):
+                conversion_id = convertio.new_conversion(payload=URL_PAYLOAD).data.id
+                watched.append((time.perf_counter(), poller.watch(conversion_id)))
+            latencies = []
+            for watched_at, future in watched:
+                future.result()
+                latencies.append(time.perf_counter() - watched_at)
+            metrics = poller.metrics()
+        seconds = time.perf_counter() - started
+    return [report("polling_fleet", "status_poller", conversions, seconds, "conversions/s",
+                   latencies, requests=metrics.requests,
+                   requests_per_conversion=round(metrics.requests_per_conversion, 2))]
+
+
+def large_download(options: argparse.Namespace) -> List[dict]:
+    """Large result fetched as base64 JSON vs streamed from the output URL"""
+    size = int(32 * 1024 * 1024 * options.scale)
+    fake = FakeConvertIO(result_size=size, latency=options.latency)
+    results = []
+    with fake.serve() as base_url, client.ConvertIO(api_key="bench", base_url=base_url) as convertio:
+        conversion_id = convertio.new_conversion(payload=URL_PAYLOAD).data.id
+        variants = {
+            "get_result_file": lambda: convertio.get_result_file(
+                payload=parameters.GetResultParameters(id=conversion_id)
+            ),
+            "download_result_file": lambda: convertio.download_result_file(
+                parameters.GetResultParameters(id=conversion_id), os.devnull
+            ),
+        }
+        for variant in options.variants or variants:
+            latencies = timed(3, variants[variant])
+            results.append(report("large_download", variant, 3, sum(latencies), "downloads/s",
+                                  latencies, size=size,
+                                  mb_per_s=round(3 * size / 1e6 / sum(latencies), 1)))
+    return results
+
+
+def list_parsing(options: argparse.Namespace) -> List[dict]:
+    """Decoding a large list_conversions response: validated, fast and compact"""
+    rows = int(10000 * options.scale)
+    fake = FakeConvertIO(latency=options.latency)
+    fake.seed(rows)
+    listing = parameters.ListConversionParameters(count=rows)
+    results = []
+    with fake.serve() as base_url:
+        for variant, kwargs, list_kwargs in (
+            ("validated", {}, {}),
+            ("fast_decode", {"fast_decode": True}, {}),
+            ("compact", {}, {"compact": True}),
+        ):
+            if options.variants and variant not in options.variants:
+                continue
+            with client.ConvertIO(api_key="bench", base_url=base_url, **kwargs) as convertio:
+                latencies = timed(5, lambda: convertio.list_conversions(listing, **list_kwargs))
+            results.append(report("list_parsing", variant, 5 * rows, sum(latencies), "rows/s",
+                                  latencies))
+    return results
+
+
+SCENARIOS = {
+    "single_call": single_call,
+    "polling_fleet": polling_fleet,
+    "large_download": large_download,
+    "list_parsing": list_parsing,
+}
+
+# Variants whose memory use would hide the others', run in their own process
+ISOLATED_VARIANTS = {
+    "large_download": ["get_result_file", "download_result_file"],
+    "list_parsing": ["validated", "fast_decode", "compact"],
+}
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Command line options"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run, all by default")
+    parser.add_argument("--variant", action="append", dest="variants",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds the fake API adds to every response")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplier of calls, conversions and payload sizes")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_isolated(scenario: str, variant: Optional[str], options: argparse.Namespace) -> List[dict]:
+    """Results of {scenario} run in a child process"""
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        command = [
+            sys.executable, "-m", "benchmarks.suite", "--in-process",
+            "--scenario", scenario, "--latency", str(options.latency),
+            "--scale", str(options.scale), "--output", output.name
+        ]
+        if variant is not None:
+            command += ["--variant", variant]
+        subprocess.run(command, check=True)
+        with open(output.name, encoding="utf-8") as file:
+            return json.load(file)
+
+
+def main(argv: Optional[List[str]] = None) -> List[dict]:
+    """Run benchmarks, print and return their results"""
+    options = parse_args(sys.argv[1:] if argv is None else argv)
+    results = []
+    for scenario in options.scenario or SCENARIOS:
+        if options.in_process:
+            results += SCENARIOS[scenario](options)
+        else:
+            for variant in ISOLATED_VARIANTS.get(scenario, [None]):
+                results += run_isolated(scenario, variant, options)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if not options.in_process:
+        for result in results:
+            print(json.dumps(result))
+    return results
+
+
+if __name__ == "__main__":
+    main()
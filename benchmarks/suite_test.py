@@ -0,0 +1,36 @@
+"""Benchmark suite smoke tests"""
+import json
+import os
+import tempfile
+import unittest
+
+from . import suite
+
+
+class TestSuite(unittest.TestCase):
+    """Test the benchmark scenarios run and report results"""
+
+    def test_scenarios_in_process(self):
+        """test every scenario reports throughput, percentiles and peak memory"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            results = suite.main(["--in-process", "--scale", "0.01", "--output", output])
+            with open(output, encoding="utf-8") as file:
+                self.assertEqual(json.load(file), results)
+
+        self.assertEqual({result["scenario"] for result in results}, set(suite.SCENARIOS))
+        for result in results:
+            self.assertGreater(result["throughput"], 0)
+            self.assertEqual(set(result["latency_ms"]), {"p50", "p90", "p99", "max"})
+            self.assertGreater(result["peak_rss_mb"], 0)
+
+    def test_percentiles(self):
+        """test percentiles are in milliseconds"""
+        self.assertEqual(
+            suite.percentiles([i / 1000 for i in range(1, 101)]),
+            {"p50": 51.0, "p90": 91.0, "p99": 100.0, "max": 100.0}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
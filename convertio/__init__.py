@@ -0,0 +1,34 @@
+"""
+    Convertio APIs Client Library
+
+    Names are imported on first access, `import convertio` alone loads nothing:
+
+        from convertio import ConvertIO, parameters
+"""
+import importlib
+
+# Public name -> (module, attribute), the module itself if attribute is None
+_EXPORTS = {
+    'ConvertIO': ('convertio.client', 'ConvertIO'),
+    'AsyncConvertIO': ('convertio.client', 'AsyncConvertIO'),
+    'ConvertIOPool': ('convertio.pool', 'ConvertIOPool'),
+    'AsyncConvertIOPool': ('convertio.pool', 'AsyncConvertIOPool'),
+    'parameters': ('convertio.models.parameters', None),
+    'responses': ('convertio.models.responses', None),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    module_name, attribute = _EXPORTS[name]
+    module = importlib.import_module(module_name)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,6 @@
+"""python -m convertio"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+    Bulk Conversions
+    Run the whole conversion lifecycle for many files, or delete many
+    conversions, with bounded concurrency.
+"""
+# pylint: disable=too-few-public-methods
+from typing import (
+    TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Optional,
+    TypeVar, Union
+)
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+
+import pydantic
+
+from .models import parameters, responses
+
+if TYPE_CHECKING:
+    from .client import AsyncConvertIO, ConvertIO
+
+
+# Number of conversions running at once
+CONCURRENCY = 8
+
+Item = TypeVar('Item')
+Result = TypeVar('Result')
+
+
+class ConversionResult(pydantic.BaseModel):
+    """ Result of a single conversion in a batch
+
+    Args:
+        index (int): Position of the payload in the input iterable
+        payload (NewConversionParameters): Conversion parameters
+        response (Optional[GetResultResponse|ErrorResponse]): Result file or API error
+        exception (Optional[Exception]): Exception raised while converting, if any
+    """
+    index: int
+    payload: parameters.NewConversionParameters
+    response: Optional[Union[responses.GetResultResponse, responses.ErrorResponse]]
+    exception: Optional[Exception]
+
+    class Config:
+        """Config"""
+        arbitrary_types_allowed = True
+        smart_union = True
+
+    @property
+    def ok(self) -> bool:
+        """Whether the conversion succeeded"""
+        return isinstance(self.response, responses.GetResultResponse)
+
+
+class DeleteReport(pydantic.BaseModel):
+    """ Outcome of deleting many conversions
+
+    Args:
+        deleted (Dict[str, DeleteCancelResponse]): Responses of the deleted or cancelled
+                                                   conversions, by ID
+        errors (Dict[str, ErrorResponse]): API errors by ID, code 404 if already gone
+        exceptions (Dict[str, Exception]): Exceptions raised while deleting, by ID
+    """
+    deleted: Dict[str, responses.DeleteCancelResponse] = {}
+    errors: Dict[str, responses.ErrorResponse] = {}
+    exceptions: Dict[str, Exception] = {}
+
+    class Config:
+        """Config"""
+        arbitrary_types_allowed = True
+
+    @property
+    def ok(self) -> bool:
+        """Whether every conversion was deleted"""
+        return not self.errors and not self.exceptions
+
+    def __len__(self) -> int:
+        return len(self.deleted) + len(self.errors) + len(self.exceptions)
+
+    def add(
+        self,
+        conversion_id: str,
+        result: Union[responses.DeleteCancelResponse, responses.ErrorResponse, Exception]
+    ) -> None:
+        """Record the outcome of deleting a conversion"""
+        if isinstance(result, responses.DeleteCancelResponse):
+            self.deleted[conversion_id] = result
+        elif isinstance(result, responses.ErrorResponse):
+            self.errors[conversion_id] = result
+        else:
+            self.exceptions[conversion_id] = result
+
+
+def _completed(
+    function: Callable[[Item], Result],
+    items: Iterable[Item],
+    concurrency: int
+) -> Iterator[Result]:
+    """ Results of {function} over {items} in a pool of {concurrency} threads, as they complete
+
+    On KeyboardInterrupt, queued calls are cancelled and running ones are not waited for.
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = set()
+    interrupted = False
+    try:
+        for item in items:
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(function, item))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    except KeyboardInterrupt:
+        interrupted = True
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=not interrupted)
+
+
+async def _acompleted(
+    function: Callable[[Item], Awaitable[Result]],
+    items: Iterable[Item],
+    concurrency: int
+) -> AsyncIterator[Result]:
+    """Results of {function} over {items}, {concurrency} at once, as they complete"""
+    pending = set()
+    try:
+        for item in items:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(function(item)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _convert(
+    convertio_client: "ConvertIO",
+    index: int,
+    payload: parameters.NewConversionParameters,
+    kwargs: dict
+) -> ConversionResult:
+    try:
+        response = convertio_client.convert(payload=payload, **kwargs)
+    except Exception as exception: # pylint: disable=broad-except
+        return ConversionResult(index=index, payload=payload, exception=exception)
+    return ConversionResult(index=index, payload=payload, response=response)
+
+
+async def _aconvert(
+    convertio_client: "AsyncConvertIO",
+    index: int,
+    payload: parameters.NewConversionParameters,
+    kwargs: dict
+) -> ConversionResult:
+    try:
+        response = await convertio_client.convert(payload=payload, **kwargs)
+    except Exception as exception: # pylint: disable=broad-except
+        return ConversionResult(index=index, payload=payload, exception=exception)
+    return ConversionResult(index=index, payload=payload, response=response)
+
+
+def convert_many(
+    convertio_client: "ConvertIO",
+    payloads: Iterable[parameters.NewConversionParameters],
+    concurrency: int = CONCURRENCY,
+    **kwargs
+) -> Iterator[ConversionResult]:
+    """ Convert many files in a thread pool
+
+    Payloads are consumed lazily, so at most {concurrency} conversions are queued
+    or running at any time. Results are yielded as they complete.
+
+    Args:
+        convertio_client (ConvertIO): Client used for every conversion
+        payloads (Iterable[NewConversionParameters]): Conversions to run
+        concurrency (int): Maximum number of conversions running at once
+        kwargs: Passed to `ConvertIO.convert`
+    """
+    return _completed(
+        lambda item: _convert(convertio_client, item[0], item[1], kwargs),
+        enumerate(payloads),
+        concurrency
+    )
+
+
+def aconvert_many(
+    convertio_client: "AsyncConvertIO",
+    payloads: Iterable[parameters.NewConversionParameters],
+    concurrency: int = CONCURRENCY,
+    **kwargs
+) -> AsyncIterator[ConversionResult]:
+    """ Convert many files on the running event loop
+
+    Async counterpart of `convert_many`, at most {concurrency} conversions
+    are in flight at any time. Results are yielded as they complete.
+    """
+    return _acompleted(
+        lambda item: _aconvert(convertio_client, item[0], item[1], kwargs),
+        enumerate(payloads),
+        concurrency
+    )
+
+
+def _delete(
+    convertio_client: "ConvertIO",
+    conversion_id: str
+) -> Union[responses.DeleteCancelResponse, responses.ErrorResponse, Exception]:
+    try:
+        return convertio_client.delete_or_cancel_conversion(
+            parameters.DeleteCancelParameters(id=conversion_id)
+        )
+    except Exception as exception: # pylint: disable=broad-except
+        return exception
+
+
+async def _adelete(
+    convertio_client: "AsyncConvertIO",
+    conversion_id: str
+) -> Union[responses.DeleteCancelResponse, responses.ErrorResponse, Exception]:
+    try:
+        return await convertio_client.delete_or_cancel_conversion(
+            parameters.DeleteCancelParameters(id=conversion_id)
+        )
+    except Exception as exception: # pylint: disable=broad-except
+        return exception
+
+
+def delete_many(
+    convertio_client: "ConvertIO",
+    conversion_ids: Iterable[str],
+    concurrency: int = CONCURRENCY
+) -> DeleteReport:
+    """ Delete or cancel many conversions in a thread pool
+
+    IDs are consumed lazily, at most {concurrency} requests are in flight.
+    Failures are recorded in the report and never stop the batch.
+
+    Args:
+        convertio_client (ConvertIO): Client used for every request
+        conversion_ids (Iterable[str]): Conversions to delete
+        concurrency (int): Maximum number of requests in flight
+    """
+    report = DeleteReport()
+    for conversion_id, result in _completed(
+        lambda conversion_id: (conversion_id, _delete(convertio_client, conversion_id)),
+        conversion_ids,
+        concurrency
+    ):
+        report.add(conversion_id, result)
+    return report
+
+
+async def adelete_many(
+    convertio_client: "AsyncConvertIO",
+    conversion_ids: Iterable[str],
+    concurrency: int = CONCURRENCY
+) -> DeleteReport:
+    """ Delete or cancel many conversions on the running event loop
+
+    Async counterpart of `delete_many`.
+    """
+    async def delete(conversion_id: str):
+        return conversion_id, await _adelete(convertio_client, conversion_id)
+
+    report = DeleteReport()
+    async for conversion_id, result in _acompleted(delete, conversion_ids, concurrency):
+        report.add(conversion_id, result)
+    return report
@@ -0,0 +1,154 @@
+"""Bulk Conversions tests"""
+import asyncio
+import unittest
+from unittest import mock
+import time
+
+import httpx
+
+from . import client
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+def make_payloads(count: int):
+    """Conversion payloads for {count} files"""
+    return (
+        parameters.NewConversionParameters(file="http://file_url/%s.png" % index,
+                                           outputformat="pdf")
+        for index in range(count)
+    )
+
+
+class TestConvertMany(unittest.TestCase):
+    """Test ConvertIO.convert_many"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO(minutes=20000)
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport())
+
+    def tearDown(self) -> None:
+        self.convertio_client.close()
+
+    def test_convert_many_throughput(self):
+        """test a 10k files batch against the fake API"""
+        count = 10000
+
+        results = list(self.convertio_client.convert_many(make_payloads(count), concurrency=16))
+
+        self.assertEqual(len(results), count)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(sorted(result.index for result in results), list(range(count)))
+        self.assertEqual(len(self.fake.requests), 3 * count)
+
+    def test_convert_many_reports_errors(self):
+        """test failed items don't fail the batch"""
+        self.fake.minutes = 3
+
+        results = list(self.convertio_client.convert_many(make_payloads(5), poll_interval=0))
+
+        self.assertEqual(sum(result.ok for result in results), 3)
+        errors = [result.response for result in results if not result.ok]
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all(isinstance(error, responses.ErrorResponse) for error in errors))
+
+    def test_convert_many_reports_exceptions(self):
+        """test exceptions are captured per item"""
+        with mock.patch.object(
+            client.ConvertIO,
+            'convert',
+            side_effect=[httpx.ConnectError("Connection refused"), mock.DEFAULT]
+        ) as convert:
+            convert.return_value = mock.Mock(spec=responses.ErrorResponse)
+            results = sorted(
+                self.convertio_client.convert_many(make_payloads(2), concurrency=1),
+                key=lambda result: result.index
+            )
+
+        self.assertIsInstance(results[0].exception, httpx.ConnectError)
+        self.assertIsNone(results[0].response)
+        self.assertIsNone(results[1].exception)
+
+    def test_convert_many_yields_as_completed(self):
+        """test a slow conversion doesn't hold back the others"""
+        def convert(payload, **_):
+            if payload.file.endswith("/0.png"):
+                time.sleep(0.2)
+            return responses.ErrorResponse(code=422, status="error", error=payload.file)
+
+        with mock.patch.object(client.ConvertIO, 'convert', side_effect=convert):
+            results = list(self.convertio_client.convert_many(make_payloads(4), concurrency=4))
+
+        self.assertEqual(results[-1].index, 0)
+
+
+class TestAsyncConvertMany(unittest.IsolatedAsyncioTestCase):
+    """Test AsyncConvertIO.convert_many"""
+
+    async def test_convert_many(self):
+        """test async batch against the fake API"""
+        fake = FakeConvertIO(minutes=1000, convert_time=0.05)
+        async with client.AsyncConvertIO(api_key="test", transport=fake.transport()) as convertio:
+            results = [
+                result async for result in convertio.convert_many(
+                    make_payloads(200),
+                    concurrency=100,
+                    poll_interval=0.01
+                )
+            ]
+
+        self.assertEqual(len(results), 200)
+        self.assertTrue(all(result.ok for result in results))
+
+
+class TestDeleteMany(unittest.TestCase):
+    """Test ConvertIO.delete_many"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO()
+        self.fake.seed(500)
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport())
+
+    def tearDown(self) -> None:
+        self.convertio_client.close()
+
+    def test_delete_many(self):
+        """test every conversion is deleted and reported"""
+        conversion_ids = list(self.fake.conversions)
+
+        report = self.convertio_client.delete_many(conversion_ids, concurrency=16)
+
+        self.assertTrue(report.ok)
+        self.assertEqual(sorted(report.deleted), sorted(conversion_ids))
+        self.assertEqual(self.fake.conversions, {})
+
+    def test_delete_many_reports_failures(self):
+        """test API errors and exceptions are aggregated per ID"""
+        conversion_ids = list(self.fake.conversions)[:3] + ["missing"]
+        self.fake.inject(exception=httpx.ConnectError)
+
+        report = self.convertio_client.delete_many(conversion_ids, concurrency=1)
+
+        self.assertFalse(report.ok)
+        self.assertEqual(len(report), 4)
+        self.assertEqual(len(report.deleted), 2)
+        self.assertEqual(report.errors["missing"].code, 404)
+        self.assertEqual([type(exception) for exception in report.exceptions.values()],
+                         [httpx.ConnectError])
+
+    def test_async_delete_many(self):
+        """test the async client deletes concurrently"""
+        async def delete():
+            async with client.AsyncConvertIO(
+                api_key="test", transport=self.fake.transport()
+            ) as convertio:
+                return await convertio.delete_many(list(self.fake.conversions), concurrency=50)
+
+        report = asyncio.run(delete())
+
+        self.assertEqual(len(report.deleted), 500)
+        self.assertEqual(self.fake.conversions, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
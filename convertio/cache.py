@@ -0,0 +1,225 @@
+"""
+    Conversion Result Cache
+    Content-addressed on-disk cache of conversion results, bounded by
+    total size (least recently used entries are evicted first) and age.
+"""
+# pylint: disable=too-many-instance-attributes
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import io
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+
+import pydantic
+
+from . import upload
+from .models import parameters, responses
+
+
+# Cache size limit in bytes
+MAX_BYTES = 1024 * 1024 * 1024
+
+# Extension of cached result files
+ENTRY_SUFFIX = '.result'
+
+
+def conversion_key(payload: parameters.NewConversionParameters) -> Optional[str]:
+    """ Cache key of a conversion
+
+    SHA-256 of the input (URL, or file content for raw/base64 inputs),
+    the output format and the OCR options. The callback URL doesn't change
+    the result and isn't part of the key.
+
+    Returns:
+        Hex digest, None if the input can't be read without consuming it
+        (non-seekable file objects)
+    """
+    digest = hashlib.sha256()
+    options = payload.options.dict(exclude_none=True, exclude={'callback_url'}) \
+        if payload.options else {}
+    digest.update(json.dumps({
+        "input": payload.input,
+        "filename": None if payload.input == 'url' else payload.filename,
+        "outputformat": payload.outputformat.lower(),
+        "options": options
+    }, sort_keys=True).encode())
+    file = payload.file
+    if isinstance(file, str):
+        digest.update(file.encode())
+    elif isinstance(file, bytes):
+        digest.update(file)
+    elif isinstance(file, pathlib.Path):
+        for chunk in upload.iter_chunks(file):
+            digest.update(chunk)
+    elif isinstance(file, io.IOBase) and file.seekable():
+        position = file.tell()
+        for chunk in upload.iter_chunks(file):
+            digest.update(chunk)
+        file.seek(position)
+    else:
+        return None
+    return digest.hexdigest()
+
+
+class CacheStats(pydantic.BaseModel):
+    """ Cache Statistics
+
+    Args:
+        hits (int): Lookups served from the cache
+        misses (int): Lookups not found or expired
+        evictions (int): Entries removed to stay under max_bytes or ttl
+        entries (int): Entries currently cached
+        size (int): Total size of the cached entries in bytes
+    """
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+
+
+class ResultCache:
+    """ Conversion Result Cache
+
+    Results are stored as files named after their `conversion_key`, the ID of
+    the conversion they came from on the first line. The last access time of
+    each file records recency and its modification time records when it was
+    stored, so the cache survives restarts.
+
+        convertio = ConvertIO(api_key=..., cache=ResultCache("/var/cache/convertio"))
+        convertio.convert(payload)  # converted
+        convertio.convert(payload)  # served from disk
+
+    Args:
+        directory (str): Directory holding the cached results, created if missing
+        max_bytes (int): Total size above which least recently used entries are evicted
+        ttl (Optional[float]): Seconds after which an entry expires, never if None
+    """
+
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES, ttl: Optional[float] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        # key -> (size, stored_at), least recently used first
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def _load(self) -> None:
+        entries: Dict[str, Tuple[int, float, float]] = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(ENTRY_SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries[name[:-len(ENTRY_SUFFIX)]] = (stat.st_size, stat.st_mtime, stat.st_atime)
+        for key, (size, stored_at, _) in sorted(entries.items(), key=lambda item: item[1][2]):
+            self._entries[key] = (size, stored_at)
+            self._size += size
+        self._evict()
+
+    def _remove(self, key: str, evicted: bool = True) -> None:
+        size, _ = self._entries.pop(key)
+        self._size -= size
+        self.evictions += evicted
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            expired = time.time() - self.ttl
+            for key in [
+                key for key, (_, stored_at) in self._entries.items() if stored_at < expired
+            ]:
+                self._remove(key)
+        while self._size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def get(self, key: str) -> Optional[responses.GetResultResponse]:
+        """Cached result of {key}, None on miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and entry[1] < time.time() - self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        # Large results are read without blocking other lookups
+        try:
+            with open(self._path(key), 'rb') as file:
+                header = json.loads(file.readline())
+                content = file.read()
+            os.utime(self._path(key), (time.time(), entry[1]))
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                # Unless it was replaced meanwhile
+                if self._entries.get(key) == entry:
+                    self._remove(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        # Content is already decoded, validating it would base64-decode it again
+        return responses.GetResultResponse.construct(
+            code=200,
+            status='ok',
+            data=responses.GetResultResponse.Data.construct(
+                id=header['id'],
+                type=header.get('type'),
+                encode='base64',
+                content=content
+            )
+        )
+
+    def put(self, key: str, result: responses.GetResultResponse) -> None:
+        """Store the result of {key}, evicting entries as needed"""
+        content = result.data.content
+        if len(content) > self.max_bytes:
+            return
+        # The conversion the result came from, on the first line
+        header = json.dumps({"id": result.data.id, "type": result.data.type}).encode() + b"\n"
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as file:
+            file.write(header)
+            file.write(content)
+        size = len(header) + len(content)
+        stored_at = time.time()
+        os.utime(file.name, (stored_at, stored_at))
+        with self._lock:
+            os.replace(file.name, self._path(key))
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[0]
+            self._entries[key] = (size, stored_at)
+            self._size += size
+            self._evict()
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key, evicted=False)
+
+    def stats(self) -> CacheStats:
+        """Snapshot of the cache statistics"""
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                size=self._size
+            )
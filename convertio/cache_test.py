@@ -0,0 +1,191 @@
+"""Conversion Result Cache tests"""
+import io
+import os
+import pathlib
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from . import cache, client
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+# Size of the first line of the entries holding result()
+HEADER_SIZE = len(b'{"id": "abc", "type": null}\n')
+
+
+def result(content: bytes) -> responses.GetResultResponse:
+    """GetResultResponse holding {content}"""
+    return responses.GetResultResponse.construct(
+        code=200,
+        status="ok",
+        data=responses.GetResultResponse.Data.construct(id="abc", content=content)
+    )
+
+
+class TestConversionKey(unittest.TestCase):
+    """Test cache.conversion_key"""
+
+    def key(self, **kwargs):
+        """Key of a conversion, defaults to a PNG url converted to PDF"""
+        return cache.conversion_key(parameters.NewConversionParameters(
+            **{"file": "http://file_url/a.png", "outputformat": "pdf", **kwargs}
+        ))
+
+    def test_key_inputs(self):
+        """test key depends on the input, output format and OCR options"""
+        keys = {
+            self.key(),
+            self.key(file="http://file_url/b.png"),
+            self.key(outputformat="docx"),
+            self.key(options=parameters.OCRParameters(ocr_enabled=True)),
+            self.key(file="YQ==", filename="a.png", input="base64"),
+            self.key(file="Yg==", filename="a.png", input="base64"),
+        }
+
+        self.assertEqual(len(keys), 6)
+
+    def test_key_normalized(self):
+        """test output format case and callback URL don't change the key"""
+        self.assertEqual(self.key(), self.key(outputformat="PDF"))
+        self.assertEqual(
+            self.key(),
+            self.key(options=parameters.OCRParameters(callback_url="http://callback"))
+        )
+
+    def test_key_local_files(self):
+        """test local files are hashed by content, file objects are rewound"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory, "a.png")
+            path.write_bytes(b"content")
+            file = io.BytesIO(b"content")
+
+            path_key = self.key(file=path, filename="a.png", input="base64")
+            file_key = self.key(file=file, filename="a.png", input="base64")
+
+        self.assertEqual(path_key, file_key)
+        self.assertEqual(file.tell(), 0)
+
+
+class TestResultCache(unittest.TestCase):
+    """Test ResultCache"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        """test stored results are returned as GetResultResponse"""
+        result_cache = cache.ResultCache(self.directory.name)
+
+        self.assertIsNone(result_cache.get("a"))
+        result_cache.put("a", result(b"content"))
+        cached = result_cache.get("a")
+
+        self.assertIsInstance(cached, responses.GetResultResponse)
+        self.assertEqual((cached.data.id, cached.data.content), ("abc", b"content"))
+        self.assertEqual(
+            result_cache.stats(),
+            cache.CacheStats(hits=1, misses=1, evictions=0, entries=1, size=7 + HEADER_SIZE)
+        )
+
+    def test_lru_eviction(self):
+        """test least recently used entries are evicted above max_bytes"""
+        result_cache = cache.ResultCache(self.directory.name, max_bytes=10 + 2 * HEADER_SIZE)
+        result_cache.put("a", result(b"aaaa"))
+        result_cache.put("b", result(b"bbbb"))
+        result_cache.get("a")
+
+        result_cache.put("c", result(b"cccc"))
+
+        self.assertIsNotNone(result_cache.get("a"))
+        self.assertIsNone(result_cache.get("b"))
+        self.assertIsNotNone(result_cache.get("c"))
+        self.assertEqual(result_cache.stats().evictions, 1)
+        self.assertEqual(result_cache.stats().size, 8 + 2 * HEADER_SIZE)
+
+    def test_ttl(self):
+        """test expired entries are misses"""
+        result_cache = cache.ResultCache(self.directory.name, ttl=60)
+        result_cache.put("a", result(b"aaaa"))
+
+        with mock.patch("time.time", return_value=os.path.getmtime(
+            os.path.join(self.directory.name, "a" + cache.ENTRY_SUFFIX)
+        ) + 61):
+            self.assertIsNone(result_cache.get("a"))
+
+        self.assertEqual(result_cache.stats().evictions, 1)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_reload(self):
+        """test entries and recency survive a restart"""
+        result_cache = cache.ResultCache(self.directory.name)
+        result_cache.put("a", result(b"aaaa"))
+        result_cache.put("b", result(b"bbbb"))
+        os.utime(os.path.join(self.directory.name, "b" + cache.ENTRY_SUFFIX), (1, 1))
+
+        reloaded = cache.ResultCache(self.directory.name, max_bytes=4 + HEADER_SIZE)
+
+        self.assertEqual(reloaded.stats().entries, 1)
+        self.assertEqual(reloaded.get("a").data.content, b"aaaa")
+
+
+class TestConvertCache(unittest.TestCase):
+    """Test ConvertIO.convert with a cache"""
+
+    def test_cache_hit_without_requests(self):
+        """test repeated conversions are served from the cache"""
+        fake = FakeConvertIO()
+        payload = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                     outputformat="pdf")
+        with tempfile.TemporaryDirectory() as directory, client.ConvertIO(
+            api_key="test",
+            transport=fake.transport(),
+            cache=cache.ResultCache(directory)
+        ) as convertio_client:
+            first = convertio_client.convert(payload)
+            requests = len(fake.requests)
+            second = convertio_client.convert(payload)
+
+            self.assertEqual(len(fake.requests), requests)
+            self.assertEqual((first.data.id, first.data.content),
+                             (second.data.id, second.data.content))
+            self.assertEqual(convertio_client.cache.stats().hits, 1)
+
+
+class TestAsyncConvertCache(unittest.IsolatedAsyncioTestCase):
+    """Test AsyncConvertIO.convert with a cache"""
+
+    async def test_cache_hit_without_requests(self):
+        """test repeated conversions are served from the cache, off the event loop"""
+        fake = FakeConvertIO()
+        payload = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                     outputformat="pdf")
+        with tempfile.TemporaryDirectory() as directory:
+            result_cache = cache.ResultCache(directory)
+            async with client.AsyncConvertIO(api_key="test", transport=fake.transport(),
+                                             cache=result_cache) as convertio_client:
+                first = await convertio_client.convert(payload, poll_interval=0)
+                requests = len(fake.requests)
+                threads = []
+                get = result_cache.get
+
+                def threaded_get(key):
+                    threads.append(threading.get_ident())
+                    return get(key)
+
+                with mock.patch.object(result_cache, "get", side_effect=threaded_get):
+                    second = await convertio_client.convert(payload, poll_interval=0)
+
+        self.assertEqual(len(fake.requests), requests)
+        self.assertEqual(second.data.id, first.data.id)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+
+if __name__ == "__main__":
+    unittest.main()
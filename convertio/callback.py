@@ -0,0 +1,221 @@
+"""
+    Conversion Callback Receiver
+    Embedded HTTP server resolving conversion futures when Convertio
+    calls the `callback_url` option, so no status polling is needed.
+"""
+from typing import TYPE_CHECKING, Dict, Optional, Union
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import json
+import logging
+import threading
+
+import pydantic
+
+from .models import parameters, responses
+
+if TYPE_CHECKING:
+    from .client import ConvertIO
+
+
+CALLBACK_PATH = '/convertio/callback'
+
+# Callbacks kept for conversions nobody expects yet, the oldest are dropped first
+UNEXPECTED_EVENTS = 1000
+
+ConversionResult = Union[responses.GetResultResponse, responses.ErrorResponse]
+
+
+class CallbackEvent(pydantic.BaseModel):
+    """ Callback Event
+
+    Args:
+        id (str): Conversion ID
+        step (str): Conversion Step. Allowed Values: finished, failed
+    """
+    id: str
+    step: str
+
+
+class CallbackReceiver:
+    """ Callback Receiver
+
+    Serves `callback_url` on a background thread. Convertio may call it with
+    GET query parameters, a form or a JSON body holding `id` and `step`.
+
+        with CallbackReceiver(public_url="https://example.com/convertio/callback") as receiver:
+            futures = [receiver.submit(convertio, payload) for payload in payloads]
+            results = [future.result() for future in futures]
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on, 0 picks a free port
+        path (str): Path of the callback endpoint
+        public_url (Optional[str]): URL Convertio reaches the receiver at, i.e. behind
+                                    a reverse proxy. Defaults to http://{host}:{port}{path}
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        path: str = CALLBACK_PATH,
+        public_url: Optional[str] = None
+    ):
+        self.path = path
+        self._futures: Dict[str, Future] = {}
+        self._events: 'OrderedDict[str, CallbackEvent]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = public_url or 'http://%s:%s%s' % (*self._server.server_address[:2], path)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="convertio-callback",
+            daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "CallbackReceiver":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the server, pending futures are cancelled"""
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def options(
+        self,
+        options: Optional[parameters.OCRParameters] = None
+    ) -> parameters.OCRParameters:
+        """Conversion options with `callback_url` pointing to this receiver"""
+        if options is None:
+            return parameters.OCRParameters(callback_url=self.url)
+        return options.copy(update={"callback_url": self.url})
+
+    def expect(self, conversion_id: str) -> "Future[CallbackEvent]":
+        """ Future resolved with the callback of a conversion
+
+        Callbacks received before `expect` is called are kept,
+        so there is no race with the conversion finishing early.
+        """
+        with self._lock:
+            if conversion_id in self._futures:
+                return self._futures[conversion_id]
+            future: Future = Future()
+            event = self._events.pop(conversion_id, None)
+            if event is None:
+                self._futures[conversion_id] = future
+        if event is not None:
+            future.set_result(event)
+        return future
+
+    def submit(
+        self,
+        convertio_client: "ConvertIO",
+        payload: parameters.NewConversionParameters
+    ) -> "Future[ConversionResult]":
+        """ Start a conversion notified through this receiver
+
+        Returns:
+            Future resolved with the result file once the conversion is finished,
+            or the ErrorResponse of a failed conversion.
+        """
+        result: Future = Future()
+        conversion = convertio_client.new_conversion(
+            payload=payload.copy(update={"options": self.options(payload.options)})
+        )
+        if isinstance(conversion, responses.ErrorResponse):
+            result.set_result(conversion)
+            return result
+
+        def on_callback(event: Future) -> None:
+            if event.cancelled():
+                result.cancel()
+                return
+            try:
+                if event.result().step == 'finished':
+                    response = convertio_client.get_result_file(
+                        payload=parameters.GetResultParameters(id=conversion.data.id)
+                    )
+                else:
+                    response = convertio_client.get_conversion_status(
+                        payload=parameters.GetStatusParameters(id=conversion.data.id)
+                    )
+            except Exception as exception: # pylint: disable=broad-except
+                result.set_exception(exception)
+            else:
+                result.set_result(response)
+
+        self.expect(conversion.data.id).add_done_callback(on_callback)
+        return result
+
+    def _resolve(self, event: CallbackEvent) -> None:
+        with self._lock:
+            future = self._futures.pop(event.id, None)
+            if future is None:
+                self._events[event.id] = event
+                self._events.move_to_end(event.id)
+                while len(self._events) > UNEXPECTED_EVENTS:
+                    self._events.popitem(last=False)
+                return
+        future.set_result(event)
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Callback request handler"""
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self): # pylint: disable=invalid-name
+                """Handle callback sent as query parameters"""
+                url = urlsplit(self.path)
+                self.handle_callback(url.path, dict(parse_qsl(url.query)))
+
+            def do_POST(self): # pylint: disable=invalid-name
+                """Handle callback sent as a form or JSON body"""
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                try:
+                    if self.headers.get('Content-Type', '').startswith('application/json'):
+                        data = json.loads(body or b'{}')
+                    else:
+                        data = dict(parse_qsl(body.decode()))
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict):
+                    self.reply(400)
+                    return
+                self.handle_callback(url.path, {**dict(parse_qsl(url.query)), **data})
+
+            def handle_callback(self, path: str, data: dict) -> None:
+                """Acknowledge the callback, then resolve its future"""
+                try:
+                    event = CallbackEvent(**data) if path == receiver.path else None
+                except pydantic.ValidationError:
+                    event = None
+                self.reply(200 if event else 404)
+                if event is not None:
+                    logging.debug("callback: %s", event)
+                    receiver._resolve(event) # pylint: disable=protected-access
+
+            def reply(self, code: int) -> None:
+                """Send an empty response with status {code}"""
+                self.send_response(code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
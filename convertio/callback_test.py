@@ -0,0 +1,109 @@
+"""Conversion Callback Receiver tests"""
+import unittest
+from unittest import mock
+
+import httpx
+
+from . import callback, client
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+class TestCallbackReceiver(unittest.TestCase):
+    """Test CallbackReceiver"""
+
+    def setUp(self) -> None:
+        self.receiver = callback.CallbackReceiver()
+
+    def tearDown(self) -> None:
+        self.receiver.close()
+
+    def test_expect_get(self):
+        """test callback sent as query parameters"""
+        future = self.receiver.expect("abc")
+
+        response = httpx.get(self.receiver.url, params={"id": "abc", "step": "finished"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(future.result(timeout=5),
+                         callback.CallbackEvent(id="abc", step="finished"))
+
+    def test_expect_post(self):
+        """test callback sent as a form or JSON body"""
+        form = self.receiver.expect("abc")
+        body = self.receiver.expect("def")
+
+        httpx.post(self.receiver.url, data={"id": "abc", "step": "failed"})
+        httpx.post(self.receiver.url, json={"id": "def", "step": "finished"})
+
+        self.assertEqual(form.result(timeout=5).step, "failed")
+        self.assertEqual(body.result(timeout=5).step, "finished")
+
+    def test_expect_after_callback(self):
+        """test callbacks received before expect are kept"""
+        httpx.get(self.receiver.url, params={"id": "abc", "step": "finished"})
+
+        self.assertEqual(self.receiver.expect("abc").result(timeout=5).step, "finished")
+
+    def test_invalid_callback(self):
+        """test unknown paths and incomplete callbacks are rejected"""
+        self.assertEqual(httpx.get(self.receiver.url + "/other").status_code, 404)
+        self.assertEqual(httpx.get(self.receiver.url, params={"id": "abc"}).status_code, 404)
+        for body in (b"{", b"[]", b"\xff"):
+            with self.subTest(body=body):
+                response = httpx.post(self.receiver.url, content=body,
+                                      headers={"Content-Type": "application/json"})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(httpx.post(self.receiver.url, content=b"\xff").status_code, 400)
+
+    def test_unexpected_events_bounded(self):
+        """test callbacks of conversions nobody expects are dropped past UNEXPECTED_EVENTS"""
+        # Callbacks are acknowledged before they are stored, resolve them directly
+        resolve = self.receiver._resolve # pylint: disable=protected-access
+        with mock.patch.object(callback, "UNEXPECTED_EVENTS", 2):
+            for conversion_id in ("abc", "def", "ghi"):
+                resolve(callback.CallbackEvent(id=conversion_id, step="finished"))
+
+        self.assertEqual(self.receiver.expect("ghi").result(timeout=5).step, "finished")
+        self.assertEqual(self.receiver.expect("def").result(timeout=5).step, "finished")
+        self.assertFalse(self.receiver.expect("abc").done())
+
+    def test_options(self):
+        """test callback_url is set on conversion options"""
+        options = parameters.OCRParameters(ocr_enabled=False)
+
+        self.assertEqual(self.receiver.options(options).callback_url, self.receiver.url)
+        self.assertFalse(self.receiver.options(options).ocr_enabled)
+        self.assertIsNone(options.callback_url)
+
+    def test_submit_without_polling(self):
+        """test a fleet of conversions completes without status requests"""
+        fake = FakeConvertIO(convert_time=0.05)
+        with client.ConvertIO(api_key="test", transport=fake.transport()) as convertio_client:
+            futures = [
+                self.receiver.submit(
+                    convertio_client,
+                    parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                       outputformat="pdf")
+                )
+                for _ in range(50)
+            ]
+            results = [future.result(timeout=10) for future in futures]
+
+        self.assertTrue(all(isinstance(result, responses.GetResultResponse) for result in results))
+        self.assertFalse([path for _, path in fake.requests if path.endswith("/status")])
+
+    def test_submit_error(self):
+        """test new_conversion errors resolve the future"""
+        fake = FakeConvertIO(minutes=0)
+        with client.ConvertIO(api_key="test", transport=fake.transport()) as convertio_client:
+            future = self.receiver.submit(
+                convertio_client,
+                parameters.NewConversionParameters(file="http://file_url/a.png", outputformat="pdf")
+            )
+
+        self.assertIsInstance(future.result(timeout=5), responses.ErrorResponse)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,370 @@
+"""
+    Command Line Interface
+    Convert directory trees, files and manifests in parallel:
+
+        convertio -f pdf -o out/ scans/ --jobs 16 --ocr-lang english --ocr-lang fra
+        convertio -f docx -o out/ --manifest files.txt
+
+    The API key is read from --api-key or the CONVERTIO_API_KEY environment variable.
+    Outputs already present are skipped, so an interrupted run is resumed by running
+    it again. Results are streamed to a temporary file renamed once complete, Ctrl-C
+    stops the running conversions and removes their temporary files.
+"""
+from typing import Iterable, Iterator, NamedTuple, Optional, Sequence, Set, Tuple, Union
+from urllib.parse import urlparse
+import argparse
+import contextlib
+import os
+import pathlib
+import sys
+import threading
+import time
+
+from . import bulk, client, outputs
+from .languages import Languages
+from .models import parameters, responses
+
+
+# Environment variable holding the API key
+API_KEY_ENV = 'CONVERTIO_API_KEY'
+
+# Suffix of outputs being downloaded
+PARTIAL_SUFFIX = '.part'
+
+
+class Task(NamedTuple):
+    """ Conversion of a single input
+
+    Args:
+        source (Path|str): Local file or URL
+        output (Path): Output file
+    """
+    source: Union[pathlib.Path, str]
+    output: pathlib.Path
+
+
+class ConversionError(Exception):
+    """API error while converting a file"""
+
+
+def language_code(value: str) -> str:
+    """OCR language code from a `Languages` name or code, case-insensitive"""
+    for language in Languages:
+        if value.lower() in (language.name.lower(), language.value.lower()):
+            return language.value
+    raise argparse.ArgumentTypeError("unknown OCR language %r" % value)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """Command line options"""
+    parser = argparse.ArgumentParser(
+        prog="convertio",
+        description="Convert files, directory trees and manifests with the Convertio API."
+    )
+    parser.add_argument("inputs", nargs="*", type=pathlib.Path,
+                        help="Files or directories to convert")
+    parser.add_argument("-f", "--format", required=True, dest="outputformat",
+                        help="Output format, e.g. pdf")
+    parser.add_argument("-o", "--output-dir", type=pathlib.Path, default=pathlib.Path("."),
+                        help="Directory receiving the results, input trees are mirrored")
+    parser.add_argument("-m", "--manifest", action="append", type=pathlib.Path, default=[],
+                        help="File listing a path or URL per line")
+    parser.add_argument("-j", "--jobs", type=int, default=bulk.CONCURRENCY,
+                        help="Conversions running at once (default: %(default)s)")
+    parser.add_argument("--glob", default="*",
+                        help="Pattern of the files converted in directories (default: all)")
+    parser.add_argument("--ocr-lang", action="append", type=language_code, default=[],
+                        help="Enable OCR with this language (name or code), repeatable")
+    parser.add_argument("--ocr-pages", help="Pages to recognize, e.g. 1-3,5")
+    parser.add_argument("--api-key", default=os.environ.get(API_KEY_ENV),
+                        help="API key (default: $%s)" % API_KEY_ENV)
+    parser.add_argument("--base-url", default=client.BASE_API_URL, help=argparse.SUPPRESS)
+    parser.add_argument("--poll-interval", type=float, default=client.POLL_INTERVAL,
+                        help="Seconds between status requests (default: %(default)s)")
+    parser.add_argument("--timeout", type=float,
+                        help="Give up on conversions running longer, in seconds")
+    parser.add_argument("--force", action="store_true", help="Convert again existing outputs")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only report errors")
+    options = parser.parse_args(argv)
+    if not options.inputs and not options.manifest:
+        parser.error("nothing to convert, give inputs or --manifest")
+    if not options.api_key:
+        parser.error("no API key, use --api-key or set %s" % API_KEY_ENV)
+    if options.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if options.ocr_pages and not options.ocr_lang:
+        parser.error("--ocr-pages requires --ocr-lang")
+    return options
+
+
+def output_path(relative: pathlib.PurePath, output_dir: pathlib.Path, outputformat: str):
+    """Output file of an input at {relative} path, refusing paths escaping {output_dir}"""
+    outputs.target_path(output_dir, str(relative))
+    return output_dir / relative.with_suffix('.' + outputformat.lower())
+
+
+def collect_tasks(options: argparse.Namespace) -> Iterator[Task]:
+    """ Conversions of the inputs and manifests, directories walked lazily
+
+    Inputs only differing by their extension (`a.png`, `a.jpg`) would share an
+    output: the first one listed gets `a.pdf`, the next ones keep their
+    extension (`a.jpg.pdf`).
+    """
+    seen: Set[pathlib.Path] = set()
+    for task in _tasks(options):
+        if task.output in seen:
+            source = task.source
+            if isinstance(source, str):
+                source = pathlib.PurePosixPath(urlparse(source).path)
+            task = task._replace(output=task.output.with_name(
+                task.output.stem + source.suffix + task.output.suffix
+            ))
+        seen.add(task.output)
+        yield task
+
+
+def _tasks(options: argparse.Namespace) -> Iterator[Task]:
+    for source in options.inputs:
+        if source.is_dir():
+            for path in sorted(source.rglob(options.glob)):
+                if path.is_file():
+                    yield Task(path, output_path(path.relative_to(source), options.output_dir,
+                                                 options.outputformat))
+        else:
+            yield Task(source, output_path(pathlib.PurePath(source.name), options.output_dir,
+                                           options.outputformat))
+    for manifest in options.manifest:
+        yield from manifest_tasks(manifest, options)
+
+
+def manifest_tasks(manifest: pathlib.Path, options: argparse.Namespace) -> Iterator[Task]:
+    """ Conversions listed in {manifest}, relative paths are relative to it
+
+    Raises ValueError for relative paths whose output would escape the output directory.
+    """
+    with open(manifest, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if urlparse(line).scheme in ('http', 'https'):
+                name = pathlib.PurePosixPath(urlparse(line).path).name or 'index'
+                yield Task(line, output_path(pathlib.PurePath(name), options.output_dir,
+                                             options.outputformat))
+            else:
+                path = pathlib.Path(line)
+                relative = path if not path.is_absolute() else pathlib.PurePath(path.name)
+                yield Task(manifest.parent / path, output_path(relative, options.output_dir,
+                                                               options.outputformat))
+
+
+def ocr_options(options: argparse.Namespace) -> Optional[parameters.OCRParameters]:
+    """OCR options of the conversions, None without --ocr-lang"""
+    if not options.ocr_lang:
+        return None
+    return parameters.OCRParameters(
+        ocr_enabled=True,
+        ocr_settings=parameters.OCRParameters.OCRSettings(
+            langs=options.ocr_lang,
+            page_nums=options.ocr_pages
+        )
+    )
+
+
+def check(response):
+    """Raise ConversionError for an API error {response}, returns it otherwise"""
+    if isinstance(response, responses.ErrorResponse):
+        raise ConversionError("%s: %s" % (response.code, response.error))
+    return response
+
+
+def partial_path(task: Task) -> pathlib.Path:
+    """Temporary file the output of {task} is downloaded to"""
+    return task.output.with_name(task.output.name + PARTIAL_SUFFIX)
+
+
+def wait_for_conversion(
+    convertio_client: client.ConvertIO,
+    conversion_id: str,
+    options: argparse.Namespace,
+    stopped: threading.Event
+) -> None:
+    """Poll {conversion_id} until it finishes, raises ConversionError once {stopped} is set"""
+    deadline = None if options.timeout is None else time.monotonic() + options.timeout
+    status_payload = parameters.GetStatusParameters(id=conversion_id)
+    while not stopped.is_set():
+        status = check(convertio_client.get_conversion_status(payload=status_payload))
+        if status.data.step == 'finish':
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError("Conversion %s timed out" % conversion_id)
+        stopped.wait(options.poll_interval)
+    raise ConversionError("interrupted")
+
+
+def convert_file(
+    convertio_client: client.ConvertIO,
+    task: Task,
+    options: argparse.Namespace,
+    stopped: Optional[threading.Event] = None
+) -> None:
+    """ Convert {task} and stream the result to its output file
+
+    Local files are uploaded with `direct_file_upload`, without base64 encoding.
+    The result is written to a `.part` file renamed once complete, so an output
+    file is never partial. Once {stopped} is set, polling ends and nothing is written.
+    """
+    stopped = stopped or threading.Event()
+    if isinstance(task.source, str):
+        conversion = check(convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(
+                file=task.source, outputformat=options.outputformat, options=ocr_options(options)
+            )
+        ))
+    else:
+        conversion = check(convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(
+                input='upload', file=task.source.name, filename=task.source.name,
+                outputformat=options.outputformat, options=ocr_options(options)
+            )
+        ))
+        check(convertio_client.direct_file_upload(payload=parameters.DirectFileParameters(
+            id=conversion.data.id, filename=task.source.name, file=task.source
+        )))
+    wait_for_conversion(convertio_client, conversion.data.id, options, stopped)
+    task.output.parent.mkdir(parents=True, exist_ok=True)
+    partial = partial_path(task)
+    try:
+        check(convertio_client.download_result_file(
+            parameters.GetResultParameters(id=conversion.data.id), partial
+        ))
+        if stopped.is_set():
+            raise ConversionError("interrupted")
+        os.replace(partial, task.output)
+    finally:
+        if partial.exists():
+            partial.unlink()
+
+
+class Progress:
+    """ Progress report on stderr
+
+    Args:
+        quiet (bool): Only report errors
+    """
+
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+        self.converted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def _print(self, message: str) -> None:
+        print(message, file=sys.stderr, flush=True)
+
+    def done(self, task: Task, exception: Optional[BaseException]) -> None:
+        """{task} ended, with {exception} if it failed"""
+        if exception is not None:
+            self.failed += 1
+            self._print("[%s] failed %s: %s" % (self.ended, task.source, exception))
+            return
+        self.converted += 1
+        if not self.quiet:
+            self._print("[%s] converted %s -> %s" % (self.ended, task.source, task.output))
+
+    def skip(self, task: Task) -> None:
+        """{task} was skipped, its output exists"""
+        self.skipped += 1
+        if not self.quiet:
+            self._print("[%s] skipped %s, %s exists" % (self.ended, task.source, task.output))
+
+    @property
+    def ended(self) -> int:
+        """Number of tasks converted, skipped or failed"""
+        return self.converted + self.skipped + self.failed
+
+    def summary(self, interrupted: bool = False) -> None:
+        """Print the totals"""
+        elapsed = time.monotonic() - self.started
+        self._print("%s converted, %s skipped, %s failed in %.1fs (%.2f files/s)%s" % (
+            self.converted, self.skipped, self.failed, elapsed,
+            self.converted / elapsed if elapsed else 0.0,
+            ", interrupted: run again to resume" if interrupted else ""
+        ))
+
+
+def run(
+    convertio_client: client.ConvertIO,
+    tasks: Iterable[Task],
+    options: argparse.Namespace,
+    progress: Progress
+) -> None:
+    """ Convert {tasks} with at most `--jobs` running at once
+
+    Tasks are consumed lazily, like in `bulk.convert_many`, so huge trees are never
+    listed in memory. Tasks whose output exists are skipped unless `--force`.
+    On KeyboardInterrupt, running tasks are stopped and their `.part` files removed.
+    """
+    stopped = threading.Event()
+    running: Set[Task] = set()
+
+    def convert(task: Task) -> Tuple[Task, Optional[Exception]]:
+        running.add(task)
+        try:
+            convert_file(convertio_client, task, options, stopped)
+        except Exception as exception: # pylint: disable=broad-except
+            return task, exception
+        finally:
+            running.discard(task)
+        return task, None
+
+    def unconverted() -> Iterator[Task]:
+        for task in tasks:
+            if not options.force and task.output.exists():
+                progress.skip(task)
+            else:
+                yield task
+
+    completed = bulk._completed( # pylint: disable=protected-access
+        convert, unconverted(), options.jobs
+    )
+    try:
+        for task, exception in completed:
+            progress.done(task, exception)
+    except KeyboardInterrupt:
+        stopped.set()
+        # Interrupted in `progress`, the pool still has to know not to wait for running tasks
+        with contextlib.suppress(KeyboardInterrupt):
+            completed.throw(KeyboardInterrupt)
+        for task in list(running):
+            with contextlib.suppress(FileNotFoundError):
+                partial_path(task).unlink()
+        raise
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """ Entry point of the `convertio` command
+
+    Returns:
+        Exit status: 0 if every file was converted or skipped, 1 if any failed,
+        2 if an input is invalid, 130 if interrupted
+    """
+    options = parse_args(argv)
+    progress = Progress(quiet=options.quiet)
+    with client.ConvertIO(
+        api_key=options.api_key,
+        base_url=options.base_url,
+        max_connections=max(client.MAX_CONNECTIONS, options.jobs)
+    ) as convertio_client:
+        try:
+            run(convertio_client, collect_tasks(options), options, progress)
+        except KeyboardInterrupt:
+            progress.summary(interrupted=True)
+            return 130
+        except ValueError as exception:
+            print("convertio: error: %s" % exception, file=sys.stderr)
+            progress.summary(interrupted=True)
+            return 2
+    progress.summary()
+    return 1 if progress.failed else 0
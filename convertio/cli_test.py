@@ -0,0 +1,146 @@
+"""Command Line Interface tests"""
+import contextlib
+import io
+import pathlib
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from . import cli
+from .testing import FakeConvertIO
+
+
+class TestCommandLine(unittest.TestCase):
+    """Test the convertio command against a local fake server"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO(minutes=1000, convert_time=0.1, latency=0.01)
+        self.server = self.fake.serve()
+        self.base_url = self.server.__enter__()
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.directory.name)
+        self.inputs = self.root / "in"
+        for index in range(8):
+            path = self.inputs / ("sub" if index % 2 else "") / ("scan%s.png" % index)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"image %d" % index)
+
+    def tearDown(self) -> None:
+        self.server.__exit__(None, None, None)
+        self.directory.cleanup()
+
+    def convert(self, *args: str) -> int:
+        """Run the command, returns its exit status"""
+        with contextlib.redirect_stderr(io.StringIO()):
+            return cli.main([
+                "--api-key", "test", "--base-url", self.base_url, "--poll-interval", "0.02",
+                "-f", "pdf", "-o", str(self.root / "out"), *args
+            ])
+
+    def test_converts_tree(self):
+        """test a directory tree is mirrored into the output directory"""
+        self.assertEqual(self.convert(str(self.inputs)), 0)
+
+        outputs = sorted(path.relative_to(self.root / "out").as_posix()
+                         for path in (self.root / "out").rglob("*") if path.is_file())
+        self.assertEqual(outputs, sorted(
+            ("sub/" if index % 2 else "") + "scan%s.pdf" % index for index in range(8)
+        ))
+        self.assertEqual((self.root / "out" / "scan0.pdf").read_bytes(), b"image 0")
+
+    def test_jobs_run_concurrently(self):
+        """test --jobs bounds the requests in flight"""
+        self.convert(str(self.inputs), "--jobs", "1", "--force")
+        self.assertEqual(self.fake.max_in_flight, 1)
+
+        self.fake.max_in_flight = 0
+        self.convert(str(self.inputs), "--jobs", "8", "--force")
+        self.assertGreater(self.fake.max_in_flight, 1)
+        self.assertLessEqual(self.fake.max_in_flight, 8)
+
+    def test_resumes(self):
+        """test existing outputs are skipped"""
+        (self.root / "out").mkdir()
+        (self.root / "out" / "scan0.pdf").write_bytes(b"done")
+
+        self.assertEqual(self.convert(str(self.inputs)), 0)
+
+        self.assertEqual((self.root / "out" / "scan0.pdf").read_bytes(), b"done")
+        self.assertEqual(sum(path == "/convert" for _, path in self.fake.requests), 7)
+
+    def test_manifest(self):
+        """test manifest paths and URLs"""
+        manifest = self.root / "files.txt"
+        manifest.write_text("# scans\nin/scan0.png\n\nhttp://file/report.docx\n")
+
+        self.assertEqual(self.convert("--manifest", str(manifest)), 0)
+
+        self.assertTrue((self.root / "out" / "in" / "scan0.pdf").exists())
+        self.assertTrue((self.root / "out" / "report.pdf").exists())
+
+    def test_manifest_escaping_output(self):
+        """test manifest paths whose output would escape the output directory are refused"""
+        manifest = self.root / "in" / "files.txt"
+        manifest.write_text("scan0.png\n../../outside.png\n")
+
+        self.assertEqual(self.convert("--manifest", str(manifest)), 2)
+
+        self.assertFalse((self.root / "outside.pdf").exists())
+
+    def test_same_stem_inputs(self):
+        """test inputs only differing by their extension get distinct outputs"""
+        (self.inputs / "scan0.jpg").write_bytes(b"jpeg 0")
+
+        self.assertEqual(self.convert(str(self.inputs)), 0)
+
+        self.assertEqual((self.root / "out" / "scan0.pdf").read_bytes(), b"jpeg 0")
+        self.assertEqual((self.root / "out" / "scan0.png.pdf").read_bytes(), b"image 0")
+
+    def test_failures(self):
+        """test failed conversions set the exit status and leave no partial output"""
+        self.fake.minutes = 0
+
+        self.assertEqual(self.convert(str(self.inputs / "scan0.png")), 1)
+
+        self.assertEqual(list((self.root / "out").glob("*")), [])
+
+    def test_interrupted(self):
+        """test Ctrl-C stops running conversions without waiting for them"""
+        self.fake.convert_time = 10
+        collect_tasks = cli.collect_tasks
+
+        def interrupted(options):
+            yield from collect_tasks(options)
+            time.sleep(0.2)
+            raise KeyboardInterrupt()
+
+        started = time.monotonic()
+        with mock.patch.object(cli, "collect_tasks", interrupted):
+            self.assertEqual(self.convert(str(self.inputs)), 130)
+        self.assertLess(time.monotonic() - started, 2)
+
+        time.sleep(0.1)
+        requests = len(self.fake.requests)
+        time.sleep(0.1)
+        self.assertEqual(len(self.fake.requests), requests)
+        self.assertEqual(list((self.root / "out").rglob("*")), [])
+
+    def test_ocr_options(self):
+        """test OCR languages by name or code"""
+        options = cli.parse_args([
+            "--api-key", "test", "-f", "pdf", "in", "--ocr-lang", "English",
+            "--ocr-lang", "fra", "--ocr-pages", "1-3"
+        ])
+
+        ocr = cli.ocr_options(options)
+
+        self.assertTrue(ocr.ocr_enabled)
+        self.assertEqual(ocr.ocr_settings.langs, ["eng", "fra"])
+        self.assertEqual(ocr.ocr_settings.page_nums, "1-3")
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            cli.parse_args(["--api-key", "test", "-f", "pdf", "in", "--ocr-lang", "klingon"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,19 +3,56 @@
     For more details visit:
         https://developers.convertio.co/api/docs/
 """
-from typing import Union
+from __future__ import annotations
+from typing import (
+    TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Union
+)
 from urllib.parse import urljoin
-import urllib.request
+import functools
 import logging
+import os
+import time
 
 import httpx
 
-from .models import parameters, responses
+from . import download, upload
+from .instrumentation import Instrumentation, LogPayload
+from .lazy import lazy_import
+
+if TYPE_CHECKING:
+    from .cache import ResultCache
+    from .jobs import JobStore
+    from .offload import ProcessOffload
+    from .ratelimit import MinutesLedger, TokenBucket
+    from .records import ConversionTable
+    from .retry import CircuitBreaker, RetryPolicy
+
+# Imported on first use, most processes only need a few of them
+asyncio = lazy_import('asyncio')
+bulk = lazy_import('convertio.bulk')
+cache = lazy_import('convertio.cache')
+decode = lazy_import('convertio.decode')
+jobs = lazy_import('convertio.jobs')
+outputs = lazy_import('convertio.outputs')
+ranges = lazy_import('convertio.ranges')
+ratelimit = lazy_import('convertio.ratelimit')
+records = lazy_import('convertio.records')
+singleflight = lazy_import('convertio.singleflight')
+parameters = lazy_import('convertio.models.parameters')
+responses = lazy_import('convertio.models.responses')
 
 
 # Constants
 REQUEST_TIMEOUT = 30
 
+# Conversion polling interval in seconds
+POLL_INTERVAL = 1.0
+
+# Connection Pool
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 5.0
+
 # ConvertIO Base URL
 BASE_API_URL = 'http://api.convertio.co'
 
@@ -27,12 +64,234 @@ GET_RESULT_ENDPOINT = '/convert/%s/dl/base64' # '/convert/<id>/dl/<OPTIONAL type
 DELETE_CANCEL_ENDPOINT = '/convert/%s' # '/convert/<id>
 LIST_CONVERSION_ENDPOINT = '/convert/list'
 
+# Endpoints whose requests may be applied twice if retried after reaching the API
+NON_IDEMPOTENT_ENDPOINTS = frozenset({'new_conversion', 'direct_file_upload'})
+
+# Error raised when a new conversion would eat into the ledger reserve
+MINUTES_RESERVE_ERROR = "Conversion minutes left are reserved"
+
+# Error returned by the API when the result isn't available
+FILE_NOT_READY_ERROR = ("File is not ready yet, finished with "
+                        "errors or had been deleted (check file status)")
+
+
+async def _in_thread(function: Callable, *args, **kwargs):
+    """Run blocking {function} in the default executor, not to stall the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(function, *args, **kwargs)
+    )
+
+
+def _reserve_minutes(ledger: Optional[MinutesLedger]) -> Optional[int]:
+    """Reservation of a new conversion in {ledger}, raises `MinutesReserveError` if refused"""
+    if ledger is None:
+        return None
+    reservation = ledger.allow()
+    if reservation is None:
+        raise ratelimit.MinutesReserveError(MINUTES_RESERVE_ERROR)
+    return reservation
+
+
+def _request_end(
+    instrumentation: Optional[Instrumentation],
+    endpoint: str,
+    started: float,
+    response: Optional[httpx.Response] = None,
+    exception: Optional[Exception] = None
+) -> None:
+    """Report the end of a request to {instrumentation}"""
+    if instrumentation is None:
+        return
+    duration = time.perf_counter() - started
+    if response is None:
+        instrumentation.request_end(endpoint, duration, exception=exception)
+        return
+    instrumentation.request_end(
+        endpoint,
+        duration,
+        response=response,
+        bytes_sent=int(response.request.headers.get('Content-Length', 0)),
+        # Bytes on the wire, the decoded body for in-process transports
+        bytes_received=response.num_bytes_downloaded or len(response.content)
+    )
+
+
+def _cancel_trial(circuit_breaker: Optional[CircuitBreaker], host: str) -> None:
+    """Release a trial request of {circuit_breaker} that ended without an outcome"""
+    if circuit_breaker is not None:
+        circuit_breaker.cancel_trial(host)
+
+
+class ConvertIO:
+    """ ConvertIO Client
 
-class ConvertIO: # pylint: disable=too-few-public-methods
-    """ConvertIO Client"""
+    The client owns a pooled `httpx.Client`, so connections (and TLS sessions)
+    are reused across calls. Close it when done, or use it as a context manager:
 
-    def __init__(self, api_key: str):
+        with ConvertIO(api_key=...) as convertio:
+            convertio.new_conversion(payload=payload)
+
+    Args:
+        api_key (str): Your API Key
+        base_url (str): API Base URL (default: BASE_API_URL)
+        timeout (float): Request timeout in seconds
+        max_connections (Optional[int]): Maximum number of concurrent connections
+        max_keepalive_connections (Optional[int]): Maximum number of idle connections kept
+                                                   in the pool
+        keepalive_expiry (Optional[float]): Seconds an idle connection is kept alive
+        http2 (bool): Enable HTTP/2, requires `httpx[http2]`
+        transport (Optional[httpx.BaseTransport]): Custom transport, i.e. `httpx.MockTransport`
+        cache (Optional[ResultCache]): Cache of `convert` results
+        coalesce (bool): Run identical concurrent `convert` calls as a single conversion,
+                         callers share the same result object
+        rate_limiter (Optional[TokenBucket]): Limits the rate of requests to the API
+        ledger (Optional[MinutesLedger]): Tracks the conversion minutes left and rejects
+                                          new conversions beyond its reserve
+        retry (Optional[RetryPolicy|Dict[str, RetryPolicy]]): Retry policy of every endpoint,
+                                          or per endpoint, keyed by method name
+        circuit_breaker (Optional[CircuitBreaker]): Sheds requests while the API is unhealthy
+        fast_decode (bool): Build responses from trusted payloads without the full validation,
+                            with orjson if installed
+        instrumentation (Optional[Instrumentation]): Hooks called around every request,
+                                                     see `instrumentation.MetricsCollector`
+        job_store (Optional[JobStore]): Durable record of started conversions, to resume them
+        offload (Optional[ProcessOffload]): Process pool parsing and decoding large results
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        api_key: str,
+        *,
+        base_url: str = BASE_API_URL,
+        timeout: float = REQUEST_TIMEOUT,
+        max_connections: Optional[int] = MAX_CONNECTIONS,
+        max_keepalive_connections: Optional[int] = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: Optional[float] = KEEPALIVE_EXPIRY,
+        http2: bool = False,
+        transport: Optional[httpx.BaseTransport] = None,
+        cache: Optional[ResultCache] = None,
+        coalesce: bool = False,
+        rate_limiter: Optional[TokenBucket] = None,
+        ledger: Optional[MinutesLedger] = None,
+        retry: Optional[Union[RetryPolicy, Dict[str, RetryPolicy]]] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        fast_decode: bool = False,
+        instrumentation: Optional[Instrumentation] = None,
+        job_store: Optional[JobStore] = None,
+        offload: Optional[ProcessOffload] = None
+    ):
         self.api_key = api_key
+        self.base_url = base_url
+        self.cache = cache
+        self.coalesce = coalesce
+        self.rate_limiter = rate_limiter
+        self.ledger = ledger
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.fast_decode = fast_decode
+        self.instrumentation = instrumentation
+        self.job_store = job_store
+        self.offload = offload
+        self._in_flight = singleflight.SingleFlight() if coalesce else None
+        self.session = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            http2=http2,
+            transport=transport
+        )
+
+    def __enter__(self) -> "ConvertIO":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying connection pool"""
+        self.session.close()
+
+    def _download_retry(self) -> Optional[RetryPolicy]:
+        """Retry policy of ranged downloads, the ranges default if none is set"""
+        if isinstance(self.retry, dict):
+            return self.retry.get('download_result_file')
+        return self.retry
+
+    def _parse(self, endpoint: str, model: type, response: httpx.Response):
+        started = time.perf_counter()
+        if self.fast_decode:
+            result = decode.parse(model, response.content)
+        else:
+            result = model(**response.json())
+        if self.instrumentation is not None:
+            self.instrumentation.parse(endpoint, model.__name__, time.perf_counter() - started)
+        return result
+
+    def _request(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        body: Optional[upload.Body] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Send a request, retried as configured, {body} is rebuilt for every attempt"""
+        retry = self.retry.get(endpoint) if isinstance(self.retry, dict) else self.retry
+        # Streams read up to the end can't be sent again
+        if body is not None and not body.replayable:
+            retry = None
+        host = httpx.URL(url).host
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_request(host)
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                if self.instrumentation is not None:
+                    self.instrumentation.request_start(endpoint, method, url, attempt)
+                if body is not None:
+                    kwargs['content'] = body()
+            except BaseException:
+                _cancel_trial(self.circuit_breaker, host)
+                raise
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method=method, url=url, **kwargs)
+            except Exception as exception:
+                # Not only httpx errors, i.e. h11 protocol errors end the request too
+                _request_end(self.instrumentation, endpoint, started, exception=exception)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(host, exception=exception)
+                if not isinstance(exception, httpx.TransportError) or retry is None or (
+                    not retry.should_retry(
+                        attempt, endpoint not in NON_IDEMPOTENT_ENDPOINTS, exception=exception
+                    )
+                ):
+                    raise
+                delay = retry.delay(attempt)
+            except BaseException:
+                # Cancelled or interrupted, a trial request leaves the circuit to the next one
+                _cancel_trial(self.circuit_breaker, host)
+                raise
+            else:
+                _request_end(self.instrumentation, endpoint, started, response=response)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(host, response=response)
+                if retry is None or not retry.should_retry(
+                    attempt, endpoint not in NON_IDEMPOTENT_ENDPOINTS, response=response
+                ):
+                    return response
+                delay = retry.delay(attempt, response)
+                response.close()
+            logging.debug("%s: retry %s in %.2fs", endpoint, attempt, delay)
+            if self.instrumentation is not None:
+                self.instrumentation.retry(endpoint, attempt, delay)
+            time.sleep(delay)
 
     def new_conversion(
         self,
@@ -40,54 +299,92 @@ class ConvertIO: # pylint: disable=too-few-public-methods
     ) -> Union[responses.NewConversionResponse, responses.ErrorResponse]:
         """
             Start a New Conversion
+
+            With input = 'base64' and a local path or file object as `file`,
+            the file is base64-encoded chunk by chunk while the request body is sent.
+            With a ledger, raises `MinutesReserveError` instead of eating into its reserve.
         
             Example Result:
                 code=200
                 status='ok'
                 data=Data(id='5ad5ea6f719178beff43cca991ed1109', minutes=994)
         """
-        url = urljoin(BASE_API_URL, NEW_CONVERSION_ENDPOINT)
+        url = urljoin(self.base_url, NEW_CONVERSION_ENDPOINT)
         data = {"apikey": self.api_key, **payload.dict(exclude_none=True)}
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
         }
-        response = httpx.request(
-            method='POST',
-            url=url,
-            headers=headers,
-            json=data,
-            timeout=REQUEST_TIMEOUT
-        )
-        logging.debug("new_conversion: %s %s %s", response, response.url, data)
-        if response.is_success:
-            return responses.NewConversionResponse(**response.json())
-        return responses.ErrorResponse(**response.json())
+        if isinstance(payload.file, (str, bytes)):
+            body = {'json': data}
+        else:
+            fields = {key: value for key, value in data.items() if key != 'file'}
+            size = upload.base64_json_size(fields, payload.file)
+            if size is not None:
+                headers['Content-Length'] = str(size)
+            body = {'body': upload.Body(
+                payload.file, lambda: upload.iter_base64_json(fields, payload.file)
+            )}
+        reservation = _reserve_minutes(self.ledger)
+        try:
+            response = self._request(
+                endpoint='new_conversion',
+                method='POST',
+                url=url,
+                headers=headers,
+                **body
+            )
+            logging.debug("new_conversion: %s %s %s", response, response.url, LogPayload(data))
+            if not response.is_success:
+                return self._parse('new_conversion', responses.ErrorResponse, response)
+            conversion = self._parse('new_conversion', responses.NewConversionResponse, response)
+            if self.ledger is not None:
+                self.ledger.observe_balance(conversion.data.id, conversion.data.minutes,
+                                            reservation)
+        finally:
+            if reservation is not None:
+                # Refunded unless settled by the balance report
+                self.ledger.release(reservation)
+        if self.job_store is not None:
+            self.job_store.add(conversion.data.id, payload)
+        return conversion
 
     def direct_file_upload(
         self,
-        payload: parameters.DirectFileParameters
+        payload: parameters.DirectFileParameters,
+        chunk_size: int = upload.CHUNK_SIZE,
+        progress: Optional[upload.Progress] = None
     ) -> Union[responses.DirectFileResponse, responses.ErrorResponse]:
         """ Direct File Upload For Conversion
 
             This step required only if chooses input = 'upload' on previous step.
             In order to upload file for conversion.
+
+            The file is streamed in chunks of {chunk_size} bytes, local files are
+            memory-mapped, so memory use doesn't depend on the file size.
+
+            Args:
+                payload (DirectFileParameters): File to upload
+                chunk_size (int): Size of the chunks sent
+                progress (Optional[Progress]): Called after every chunk with the bytes
+                                               sent so far and the total size, if known
         """
         url = urljoin(
-            BASE_API_URL,
+            self.base_url,
             DIRECT_FILE_ENDPOINT % (payload.id, payload.filename)
         )
-        with urllib.request.urlopen(url) as response:
-            data = response.read()
-        response = httpx.request(
+        source = payload.filename if payload.file is None else payload.file
+        size = upload.source_size(source)
+        response = self._request(
+            endpoint='direct_file_upload',
             method='PUT',
             url=url,
-            json=data,
-            timeout=REQUEST_TIMEOUT
+            headers={} if size is None else {'Content-Length': str(size)},
+            body=upload.Body(source, lambda: upload.iter_chunks(source, chunk_size, progress))
         )
-        logging.debug("direct_file_upload: %s %s %s", response, response.url, data)
+        logging.debug("direct_file_upload: %s %s %s", response, response.url, size)
         if response.is_success:
-            return responses.DirectFileResponse(**response.json())
-        return responses.ErrorResponse(**response.json())
+            return self._parse('direct_file_upload', responses.DirectFileResponse, response)
+        return self._parse('direct_file_upload', responses.ErrorResponse, response)
 
     def get_conversion_status(
         self,
@@ -99,18 +396,22 @@ class ConvertIO: # pylint: disable=too-few-public-methods
             with <id>, obtained on previous step.
         """
         url = urljoin(
-            BASE_API_URL,
+            self.base_url,
             GET_STATUS_ENDPOINT % payload.id
         )
-        response = httpx.request(
+        response = self._request(
+            endpoint='get_conversion_status',
             method='GET',
-            url=url,
-            timeout=REQUEST_TIMEOUT
+            url=url
         )
         logging.debug("get_conversion_status: %s %s", response, response.url)
         if response.is_success:
-            return responses.GetStatusResponse(**response.json())
-        return responses.ErrorResponse(**response.json())
+            status = self._parse('get_conversion_status', responses.GetStatusResponse, response)
+        else:
+            status = self._parse('get_conversion_status', responses.ErrorResponse, response)
+        if self.job_store is not None:
+            self.job_store.observe_status(payload.id, status)
+        return status
 
     def get_result_file(
         self,
@@ -125,18 +426,28 @@ class ConvertIO: # pylint: disable=too-few-public-methods
             can't be hotlinked or shared with third parties.
         """
         url = urljoin(
-            BASE_API_URL,
+            self.base_url,
             GET_RESULT_ENDPOINT % payload.id
         )
-        response = httpx.request(
+        response = self._request(
+            endpoint='get_result_file',
             method='GET',
-            url=url,
-            timeout=REQUEST_TIMEOUT
+            url=url
         )
         logging.debug("get_result_file: %s %s", response, response.url)
         if response.is_success:
-            return responses.GetResultResponse(**response.json())
-        return responses.ErrorResponse(**response.json())
+            if self.offload is None or len(response.content) < self.offload.threshold:
+                result = self._parse('get_result_file', responses.GetResultResponse, response)
+            else:
+                started = time.perf_counter()
+                result = self.offload.parse_result(response.content)
+                if self.instrumentation is not None:
+                    self.instrumentation.parse('get_result_file', 'GetResultResponse',
+                                               time.perf_counter() - started)
+            if self.job_store is not None:
+                self.job_store.update(payload.id, state=jobs.COLLECTED)
+            return result
+        return self._parse('get_result_file', responses.ErrorResponse, response)
 
     def delete_or_cancel_conversion(
         self,
@@ -144,26 +455,35 @@ class ConvertIO: # pylint: disable=too-few-public-methods
     ) -> Union[responses.DeleteCancelResponse, responses.ErrorResponse]:
         """Delete File/Cancel Conversion"""
         url = urljoin(
-            BASE_API_URL,
+            self.base_url,
             DELETE_CANCEL_ENDPOINT % payload.id
         )
-        response = httpx.request(
+        response = self._request(
+            endpoint='delete_or_cancel_conversion',
             method='DELETE',
-            url=url,
-            timeout=REQUEST_TIMEOUT
+            url=url
         )
         logging.debug("delete_or_cancel_conversion: %s %s", response, response.url)
         if response.is_success:
-            return responses.DeleteCancelResponse(**response.json())
-        return responses.ErrorResponse(**response.json())
+            if self.job_store is not None:
+                self.job_store.remove(payload.id)
+            return self._parse(
+                'delete_or_cancel_conversion', responses.DeleteCancelResponse, response
+            )
+        return self._parse('delete_or_cancel_conversion', responses.ErrorResponse, response)
 
     def list_conversions(
         self,
-        payload: parameters.ListConversionParameters
-    ) -> Union[responses.ListConversionResponse, responses.ErrorResponse]:
+        payload: parameters.ListConversionParameters,
+        *,
+        compact: bool = False
+    ) -> Union[responses.ListConversionResponse, ConversionTable, responses.ErrorResponse]:
         """
             List of Conversions
 
+            With {compact}, rows are returned in a column-oriented `ConversionTable`
+            instead of one model per row.
+
             Example Result:
                 code=200
                 status='ok'
@@ -179,19 +499,890 @@ class ConvertIO: # pylint: disable=too-few-public-methods
                     )
                 ]    
         """
-        url = urljoin(BASE_API_URL, LIST_CONVERSION_ENDPOINT)
+        url = urljoin(self.base_url, LIST_CONVERSION_ENDPOINT)
         data = {"apikey": self.api_key, **payload.dict(exclude_none=True)}
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
         }
-        response = httpx.request(
+        response = self._request(
+            endpoint='list_conversions',
             method='POST',
             url=url,
             headers=headers,
-            json=data,
-            timeout=REQUEST_TIMEOUT
+            json=data
         )
-        logging.debug("list_conversions: %s %s %s", response, response.url, data)
+        logging.debug("list_conversions: %s %s %s", response, response.url, LogPayload(data))
         if response.is_success:
-            return responses.ListConversionResponse(**response.json())
-        return responses.ErrorResponse(**response.json())
+            if compact:
+                conversions = records.ConversionTable.from_payload(response.content)
+                rows = conversions.records()
+            else:
+                conversions = self._parse(
+                    'list_conversions', responses.ListConversionResponse, response
+                )
+                rows = conversions.data
+            if self.ledger is not None:
+                self.ledger.observe_usage(rows)
+            return conversions
+        return self._parse('list_conversions', responses.ErrorResponse, response)
+
+    def download_result_file( # pylint: disable=too-many-arguments
+        self,
+        payload: parameters.GetResultParameters,
+        destination: download.Destination,
+        chunk_size: int = download.CHUNK_SIZE,
+        resume: bool = False,
+        segments: int = 1
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """ Download Result File
+
+            Streams the output file (`GetStatusResponse.Data.Output.url`) into
+            {destination} in chunks of {chunk_size} bytes, unlike `get_result_file`
+            which holds the whole base64-encoded content in memory.
+
+            With {resume} or {segments}, the file is downloaded with HTTP Range
+            requests to `{destination}.part`, renamed once its size matches
+            `Output.size`: dropped connections are resumed from the last byte
+            written, and so is a partial file left by an earlier call. Files of
+            at least `ranges.MIN_SEGMENT_SIZE` bytes per segment are fetched as
+            {segments} parallel ranges.
+
+            Args:
+                payload (GetResultParameters): Conversion to download
+                destination (Destination): Path or binary file object, a path with {resume}
+                chunk_size (int): Size of the chunks written to {destination}
+                resume (bool): Resumable download
+                segments (int): Ranges downloaded in parallel, implies {resume}
+            Returns:
+                Status of the finished conversion, ErrorResponse if it isn't finished
+        """
+        if (resume or segments > 1) and not isinstance(destination, (str, os.PathLike)):
+            raise TypeError("Resumable downloads need a path destination")
+        status = self.get_conversion_status(
+            payload=parameters.GetStatusParameters(id=payload.id)
+        )
+        if isinstance(status, responses.ErrorResponse):
+            return status
+        if status.data.step != 'finish':
+            return responses.ErrorResponse(code=422, status='error', error=FILE_NOT_READY_ERROR)
+        if resume or segments > 1:
+            ranges.fetch(
+                self.session, status.data.output.url, destination, int(status.data.output.size),
+                segments, chunk_size, self._download_retry()
+            )
+        else:
+            download.stream_to(self.session, status.data.output.url, destination, chunk_size)
+        if self.job_store is not None:
+            self.job_store.update(payload.id, state=jobs.COLLECTED)
+        return status
+
+    def download_result_files( # pylint: disable=too-many-arguments
+        self,
+        payload: parameters.GetResultParameters,
+        directory: Union[str, os.PathLike],
+        mode: str = 'zip',
+        concurrency: Optional[int] = None,
+        chunk_size: int = download.CHUNK_SIZE
+    ) -> Union[Iterator[outputs.OutputFile], responses.ErrorResponse]:
+        """ Download Result Files
+
+            Writes every output file of a conversion into {directory}, yielding
+            each as soon as it's written. Multi-file outputs (`output.files` set,
+            i.e. converting a multi-page DOC to JPG) are either extracted from
+            the ZIP at `output.url` entry by entry while it streams (mode = 'zip'),
+            or fetched from `output.url/<file.ext>` {concurrency} at once
+            (mode = 'parallel'). Single-file outputs are streamed as is.
+            Memory use is bounded by {chunk_size} per file being written.
+
+            Args:
+                payload (GetResultParameters): Conversion to download
+                directory (str|PathLike): Directory receiving the files
+                mode (str): 'zip' or 'parallel'
+                concurrency (Optional[int]): Files fetched at once in parallel mode
+                chunk_size (int): Size of the chunks written
+            Returns:
+                Iterator of `OutputFile`, files are downloaded as it's consumed,
+                ErrorResponse if the conversion isn't finished
+        """
+        if mode not in outputs.MODES:
+            raise ValueError("mode must be one of %s" % (outputs.MODES,))
+        status = self.get_conversion_status(
+            payload=parameters.GetStatusParameters(id=payload.id)
+        )
+        if isinstance(status, responses.ErrorResponse):
+            return status
+        if status.data.step != 'finish':
+            return responses.ErrorResponse(code=422, status='error', error=FILE_NOT_READY_ERROR)
+        return self._download_result_files(
+            payload.id, status.data.output, directory, mode,
+            concurrency or outputs.CONCURRENCY, chunk_size
+        )
+
+    def _download_result_files( # pylint: disable=too-many-arguments
+        self,
+        conversion_id: str,
+        output: responses.GetStatusResponse.Data.Output,
+        directory: Union[str, os.PathLike],
+        mode: str,
+        concurrency: int,
+        chunk_size: int
+    ) -> Iterator[outputs.OutputFile]:
+        names = outputs.file_names(output)
+        if not names:
+            yield outputs.fetch_file(
+                self.session, output.url, outputs.single_name(output.url), directory, chunk_size
+            )
+        elif mode == outputs.PARALLEL:
+            yield from outputs.fetch_files(
+                self.session, output.url, names, directory, concurrency, chunk_size
+            )
+        else:
+            with self.session.stream('GET', output.url) as response:
+                response.raise_for_status()
+                yield from outputs.extract_zip(
+                    response.iter_bytes(chunk_size), directory, chunk_size
+                )
+        if self.job_store is not None:
+            self.job_store.update(conversion_id, state=jobs.COLLECTED)
+
+    def wait_for_conversion(
+        self,
+        conversion_id: str,
+        poll_interval: float = POLL_INTERVAL,
+        timeout: Optional[float] = None
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """ Wait for a Conversion to finish
+
+            Polls the status of {conversion_id} until it reaches the 'finish' step.
+
+            Args:
+                conversion_id (str): Conversion to wait for
+                poll_interval (float): Seconds between status requests
+                timeout (Optional[float]): Raise `TimeoutError` if the conversion
+                                           hasn't finished after {timeout} seconds
+            Returns:
+                Status of the finished conversion, or the first ErrorResponse
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        status_payload = parameters.GetStatusParameters(id=conversion_id)
+        while True:
+            status = self.get_conversion_status(payload=status_payload)
+            if isinstance(status, responses.ErrorResponse) or status.data.step == 'finish':
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("Conversion %s timed out" % conversion_id)
+            time.sleep(poll_interval)
+
+    def convert(
+        self,
+        payload: parameters.NewConversionParameters,
+        poll_interval: float = POLL_INTERVAL,
+        timeout: Optional[float] = None
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        """ Convert a File
+
+            Starts a new conversion, polls its status until it finishes and
+            returns the result file content. With a result cache, previously
+            converted inputs are served from it without any request. With
+            `coalesce`, concurrent calls for the same conversion share one.
+
+            Args:
+                payload (NewConversionParameters): Conversion to start
+                poll_interval (float): Seconds between status requests
+                timeout (Optional[float]): Raise `TimeoutError` if the conversion
+                                           hasn't finished after {timeout} seconds
+        """
+        key = None
+        if self.cache is not None or self.coalesce:
+            key = cache.conversion_key(payload)
+        if key is not None and self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        if key is not None and self.coalesce:
+            return self._in_flight.do(key, self._convert, payload, poll_interval, timeout, key)
+        return self._convert(payload, poll_interval, timeout, key)
+
+    def _convert(
+        self,
+        payload: parameters.NewConversionParameters,
+        poll_interval: float,
+        timeout: Optional[float],
+        key: Optional[str] = None
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        conversion = self.new_conversion(payload=payload)
+        if isinstance(conversion, responses.ErrorResponse):
+            return conversion
+        status = self.wait_for_conversion(conversion.data.id, poll_interval, timeout)
+        if isinstance(status, responses.ErrorResponse):
+            return status
+        result = self.get_result_file(
+            payload=parameters.GetResultParameters(id=conversion.data.id)
+        )
+        if key is not None and self.cache is not None and isinstance(
+            result, responses.GetResultResponse
+        ):
+            self.cache.put(key, result)
+        return result
+
+    def convert_many(
+        self,
+        payloads: Iterable[parameters.NewConversionParameters],
+        concurrency: Optional[int] = None,
+        **kwargs
+    ) -> Iterator[bulk.ConversionResult]:
+        """ Convert many Files concurrently
+
+            Runs `convert` for every payload in a pool of {concurrency} threads
+            (default: `bulk.CONCURRENCY`) and yields `bulk.ConversionResult`s as
+            they complete, not in input order.
+            Failed items are reported in their result and never stop the batch.
+            Extra keyword arguments are passed to `convert`.
+        """
+        return bulk.convert_many(
+            self, payloads, concurrency=concurrency or bulk.CONCURRENCY, **kwargs
+        )
+
+    def delete_many(
+        self,
+        conversion_ids: Iterable[str],
+        concurrency: Optional[int] = None
+    ) -> bulk.DeleteReport:
+        """ Delete Files/Cancel Conversions concurrently
+
+            Runs `delete_or_cancel_conversion` for every ID in a pool of {concurrency}
+            threads (default: `bulk.CONCURRENCY`) and aggregates the responses, API
+            errors and exceptions into a `bulk.DeleteReport`.
+            See `sweeper.Sweeper` to clean up old conversions in the background.
+        """
+        return bulk.delete_many(self, conversion_ids, concurrency=concurrency or bulk.CONCURRENCY)
+
+
+class AsyncConvertIO:
+    """ Asynchronous ConvertIO Client
+
+    Mirrors `ConvertIO` on top of a shared `httpx.AsyncClient`, so many conversions
+    can be in flight on a single event loop. Every endpoint is a coroutine:
+
+        async with AsyncConvertIO(api_key=...) as convertio:
+            await convertio.new_conversion(payload=payload)
+
+    Args:
+        api_key (str): Your API Key
+        base_url (str): API Base URL (default: BASE_API_URL)
+        timeout (float): Request timeout in seconds
+        max_connections (Optional[int]): Maximum number of concurrent connections
+        max_keepalive_connections (Optional[int]): Maximum number of idle connections kept
+                                                   in the pool
+        keepalive_expiry (Optional[float]): Seconds an idle connection is kept alive
+        http2 (bool): Enable HTTP/2, requires `httpx[http2]`
+        transport (Optional[httpx.AsyncBaseTransport]): Custom transport, i.e. `httpx.MockTransport`
+        cache (Optional[ResultCache]): Cache of `convert` results
+        coalesce (bool): Run identical concurrent `convert` calls as a single conversion,
+                         callers share the same result object
+        rate_limiter (Optional[TokenBucket]): Limits the rate of requests to the API
+        ledger (Optional[MinutesLedger]): Tracks the conversion minutes left and rejects
+                                          new conversions beyond its reserve
+        retry (Optional[RetryPolicy|Dict[str, RetryPolicy]]): Retry policy of every endpoint,
+                                          or per endpoint, keyed by method name
+        circuit_breaker (Optional[CircuitBreaker]): Sheds requests while the API is unhealthy
+        fast_decode (bool): Build responses from trusted payloads without the full validation,
+                            with orjson if installed
+        instrumentation (Optional[Instrumentation]): Hooks called around every request,
+                                                     see `instrumentation.MetricsCollector`
+        job_store (Optional[JobStore]): Durable record of started conversions, to resume them
+        offload (Optional[ProcessOffload]): Process pool parsing and decoding large results
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        api_key: str,
+        *,
+        base_url: str = BASE_API_URL,
+        timeout: float = REQUEST_TIMEOUT,
+        max_connections: Optional[int] = MAX_CONNECTIONS,
+        max_keepalive_connections: Optional[int] = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: Optional[float] = KEEPALIVE_EXPIRY,
+        http2: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[ResultCache] = None,
+        coalesce: bool = False,
+        rate_limiter: Optional[TokenBucket] = None,
+        ledger: Optional[MinutesLedger] = None,
+        retry: Optional[Union[RetryPolicy, Dict[str, RetryPolicy]]] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        fast_decode: bool = False,
+        instrumentation: Optional[Instrumentation] = None,
+        job_store: Optional[JobStore] = None,
+        offload: Optional[ProcessOffload] = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache = cache
+        self.coalesce = coalesce
+        self.rate_limiter = rate_limiter
+        self.ledger = ledger
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.fast_decode = fast_decode
+        self.instrumentation = instrumentation
+        self.job_store = job_store
+        self.offload = offload
+        self._in_flight = singleflight.AsyncSingleFlight() if coalesce else None
+        self.session = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            http2=http2,
+            transport=transport
+        )
+
+    async def __aenter__(self) -> "AsyncConvertIO":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool"""
+        await self.session.aclose()
+
+    def _download_retry(self) -> Optional[RetryPolicy]:
+        """Retry policy of ranged downloads, the ranges default if none is set"""
+        if isinstance(self.retry, dict):
+            return self.retry.get('download_result_file')
+        return self.retry
+
+    def _parse(self, endpoint: str, model: type, response: httpx.Response):
+        started = time.perf_counter()
+        if self.fast_decode:
+            result = decode.parse(model, response.content)
+        else:
+            result = model(**response.json())
+        if self.instrumentation is not None:
+            self.instrumentation.parse(endpoint, model.__name__, time.perf_counter() - started)
+        return result
+
+    async def _request(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        body: Optional[upload.Body] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Send a request, retried as configured, {body} is rebuilt for every attempt"""
+        retry = self.retry.get(endpoint) if isinstance(self.retry, dict) else self.retry
+        # Streams read up to the end can't be sent again
+        if body is not None and not body.replayable:
+            retry = None
+        host = httpx.URL(url).host
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_request(host)
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire_async()
+                if self.instrumentation is not None:
+                    self.instrumentation.request_start(endpoint, method, url, attempt)
+                if body is not None:
+                    kwargs['content'] = body()
+            except BaseException:
+                _cancel_trial(self.circuit_breaker, host)
+                raise
+            started = time.perf_counter()
+            try:
+                response = await self.session.request(method=method, url=url, **kwargs)
+            except Exception as exception:
+                # Not only httpx errors, i.e. h11 protocol errors end the request too
+                _request_end(self.instrumentation, endpoint, started, exception=exception)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(host, exception=exception)
+                if not isinstance(exception, httpx.TransportError) or retry is None or (
+                    not retry.should_retry(
+                        attempt, endpoint not in NON_IDEMPOTENT_ENDPOINTS, exception=exception
+                    )
+                ):
+                    raise
+                delay = retry.delay(attempt)
+            except BaseException:
+                # Cancelled or interrupted, a trial request leaves the circuit to the next one
+                _cancel_trial(self.circuit_breaker, host)
+                raise
+            else:
+                _request_end(self.instrumentation, endpoint, started, response=response)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(host, response=response)
+                if retry is None or not retry.should_retry(
+                    attempt, endpoint not in NON_IDEMPOTENT_ENDPOINTS, response=response
+                ):
+                    return response
+                delay = retry.delay(attempt, response)
+                await response.aclose()
+            logging.debug("%s: retry %s in %.2fs", endpoint, attempt, delay)
+            if self.instrumentation is not None:
+                self.instrumentation.retry(endpoint, attempt, delay)
+            await asyncio.sleep(delay)
+
+    async def new_conversion(
+        self,
+        payload: parameters.NewConversionParameters
+    ) -> Union[responses.NewConversionResponse, responses.ErrorResponse]:
+        """
+            Start a New Conversion
+
+            With input = 'base64' and a local path or file object as `file`,
+            the file is base64-encoded chunk by chunk while the request body is sent.
+            With a ledger, raises `MinutesReserveError` instead of eating into its reserve.
+        
+            Example Result:
+                code=200
+                status='ok'
+                data=Data(id='5ad5ea6f719178beff43cca991ed1109', minutes=994)
+        """
+        url = urljoin(self.base_url, NEW_CONVERSION_ENDPOINT)
+        data = {"apikey": self.api_key, **payload.dict(exclude_none=True)}
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        }
+        if isinstance(payload.file, (str, bytes)):
+            body = {'json': data}
+        else:
+            fields = {key: value for key, value in data.items() if key != 'file'}
+            size = upload.base64_json_size(fields, payload.file)
+            if size is not None:
+                headers['Content-Length'] = str(size)
+            body = {'body': upload.Body(
+                payload.file, lambda: upload.aiter_base64_json(fields, payload.file)
+            )}
+        reservation = _reserve_minutes(self.ledger)
+        try:
+            response = await self._request(
+                endpoint='new_conversion',
+                method='POST',
+                url=url,
+                headers=headers,
+                **body
+            )
+            logging.debug("new_conversion: %s %s %s", response, response.url, LogPayload(data))
+            if not response.is_success:
+                return self._parse('new_conversion', responses.ErrorResponse, response)
+            conversion = self._parse('new_conversion', responses.NewConversionResponse, response)
+            if self.ledger is not None:
+                self.ledger.observe_balance(conversion.data.id, conversion.data.minutes,
+                                            reservation)
+        finally:
+            if reservation is not None:
+                # Refunded unless settled by the balance report
+                self.ledger.release(reservation)
+        if self.job_store is not None:
+            await _in_thread(self.job_store.add, conversion.data.id, payload)
+        return conversion
+
+    async def direct_file_upload(
+        self,
+        payload: parameters.DirectFileParameters,
+        chunk_size: int = upload.CHUNK_SIZE,
+        progress: Optional[upload.Progress] = None
+    ) -> Union[responses.DirectFileResponse, responses.ErrorResponse]:
+        """ Direct File Upload For Conversion
+
+            This step required only if chooses input = 'upload' on previous step.
+            In order to upload file for conversion.
+
+            The file is streamed in chunks of {chunk_size} bytes, local files are
+            memory-mapped, so memory use doesn't depend on the file size.
+
+            Args:
+                payload (DirectFileParameters): File to upload
+                chunk_size (int): Size of the chunks sent
+                progress (Optional[Progress]): Called after every chunk with the bytes
+                                               sent so far and the total size, if known
+        """
+        url = urljoin(
+            self.base_url,
+            DIRECT_FILE_ENDPOINT % (payload.id, payload.filename)
+        )
+        source = payload.filename if payload.file is None else payload.file
+        size = upload.source_size(source)
+        response = await self._request(
+            endpoint='direct_file_upload',
+            method='PUT',
+            url=url,
+            headers={} if size is None else {'Content-Length': str(size)},
+            body=upload.Body(source, lambda: upload.aiter_chunks(source, chunk_size, progress))
+        )
+        logging.debug("direct_file_upload: %s %s %s", response, response.url, size)
+        if response.is_success:
+            return self._parse('direct_file_upload', responses.DirectFileResponse, response)
+        return self._parse('direct_file_upload', responses.ErrorResponse, response)
+
+    async def get_conversion_status(
+        self,
+        payload: parameters.GetStatusParameters
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """ Get Status of the Conversion
+
+            In order to get status of a conversion you need to do this request
+            with <id>, obtained on previous step.
+        """
+        url = urljoin(
+            self.base_url,
+            GET_STATUS_ENDPOINT % payload.id
+        )
+        response = await self._request(
+            endpoint='get_conversion_status',
+            method='GET',
+            url=url
+        )
+        logging.debug("get_conversion_status: %s %s", response, response.url)
+        if response.is_success:
+            status = self._parse('get_conversion_status', responses.GetStatusResponse, response)
+        else:
+            status = self._parse('get_conversion_status', responses.ErrorResponse, response)
+        if self.job_store is not None:
+            await _in_thread(self.job_store.observe_status, payload.id, status)
+        return status
+
+    async def get_result_file(
+        self,
+        payload: parameters.GetResultParameters
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        """ Get Result File Content
+
+            In order to get result file of a conversion you need to do the following request.
+
+            As an alternative to this step you may use output URL from previous step,
+            but be advised, that this URL is bounded to the host IP address and
+            can't be hotlinked or shared with third parties.
+        """
+        url = urljoin(
+            self.base_url,
+            GET_RESULT_ENDPOINT % payload.id
+        )
+        response = await self._request(
+            endpoint='get_result_file',
+            method='GET',
+            url=url
+        )
+        logging.debug("get_result_file: %s %s", response, response.url)
+        if response.is_success:
+            if self.offload is None or len(response.content) < self.offload.threshold:
+                result = self._parse('get_result_file', responses.GetResultResponse, response)
+            else:
+                started = time.perf_counter()
+                result = await self.offload.aparse_result(response.content)
+                if self.instrumentation is not None:
+                    self.instrumentation.parse('get_result_file', 'GetResultResponse',
+                                               time.perf_counter() - started)
+            if self.job_store is not None:
+                await _in_thread(self.job_store.update, payload.id, state=jobs.COLLECTED)
+            return result
+        return self._parse('get_result_file', responses.ErrorResponse, response)
+
+    async def delete_or_cancel_conversion(
+        self,
+        payload: parameters.DeleteCancelParameters
+    ) -> Union[responses.DeleteCancelResponse, responses.ErrorResponse]:
+        """Delete File/Cancel Conversion"""
+        url = urljoin(
+            self.base_url,
+            DELETE_CANCEL_ENDPOINT % payload.id
+        )
+        response = await self._request(
+            endpoint='delete_or_cancel_conversion',
+            method='DELETE',
+            url=url
+        )
+        logging.debug("delete_or_cancel_conversion: %s %s", response, response.url)
+        if response.is_success:
+            if self.job_store is not None:
+                await _in_thread(self.job_store.remove, payload.id)
+            return self._parse(
+                'delete_or_cancel_conversion', responses.DeleteCancelResponse, response
+            )
+        return self._parse('delete_or_cancel_conversion', responses.ErrorResponse, response)
+
+    async def list_conversions(
+        self,
+        payload: parameters.ListConversionParameters,
+        *,
+        compact: bool = False
+    ) -> Union[responses.ListConversionResponse, ConversionTable, responses.ErrorResponse]:
+        """
+            List of Conversions
+
+            With {compact}, rows are returned in a column-oriented `ConversionTable`
+            instead of one model per row.
+
+            Example Result:
+                code=200
+                status='ok'
+                data=[
+                    Data(
+                        id='5ad5ea6f719178beff43cca991ed1109',
+                        status='finished',
+                        minutes=1,
+                        inputformat='PNG',
+                        outputformat='JPEG',
+                        filename='SCAN_20140710_090651322.png',
+                        error=None
+                    )
+                ]    
+        """
+        url = urljoin(self.base_url, LIST_CONVERSION_ENDPOINT)
+        data = {"apikey": self.api_key, **payload.dict(exclude_none=True)}
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        }
+        response = await self._request(
+            endpoint='list_conversions',
+            method='POST',
+            url=url,
+            headers=headers,
+            json=data
+        )
+        logging.debug("list_conversions: %s %s %s", response, response.url, LogPayload(data))
+        if response.is_success:
+            if compact:
+                conversions = records.ConversionTable.from_payload(response.content)
+                rows = conversions.records()
+            else:
+                conversions = self._parse(
+                    'list_conversions', responses.ListConversionResponse, response
+                )
+                rows = conversions.data
+            if self.ledger is not None:
+                self.ledger.observe_usage(rows)
+            return conversions
+        return self._parse('list_conversions', responses.ErrorResponse, response)
+
+    async def download_result_file( # pylint: disable=too-many-arguments
+        self,
+        payload: parameters.GetResultParameters,
+        destination: download.Destination,
+        chunk_size: int = download.CHUNK_SIZE,
+        resume: bool = False,
+        segments: int = 1
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """ Download Result File
+
+            Streams the output file (`GetStatusResponse.Data.Output.url`) into
+            {destination} in chunks of {chunk_size} bytes, unlike `get_result_file`
+            which holds the whole base64-encoded content in memory.
+
+            With {resume} or {segments}, the file is downloaded with HTTP Range
+            requests to `{destination}.part`, renamed once its size matches
+            `Output.size`: dropped connections are resumed from the last byte
+            written, and so is a partial file left by an earlier call. Files of
+            at least `ranges.MIN_SEGMENT_SIZE` bytes per segment are fetched as
+            {segments} parallel ranges.
+
+            Args:
+                payload (GetResultParameters): Conversion to download
+                destination (Destination): Path or binary file object, a path with {resume}
+                chunk_size (int): Size of the chunks written to {destination}
+                resume (bool): Resumable download
+                segments (int): Ranges downloaded in parallel, implies {resume}
+            Returns:
+                Status of the finished conversion, ErrorResponse if it isn't finished
+        """
+        if (resume or segments > 1) and not isinstance(destination, (str, os.PathLike)):
+            raise TypeError("Resumable downloads need a path destination")
+        status = await self.get_conversion_status(
+            payload=parameters.GetStatusParameters(id=payload.id)
+        )
+        if isinstance(status, responses.ErrorResponse):
+            return status
+        if status.data.step != 'finish':
+            return responses.ErrorResponse(code=422, status='error', error=FILE_NOT_READY_ERROR)
+        if resume or segments > 1:
+            await ranges.afetch(
+                self.session, status.data.output.url, destination, int(status.data.output.size),
+                segments, chunk_size, self._download_retry()
+            )
+        else:
+            await download.astream_to(self.session, status.data.output.url, destination, chunk_size)
+        if self.job_store is not None:
+            await _in_thread(self.job_store.update, payload.id, state=jobs.COLLECTED)
+        return status
+
+    async def download_result_files( # pylint: disable=too-many-arguments
+        self,
+        payload: parameters.GetResultParameters,
+        directory: Union[str, os.PathLike],
+        mode: str = 'zip',
+        concurrency: Optional[int] = None,
+        chunk_size: int = download.CHUNK_SIZE
+    ) -> Union[AsyncIterator[outputs.OutputFile], responses.ErrorResponse]:
+        """ Download Result Files
+
+            Async counterpart of `ConvertIO.download_result_files`.
+
+            Returns:
+                Async iterator of `OutputFile`, files are downloaded as it's consumed,
+                ErrorResponse if the conversion isn't finished
+        """
+        if mode not in outputs.MODES:
+            raise ValueError("mode must be one of %s" % (outputs.MODES,))
+        status = await self.get_conversion_status(
+            payload=parameters.GetStatusParameters(id=payload.id)
+        )
+        if isinstance(status, responses.ErrorResponse):
+            return status
+        if status.data.step != 'finish':
+            return responses.ErrorResponse(code=422, status='error', error=FILE_NOT_READY_ERROR)
+        return self._download_result_files(
+            payload.id, status.data.output, directory, mode,
+            concurrency or outputs.CONCURRENCY, chunk_size
+        )
+
+    async def _download_result_files( # pylint: disable=too-many-arguments
+        self,
+        conversion_id: str,
+        output: responses.GetStatusResponse.Data.Output,
+        directory: Union[str, os.PathLike],
+        mode: str,
+        concurrency: int,
+        chunk_size: int
+    ) -> AsyncIterator[outputs.OutputFile]:
+        names = outputs.file_names(output)
+        if not names:
+            yield await outputs.afetch_file(
+                self.session, output.url, outputs.single_name(output.url), directory, chunk_size
+            )
+        elif mode == outputs.PARALLEL:
+            async for output_file in outputs.afetch_files(
+                self.session, output.url, names, directory, concurrency, chunk_size
+            ):
+                yield output_file
+        else:
+            async with self.session.stream('GET', output.url) as response:
+                response.raise_for_status()
+                async for output_file in outputs.aextract_zip(
+                    response.aiter_bytes(chunk_size), directory, chunk_size
+                ):
+                    yield output_file
+        if self.job_store is not None:
+            await _in_thread(self.job_store.update, conversion_id, state=jobs.COLLECTED)
+
+    async def wait_for_conversion(
+        self,
+        conversion_id: str,
+        poll_interval: float = POLL_INTERVAL,
+        timeout: Optional[float] = None
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """ Wait for a Conversion to finish
+
+            Polls the status of {conversion_id} until it reaches the 'finish' step.
+
+            Args:
+                conversion_id (str): Conversion to wait for
+                poll_interval (float): Seconds between status requests
+                timeout (Optional[float]): Raise `TimeoutError` if the conversion
+                                           hasn't finished after {timeout} seconds
+            Returns:
+                Status of the finished conversion, or the first ErrorResponse
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        status_payload = parameters.GetStatusParameters(id=conversion_id)
+        while True:
+            status = await self.get_conversion_status(payload=status_payload)
+            if isinstance(status, responses.ErrorResponse) or status.data.step == 'finish':
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("Conversion %s timed out" % conversion_id)
+            await asyncio.sleep(poll_interval)
+
+    async def convert(
+        self,
+        payload: parameters.NewConversionParameters,
+        poll_interval: float = POLL_INTERVAL,
+        timeout: Optional[float] = None
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        """ Convert a File
+
+            Starts a new conversion, polls its status until it finishes and
+            returns the result file content. With a result cache, previously
+            converted inputs are served from it without any request. With
+            `coalesce`, concurrent calls for the same conversion share one.
+
+            Args:
+                payload (NewConversionParameters): Conversion to start
+                poll_interval (float): Seconds between status requests
+                timeout (Optional[float]): Raise `TimeoutError` if the conversion
+                                           hasn't finished after {timeout} seconds
+        """
+        key = None
+        if self.cache is not None or self.coalesce:
+            # Hashes the input file, and the cache reads from disk
+            key = await _in_thread(cache.conversion_key, payload)
+        if key is not None and self.cache is not None:
+            cached = await _in_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+        if key is not None and self.coalesce:
+            return await self._in_flight.do(
+                key, self._convert, payload, poll_interval, timeout, key
+            )
+        return await self._convert(payload, poll_interval, timeout, key)
+
+    async def _convert(
+        self,
+        payload: parameters.NewConversionParameters,
+        poll_interval: float,
+        timeout: Optional[float],
+        key: Optional[str] = None
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        conversion = await self.new_conversion(payload=payload)
+        if isinstance(conversion, responses.ErrorResponse):
+            return conversion
+        status = await self.wait_for_conversion(conversion.data.id, poll_interval, timeout)
+        if isinstance(status, responses.ErrorResponse):
+            return status
+        result = await self.get_result_file(
+            payload=parameters.GetResultParameters(id=conversion.data.id)
+        )
+        if key is not None and self.cache is not None and isinstance(
+            result, responses.GetResultResponse
+        ):
+            await _in_thread(self.cache.put, key, result)
+        return result
+
+    def convert_many(
+        self,
+        payloads: Iterable[parameters.NewConversionParameters],
+        concurrency: Optional[int] = None,
+        **kwargs
+    ) -> AsyncIterator[bulk.ConversionResult]:
+        """ Convert many Files concurrently
+
+            Runs `convert` for up to {concurrency} payloads at once on the event loop
+            (default: `bulk.CONCURRENCY`) and yields `bulk.ConversionResult`s as they
+            complete, not in input order.
+            Failed items are reported in their result and never stop the batch.
+            Extra keyword arguments are passed to `convert`.
+        """
+        return bulk.aconvert_many(
+            self, payloads, concurrency=concurrency or bulk.CONCURRENCY, **kwargs
+        )
+
+    async def delete_many(
+        self,
+        conversion_ids: Iterable[str],
+        concurrency: Optional[int] = None
+    ) -> bulk.DeleteReport:
+        """ Delete Files/Cancel Conversions concurrently
+
+            Runs `delete_or_cancel_conversion` for up to {concurrency} IDs at once on
+            the event loop (default: `bulk.CONCURRENCY`) and aggregates the responses,
+            API errors and exceptions into a `bulk.DeleteReport`.
+        """
+        return await bulk.adelete_many(
+            self, conversion_ids, concurrency=concurrency or bulk.CONCURRENCY
+        )
@@ -7,7 +7,8 @@ import httpx
 
 from . import client
 from .languages import Languages
-from .models import parameters
+from .models import parameters, responses
+from .testing import FakeConvertIO
 
 
 class TestConvertIOClient(unittest.TestCase):
@@ -16,7 +17,7 @@ class TestConvertIOClient(unittest.TestCase):
         self.convertio_client = client.ConvertIO(api_key="test")
         self.httpx_request = mock.Mock()
         self.httpx_request_patcher = mock.patch.object(
-            httpx,
+            httpx.Client,
             'request',
             new=self.httpx_request
         )
@@ -90,12 +91,12 @@ class TestConvertIOClient(unittest.TestCase):
             expected_output
         )
 
-    @mock.patch('urllib.request.urlopen')
-    def test_direct_file_upload_fail(self, _):
+    def test_direct_file_upload_fail(self):
         """test direct_file_upload response fail"""
         payload = parameters.DirectFileParameters(
             id="9712d01edc82e49c68d58ae6346d2013",
-            filename="file.png"
+            filename="file.png",
+            file=b"_FILE_CONTENT_"
         )
         expected_output = {
             "code": 401,
@@ -112,12 +113,12 @@ class TestConvertIOClient(unittest.TestCase):
             expected_output
         )
 
-    @mock.patch('urllib.request.urlopen')
-    def test_direct_file_upload_success(self, _):
+    def test_direct_file_upload_success(self):
         """test direct_file_upload response success"""
         payload = parameters.DirectFileParameters(
             id="9712d01edc82e49c68d58ae6346d2013",
-            filename="file.png"
+            filename="file.png",
+            file=b"_FILE_CONTENT_"
         )
         expected_output = {
             "code": 200,
@@ -356,5 +357,151 @@ class TestConvertIOClient(unittest.TestCase):
         )
 
 
+class TestConvertIOSession(unittest.TestCase):
+    """Test ConvertIO Client connection pool"""
+
+    def test_context_manager_closes_session(self):
+        """test session is closed on exit"""
+        with client.ConvertIO(api_key="test") as convertio_client:
+            self.assertFalse(convertio_client.session.is_closed)
+        self.assertTrue(convertio_client.session.is_closed)
+
+    def test_session_is_reused(self):
+        """test every endpoint goes through the same connection"""
+        fake = FakeConvertIO()
+        with fake.serve() as base_url, client.ConvertIO(
+            api_key="test",
+            base_url=base_url,
+            max_connections=1
+        ) as convertio_client:
+            conversion = convertio_client.new_conversion(
+                payload=parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                           outputformat="pdf")
+            )
+            status = convertio_client.get_conversion_status(
+                payload=parameters.GetStatusParameters(id=conversion.data.id)
+            )
+            result = convertio_client.get_result_file(
+                payload=parameters.GetResultParameters(id=conversion.data.id)
+            )
+
+        self.assertEqual(status.data.step, "finish")
+        self.assertEqual(result.data.content, b"\0" * fake.result_size)
+        self.assertEqual(len(fake.requests), 3)
+        self.assertEqual(fake.connections, 1)
+
+
+class TestAsyncConvertIOClient(unittest.IsolatedAsyncioTestCase):
+    """Test Async ConvertIO Client"""
+
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeConvertIO()
+        self.convertio_client = client.AsyncConvertIO(
+            api_key="test",
+            transport=self.fake.transport()
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.convertio_client.aclose()
+
+    async def new_conversion(self, **kwargs):
+        """Start a conversion on the fake API"""
+        return await self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(
+                file="http://file_url/file.png",
+                outputformat="pdf",
+                **kwargs
+            )
+        )
+
+    async def test_new_conversion_success(self):
+        """test new_conversion response success"""
+        response = await self.new_conversion()
+
+        self.assertIsInstance(response, responses.NewConversionResponse)
+        self.assertEqual(response.data.minutes, 999)
+
+    async def test_new_conversion_fail(self):
+        """test new_conversion response fail"""
+        self.convertio_client.api_key = ""
+
+        response = await self.new_conversion()
+
+        self.assertIsInstance(response, responses.ErrorResponse)
+        self.assertEqual(response.code, 401)
+
+    async def test_direct_file_upload_success(self):
+        """test direct_file_upload response success"""
+        conversion = await self.new_conversion(input="upload", filename="file.png")
+
+        response = await self.convertio_client.direct_file_upload(
+            payload=parameters.DirectFileParameters(
+                id=conversion.data.id,
+                filename="file.png",
+                file=iter([b"_FILE_", b"CONTENT_"])
+            )
+        )
+
+        self.assertIsInstance(response, responses.DirectFileResponse)
+        self.assertEqual(response.data.file, "file.png")
+        self.assertEqual(self.fake.conversions[conversion.data.id].content, b"_FILE_CONTENT_")
+
+    async def test_get_conversion_status_success(self):
+        """test get_conversion_status response success"""
+        conversion = await self.new_conversion()
+
+        response = await self.convertio_client.get_conversion_status(
+            payload=parameters.GetStatusParameters(id=conversion.data.id)
+        )
+
+        self.assertIsInstance(response, responses.GetStatusResponse)
+        self.assertEqual(response.data.step, "finish")
+
+    async def test_get_conversion_status_fail(self):
+        """test get_conversion_status response fail"""
+        response = await self.convertio_client.get_conversion_status(
+            payload=parameters.GetStatusParameters(id="unknown")
+        )
+
+        self.assertIsInstance(response, responses.ErrorResponse)
+        self.assertEqual(response.code, 404)
+
+    async def test_get_result_file_success(self):
+        """test get_result_file response success"""
+        conversion = await self.new_conversion()
+
+        response = await self.convertio_client.get_result_file(
+            payload=parameters.GetResultParameters(id=conversion.data.id)
+        )
+
+        self.assertIsInstance(response, responses.GetResultResponse)
+        self.assertEqual(response.data.content, b"\0" * self.fake.result_size)
+
+    async def test_delete_or_cancel_conversion_success(self):
+        """test delete_or_cancel_conversion response success"""
+        conversion = await self.new_conversion()
+
+        response = await self.convertio_client.delete_or_cancel_conversion(
+            payload=parameters.DeleteCancelParameters(id=conversion.data.id)
+        )
+
+        self.assertIsInstance(response, responses.DeleteCancelResponse)
+        self.assertNotIn(conversion.data.id, self.fake.conversions)
+
+    async def test_list_conversions_success(self):
+        """test list_conversions response success"""
+        conversions = [await self.new_conversion() for _ in range(3)]
+
+        response = await self.convertio_client.list_conversions(
+            payload=parameters.ListConversionParameters(status="finished", count=2)
+        )
+
+        self.assertIsInstance(response, responses.ListConversionResponse)
+        self.assertEqual(
+            [row.id for row in response.data],
+            [conversion.data.id for conversion in conversions[:0:-1]]
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
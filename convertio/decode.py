@@ -0,0 +1,107 @@
+"""
+    Fast Response Decoding
+    Builds response models from trusted API payloads without running the full
+    pydantic validation, decoding JSON with orjson when it is installed.
+"""
+from typing import Any, Callable, Dict, Optional, Type, TypeVar
+import json
+
+import pydantic
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+
+try:
+    import orjson
+except ImportError: # pragma: no cover
+    orjson = None
+
+
+Model = TypeVar('Model', bound=pydantic.BaseModel)
+
+# Model -> _Plan
+_PLANS: Dict[type, "_Plan"] = {}
+
+
+def loads(content: bytes) -> Any:
+    """Decode a JSON payload, with orjson if available"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _is_model(type_: Any) -> bool:
+    return isinstance(type_, type) and issubclass(type_, pydantic.BaseModel)
+
+
+def _field_builder(model: type, field: ModelField) -> Optional[Callable[[Any], Any]]:
+    if field.class_validators:
+        # Custom validators transform the value (e.g. base64 content), keep them
+        def validate(value):
+            value, errors = field.validate(value, {}, loc=field.name, cls=model)
+            if errors:
+                raise pydantic.ValidationError([errors], model)
+            return value
+        return validate
+    if field.shape == SHAPE_LIST and _is_model(field.type_):
+        item_model = field.type_
+        return lambda value: [construct(item_model, item) for item in value]
+    if field.shape == SHAPE_SINGLETON and _is_model(field.type_):
+        return lambda value: construct(field.type_, value) if isinstance(value, dict) else value
+    if field.sub_fields and field.shape == SHAPE_SINGLETON:
+        # Union: build the first model member from objects, anything else is kept as is
+        members = [sub_field.type_ for sub_field in field.sub_fields if _is_model(sub_field.type_)]
+        if members:
+            return lambda value: construct(members[0], value) if isinstance(value, dict) else value
+    return None
+
+
+class _Plan: # pylint: disable=too-few-public-methods
+    """How to build a model: its fields, their defaults and the builders of nested values"""
+
+    def __init__(self, model: type):
+        fields = model.__fields__
+        self.names = frozenset(fields)
+        self.defaults = {name: field.get_default() for name, field in fields.items()}
+        self.builders = [
+            (name, builder) for name, builder in (
+                (name, _field_builder(model, field)) for name, field in fields.items()
+            ) if builder is not None
+        ]
+        self.aliases = {field.alias: name for name, field in fields.items() if field.alias != name}
+
+
+def _plan(model: type) -> _Plan:
+    plan = _PLANS.get(model)
+    if plan is None:
+        plan = _PLANS[model] = _Plan(model)
+    return plan
+
+
+def construct(model: Type[Model], data: Dict[str, Any]) -> Model:
+    """ Build {model} from a trusted payload
+
+    Nested models are built the same way, fields with custom validators are
+    still validated. Values aren't coerced, and unknown keys are ignored like
+    in the regular validation path.
+    """
+    plan = _plan(model)
+    if plan.aliases:
+        data = {plan.aliases.get(key, key): value for key, value in data.items()}
+    keys = data.keys()
+    if keys <= plan.names:
+        values = {**plan.defaults, **data}
+        fields_set = set(keys)
+    else:
+        fields_set = plan.names & keys
+        values = {**plan.defaults, **{name: data[name] for name in fields_set}}
+    for name, builder in plan.builders:
+        if values[name] is not None:
+            values[name] = builder(values[name])
+    instance = model.__new__(model)
+    object.__setattr__(instance, '__dict__', values)
+    object.__setattr__(instance, '__fields_set__', fields_set)
+    return instance
+
+
+def parse(model: Type[Model], content: bytes) -> Model:
+    """Decode a JSON payload into {model} without the full validation"""
+    return construct(model, loads(content))
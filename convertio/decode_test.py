@@ -0,0 +1,96 @@
+"""Fast Response Decoding tests"""
+import base64
+import json
+import unittest
+from unittest import mock
+
+from . import client, decode
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+PAYLOADS = [
+    (responses.ErrorResponse, {"code": 401, "status": "error", "error": "Invalid API Key"}),
+    (responses.NewConversionResponse, {"code": 200, "status": "ok",
+                                       "data": {"id": "a", "minutes": 10}}),
+    (responses.GetStatusResponse, {"code": 200, "status": "ok", "data": {
+        "id": "a", "step": "finish", "step_percent": 100, "minutes": 1,
+        "output": {"url": "http://file_url/a.pdf", "size": "3"}
+    }}),
+    (responses.GetStatusResponse, {"code": 200, "status": "ok", "data": {
+        "id": "a", "step": "convert", "step_percent": 50, "minutes": 1, "output": []
+    }}),
+    (responses.GetResultResponse, {"code": 200, "status": "ok", "data": {
+        "id": "a", "encode": "base64", "content": base64.b64encode(b"result").decode()
+    }}),
+    (responses.DeleteCancelResponse, {"code": 200, "status": "ok", "message": "File deleted"}),
+    (responses.ListConversionResponse, {"code": 200, "status": "ok", "data": [{
+        "id": "a", "status": "failed", "minutes": 0, "inputformat": "PNG",
+        "outputformat": "PDF", "filename": "a.png", "error": "Conversion failed"
+    }, {
+        "id": "b", "status": "finished", "minutes": 1, "inputformat": "PNG",
+        "outputformat": "PDF", "filename": "b.png", "unknown": True
+    }]}),
+]
+
+
+class TestDecode(unittest.TestCase):
+    """Test decode"""
+
+    def test_matches_validated_models(self):
+        """test fast decoding builds the same models as validation"""
+        for model, payload in PAYLOADS:
+            with self.subTest(model=model.__name__):
+                fast = decode.parse(model, json.dumps(payload).encode())
+
+                self.assertIsInstance(fast, model)
+                self.assertEqual(fast, model(**payload))
+                self.assertEqual(fast.__fields_set__, model(**payload).__fields_set__)
+
+    def test_nested_models(self):
+        """test nested objects are built as their models"""
+        status = decode.construct(responses.GetStatusResponse, PAYLOADS[2][1])
+        listed = decode.construct(responses.ListConversionResponse, PAYLOADS[-1][1])
+
+        self.assertIsInstance(status.data.output, responses.GetStatusResponse.Data.Output)
+        self.assertIsNone(status.data.output.files)
+        self.assertIsInstance(listed.data[1], responses.ListConversionResponse.Data)
+        self.assertIsNone(listed.data[1].error)
+        self.assertNotIn('unknown', listed.data[1].dict())
+
+    def test_result_content_decoded(self):
+        """test validators still run on fields that have them"""
+        result = decode.construct(responses.GetResultResponse, PAYLOADS[4][1])
+
+        self.assertEqual(result.data.content, b"result")
+
+    def test_json_fallback(self):
+        """test payloads decode without orjson"""
+        with mock.patch.object(decode, 'orjson', None):
+            self.assertEqual(decode.loads(b'{"a": [1]}'), {"a": [1]})
+
+
+class TestClientFastDecode(unittest.TestCase):
+    """Test ConvertIO with fast_decode"""
+
+    def test_convert(self):
+        """test a conversion through the fast path"""
+        fake = FakeConvertIO()
+        with client.ConvertIO(api_key="test", transport=fake.transport(),
+                              fast_decode=True) as convertio_client:
+            result = convertio_client.convert(
+                parameters.NewConversionParameters(file="raw content", input="raw",
+                                                   filename="a.txt", outputformat="pdf")
+            )
+            listed = convertio_client.list_conversions(parameters.ListConversionParameters(count=1))
+            missing = convertio_client.get_conversion_status(
+                payload=parameters.GetStatusParameters(id="missing")
+            )
+
+        self.assertEqual(result.data.content, b"raw content")
+        self.assertEqual(listed.data[0].filename, "a.txt")
+        self.assertIsInstance(missing, responses.ErrorResponse)
+
+
+if __name__ == "__main__":
+    unittest.main()
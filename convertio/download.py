@@ -0,0 +1,67 @@
+"""
+    Result Downloads
+    Stream conversion results to disk in fixed-size chunks,
+    so memory use doesn't depend on the file size.
+"""
+from typing import BinaryIO, Iterator, Union
+from contextlib import contextmanager
+import os
+
+import httpx
+
+
+# Size of the chunks written to the destination
+CHUNK_SIZE = 1024 * 1024
+
+Destination = Union[str, os.PathLike, BinaryIO]
+
+
+@contextmanager
+def open_destination(destination: Destination, mode: str = 'wb') -> Iterator[BinaryIO]:
+    """Open a path for writing, file objects are used as is and left open"""
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, mode) as file:
+            yield file
+    else:
+        yield destination
+
+
+def stream_to(
+    session: httpx.Client,
+    url: str,
+    destination: Destination,
+    chunk_size: int = CHUNK_SIZE
+) -> int:
+    """ Download {url} into {destination} chunk by chunk
+
+    Args:
+        session (httpx.Client): Client used for the download
+        url (str): URL of the file
+        destination (Destination): Path or binary file object
+        chunk_size (int): Size of the chunks written to {destination}
+    Returns:
+        Number of bytes written
+    """
+    written = 0
+    with session.stream('GET', url) as response:
+        response.raise_for_status()
+        with open_destination(destination) as file:
+            for chunk in response.iter_bytes(chunk_size):
+                written += file.write(chunk)
+    return written
+
+
+async def astream_to(
+    session: httpx.AsyncClient,
+    url: str,
+    destination: Destination,
+    chunk_size: int = CHUNK_SIZE
+) -> int:
+    """Async counterpart of `stream_to`"""
+    written = 0
+    async with session.stream('GET', url) as response:
+        response.raise_for_status()
+        with open_destination(destination) as file:
+            async for chunk in response.aiter_bytes(chunk_size):
+                written += file.write(chunk)
+    return written
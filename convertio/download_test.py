@@ -0,0 +1,101 @@
+"""Result Downloads tests"""
+import io
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from . import client
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+class TestDownloadResultFile(unittest.TestCase):
+    """Test ConvertIO.download_result_file"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO()
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport())
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+
+    def tearDown(self) -> None:
+        self.convertio_client.close()
+        self.directory.cleanup()
+
+    def new_conversion(self) -> parameters.GetResultParameters:
+        """Start a conversion on the fake API"""
+        conversion = self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                       outputformat="pdf")
+        )
+        return parameters.GetResultParameters(id=conversion.data.id)
+
+    def test_download_to_path(self):
+        """test result is written to a path"""
+        path = os.path.join(self.directory.name, "a.pdf")
+
+        status = self.convertio_client.download_result_file(self.new_conversion(), path)
+
+        self.assertIsInstance(status, responses.GetStatusResponse)
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), b"\0" * self.fake.result_size)
+
+    def test_download_to_file_object(self):
+        """test result is written to a file object, left open"""
+        file = io.BytesIO()
+
+        self.convertio_client.download_result_file(self.new_conversion(), file)
+
+        self.assertFalse(file.closed)
+        self.assertEqual(file.getvalue(), b"\0" * self.fake.result_size)
+
+    def test_download_not_ready(self):
+        """test unfinished conversions return an ErrorResponse"""
+        self.fake.convert_time = 60
+        file = io.BytesIO()
+
+        response = self.convertio_client.download_result_file(self.new_conversion(), file)
+
+        self.assertIsInstance(response, responses.ErrorResponse)
+        self.assertEqual(file.getvalue(), b"")
+
+    def test_download_constant_memory(self):
+        """test peak memory doesn't grow with the file size"""
+        self.fake.result_size = 64 * 1024 * 1024
+        payload = self.new_conversion()
+        path = os.path.join(self.directory.name, "a.pdf")
+
+        tracemalloc.start()
+        try:
+            self.convertio_client.download_result_file(payload, path, chunk_size=256 * 1024)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(os.path.getsize(path), self.fake.result_size)
+        self.assertLess(peak, 4 * 1024 * 1024)
+
+
+class TestAsyncDownloadResultFile(unittest.IsolatedAsyncioTestCase):
+    """Test AsyncConvertIO.download_result_file"""
+
+    async def test_download(self):
+        """test result is streamed to a file object"""
+        fake = FakeConvertIO(result_size=1024 * 1024)
+        file = io.BytesIO()
+        async with client.AsyncConvertIO(api_key="test", transport=fake.transport()) as convertio:
+            conversion = await convertio.new_conversion(
+                payload=parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                           outputformat="pdf")
+            )
+            status = await convertio.download_result_file(
+                parameters.GetResultParameters(id=conversion.data.id),
+                file
+            )
+
+        self.assertEqual(status.data.output.size, str(fake.result_size))
+        self.assertEqual(len(file.getvalue()), fake.result_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+"""
+    Instrumentation
+    Hooks called around every API request, a collector of per-endpoint
+    metrics exported in the Prometheus text format, and bounded payload
+    formatting for debug logs.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import bisect
+import itertools
+import threading
+
+import httpx
+
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Upper bounds in seconds of the response parsing histogram buckets
+PARSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# Longest logged payload, in characters
+MAX_LOG_CHARS = 256
+
+# Payload keys never logged
+REDACTED_KEYS = frozenset({'apikey'})
+
+# Prefix of the exported metric names
+METRICS_PREFIX = 'convertio'
+
+
+class Instrumentation:
+    """ Request Hooks
+
+    Subclass and override the hooks you need, then pass the instance to the client:
+
+        convertio = ConvertIO(api_key=..., instrumentation=MetricsCollector())
+
+    Hooks run on the calling thread (or event loop), they should be quick and not raise.
+    """
+
+    def request_start(self, endpoint: str, method: str, url: str, attempt: int) -> None:
+        """A request to {endpoint} is about to be sent, {attempt} starts at 1"""
+
+    def request_end( # pylint: disable=too-many-arguments
+        self,
+        endpoint: str,
+        duration: float,
+        response: Optional[httpx.Response] = None,
+        exception: Optional[Exception] = None,
+        bytes_sent: int = 0,
+        bytes_received: int = 0
+    ) -> None:
+        """A request to {endpoint} ended after {duration} seconds, with {response} or {exception}"""
+
+    def retry(self, endpoint: str, attempt: int, delay: float) -> None:
+        """{attempt} of a request to {endpoint} failed, the next one is in {delay} seconds"""
+
+    def parse(self, endpoint: str, model: str, duration: float) -> None:
+        """A response of {endpoint} was decoded into {model} in {duration} seconds"""
+
+
+class Histogram:
+    """ Histogram with fixed buckets
+
+    Args:
+        buckets (Tuple[float, ...]): Upper bounds of the buckets, ascending
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add {value}"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, observations up to it) pairs, the last bound is +inf"""
+        return list(zip(self.buckets + (float('inf'),), itertools.accumulate(self.counts)))
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the {fraction} quantile, None if empty"""
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= fraction * self.count:
+                return bound
+        return float('inf')
+
+
+class EndpointMetrics: # pylint: disable=too-few-public-methods
+    """Metrics of a single endpoint"""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.parse = Histogram(PARSE_BUCKETS)
+        self.responses: Dict[str, int] = {}
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+class MetricsCollector(Instrumentation):
+    """ Per-endpoint Metrics
+
+    Latency and parse time histograms, and counters of responses per status
+    code (`error` for transport errors), retries and bytes, per endpoint.
+
+        collector = MetricsCollector()
+        convertio = ConvertIO(api_key=..., instrumentation=collector)
+        ...
+        print(collector.prometheus())
+    """
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint: str) -> EndpointMetrics:
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints.setdefault(endpoint, EndpointMetrics())
+        return metrics
+
+    def request_end( # pylint: disable=too-many-arguments
+        self,
+        endpoint: str,
+        duration: float,
+        response: Optional[httpx.Response] = None,
+        exception: Optional[Exception] = None,
+        bytes_sent: int = 0,
+        bytes_received: int = 0
+    ) -> None:
+        status = str(response.status_code) if response is not None else 'error'
+        with self._lock:
+            metrics = self._endpoint(endpoint)
+            metrics.latency.observe(duration)
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+            metrics.bytes_sent += bytes_sent
+            metrics.bytes_received += bytes_received
+
+    def retry(self, endpoint: str, attempt: int, delay: float) -> None:
+        with self._lock:
+            self._endpoint(endpoint).retries += 1
+
+    def parse(self, endpoint: str, model: str, duration: float) -> None:
+        with self._lock:
+            self._endpoint(endpoint).parse.observe(duration)
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            name = "%s_%s" % (METRICS_PREFIX, name)
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            return name
+
+        def histogram(name: str, help_text: str, attribute: str) -> None:
+            name = family(name, 'histogram', help_text)
+            for endpoint, metrics in sorted(self.endpoints.items()):
+                values: Histogram = getattr(metrics, attribute)
+                for bound, total in values.cumulative():
+                    lines.append('%s_bucket{endpoint="%s",le="%s"} %s' % (
+                        name, endpoint, '+Inf' if bound == float('inf') else repr(bound), total
+                    ))
+                lines.append('%s_sum{endpoint="%s"} %r' % (name, endpoint, values.sum))
+                lines.append('%s_count{endpoint="%s"} %s' % (name, endpoint, values.count))
+
+        def counter(name: str, help_text: str, attribute: str) -> None:
+            name = family(name, 'counter', help_text)
+            for endpoint, metrics in sorted(self.endpoints.items()):
+                lines.append('%s{endpoint="%s"} %s' % (name, endpoint, getattr(metrics, attribute)))
+
+        with self._lock:
+            histogram('request_duration_seconds', 'API request latency.', 'latency')
+            histogram('parse_duration_seconds', 'Response decoding time.', 'parse')
+            name = family('responses_total', 'counter', 'API responses by status code.')
+            for endpoint, metrics in sorted(self.endpoints.items()):
+                for status, count in sorted(metrics.responses.items()):
+                    lines.append('%s{endpoint="%s",code="%s"} %s' % (name, endpoint, status, count))
+            counter('retries_total', 'Retried requests.', 'retries')
+            counter('sent_bytes_total', 'Request body bytes sent.', 'bytes_sent')
+            counter('received_bytes_total', 'Response body bytes received.', 'bytes_received')
+        return "\n".join(lines) + "\n"
+
+
+class LogPayload: # pylint: disable=too-few-public-methods
+    """ Request payload formatted for logs, only when the record is emitted
+
+    File contents are replaced by their size, the API key is redacted, and the
+    result is cut at {max_chars}.
+
+        logging.debug("new_conversion: %s", LogPayload(data))
+    """
+
+    def __init__(self, payload: Dict[str, Any], max_chars: int = MAX_LOG_CHARS):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    @staticmethod
+    def _value(key: str, value: Any) -> str:
+        if key in REDACTED_KEYS:
+            return "'***'"
+        if key == 'file' and isinstance(value, (str, bytes)) and len(value) > MAX_LOG_CHARS:
+            return "<%s %s>" % (len(value), 'chars' if isinstance(value, str) else 'bytes')
+        if key == 'file' and not isinstance(value, (str, bytes)):
+            return "<%s>" % type(value).__name__
+        if isinstance(value, (str, bytes)) and len(value) > MAX_LOG_CHARS:
+            value = value[:MAX_LOG_CHARS]
+        return repr(value)
+
+    def __str__(self) -> str:
+        text = "{%s}" % ", ".join(
+            "%r: %s" % (key, self._value(key, value)) for key, value in self.payload.items()
+        )
+        if len(text) > self.max_chars:
+            return text[:self.max_chars] + "...(%s chars)" % len(text)
+        return text
+
+    __repr__ = __str__
@@ -0,0 +1,156 @@
+"""Instrumentation tests"""
+import asyncio
+import logging
+import unittest
+
+import httpx
+
+from . import client, instrumentation, retry
+from .models import parameters
+from .testing import FakeConvertIO
+
+
+class Recorder(instrumentation.Instrumentation):
+    """Records every hook call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def request_start(self, endpoint, method, url, attempt):
+        self.calls.append(('start', endpoint, method, attempt))
+
+    def request_end(self, endpoint, duration, response=None, exception=None,
+                    bytes_sent=0, bytes_received=0):
+        self.calls.append(('end', endpoint, response.status_code if response else type(exception)))
+
+    def retry(self, endpoint, attempt, delay):
+        self.calls.append(('retry', endpoint, attempt))
+
+    def parse(self, endpoint, model, duration):
+        self.calls.append(('parse', endpoint, model))
+
+
+class TestHistogram(unittest.TestCase):
+    """Test Histogram"""
+
+    def test_cumulative_and_quantile(self):
+        """test buckets are cumulative and quantiles land on bucket bounds"""
+        histogram = instrumentation.Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.75), 1.0)
+        self.assertEqual(histogram.quantile(1), float('inf'))
+        self.assertIsNone(instrumentation.Histogram((1.0,)).quantile(0.5))
+
+
+class TestClientInstrumentation(unittest.TestCase):
+    """Test ConvertIO with instrumentation"""
+
+    def test_hooks(self):
+        """test hooks are called around requests, retries and parsing"""
+        fake = FakeConvertIO()
+        fake.inject(503)
+        recorder = Recorder()
+        with client.ConvertIO(api_key="test", transport=fake.transport(),
+                              retry=retry.RetryPolicy(backoff=0),
+                              instrumentation=recorder) as convertio_client:
+            convertio_client.get_conversion_status(
+                payload=parameters.GetStatusParameters(id="missing")
+            )
+
+        self.assertEqual(recorder.calls, [
+            ('start', 'get_conversion_status', 'GET', 1),
+            ('end', 'get_conversion_status', 503),
+            ('retry', 'get_conversion_status', 1),
+            ('start', 'get_conversion_status', 'GET', 2),
+            ('end', 'get_conversion_status', 404),
+            ('parse', 'get_conversion_status', 'ErrorResponse'),
+        ])
+
+    def test_transport_errors(self):
+        """test failed requests end with their exception"""
+        fake = FakeConvertIO()
+        fake.inject(exception=httpx.ConnectError)
+        recorder = Recorder()
+
+        async def list_conversions():
+            async with client.AsyncConvertIO(api_key="test", transport=fake.transport(),
+                                             instrumentation=recorder) as convertio_client:
+                await convertio_client.list_conversions(
+                    parameters.ListConversionParameters(count=1)
+                )
+
+        with self.assertRaises(httpx.ConnectError):
+            asyncio.run(list_conversions())
+        self.assertEqual(recorder.calls[-1], ('end', 'list_conversions', httpx.ConnectError))
+
+    def test_metrics_collector(self):
+        """test per-endpoint metrics and their Prometheus export"""
+        fake = FakeConvertIO(result_size=100)
+        collector = instrumentation.MetricsCollector()
+        with client.ConvertIO(api_key="test", transport=fake.transport(),
+                              instrumentation=collector) as convertio_client:
+            convertio_client.convert(
+                parameters.NewConversionParameters(file="http://file_url/a.png", outputformat="pdf")
+            )
+            convertio_client.get_conversion_status(
+                payload=parameters.GetStatusParameters(id="missing")
+            )
+
+        status = collector.endpoints['get_conversion_status']
+        self.assertEqual(status.responses, {'200': 1, '404': 1})
+        self.assertEqual(status.latency.count, 2)
+        self.assertEqual(status.parse.count, 2)
+        self.assertGreater(collector.endpoints['new_conversion'].bytes_sent, 0)
+        self.assertGreater(collector.endpoints['get_result_file'].bytes_received, 100)
+
+        text = collector.prometheus()
+        self.assertIn('# TYPE convertio_request_duration_seconds histogram', text)
+        self.assertIn('convertio_request_duration_seconds_bucket'
+                      '{endpoint="get_conversion_status",le="+Inf"} 2', text)
+        self.assertIn('convertio_responses_total{endpoint="get_conversion_status",code="404"} 1',
+                      text)
+        self.assertIn('convertio_retries_total{endpoint="new_conversion"} 0', text)
+        self.assertTrue(text.endswith('\n'))
+
+
+class TestLogPayload(unittest.TestCase):
+    """Test LogPayload"""
+
+    def test_bounded(self):
+        """test files, API keys and long values are never formatted in full"""
+        payload = instrumentation.LogPayload({
+            "apikey": "secret",
+            "file": "A" * 10000,
+            "filename": "a.png",
+        })
+
+        self.assertEqual(str(payload),
+                         "{'apikey': '***', 'file': <10000 chars>, 'filename': 'a.png'}")
+        self.assertEqual(
+            str(instrumentation.LogPayload({"file": open})),
+            "{'file': <builtin_function_or_method>}"
+        )
+        self.assertLessEqual(
+            len(str(instrumentation.LogPayload({str(i): "x" * 200 for i in range(10)}))),
+            instrumentation.MAX_LOG_CHARS + 20
+        )
+
+    def test_lazy(self):
+        """test payloads aren't formatted when debug logs are off"""
+        class Exploding:
+            """Fails when formatted"""
+            def __repr__(self):
+                raise AssertionError("formatted")
+
+        root = logging.getLogger()
+        self.addCleanup(root.setLevel, root.level)
+        root.setLevel(logging.INFO)
+        logging.debug("payload: %s", instrumentation.LogPayload({"options": Exploding()}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,370 @@
+"""
+    Job Store
+    Durable record of started conversions in SQLite, so a restarted worker
+    can collect or clean up the conversions it had started.
+"""
+# pylint: disable=too-many-instance-attributes
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Union
+from concurrent.futures import Future
+import io
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+
+import pydantic
+
+from .models import parameters, responses
+
+if TYPE_CHECKING:
+    from .client import ConvertIO
+    from .poller import StatusPoller
+
+
+# Job states
+RUNNING = 'running'
+FINISHED = 'finished'
+COLLECTED = 'collected'
+FAILED = 'failed'
+
+# Writes buffered before they are committed together
+BATCH_SIZE = 500
+
+# Seconds a buffered write may wait before it is committed
+FLUSH_INTERVAL = 0.5
+
+# Rows fetched per query when iterating jobs
+FETCH_SIZE = 1000
+
+# Client errors about the API key or the request rate, not about the conversion
+KEY_ERROR_CODES = frozenset({401, 403, 429})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT,
+    step TEXT,
+    state TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at, id);
+"""
+
+COLUMNS = ('id', 'payload', 'step', 'state', 'result', 'error', 'created_at', 'updated_at')
+
+UPDATABLE_COLUMNS = ('step', 'state', 'result', 'error')
+
+
+class Job(pydantic.BaseModel):
+    """ Recorded Conversion
+
+    Args:
+        id (str): Conversion ID
+        payload (Optional[dict]): Parameters of the conversion, without in-memory file contents
+        step (Optional[str]): Last known conversion step
+        state (str): running, finished, collected or failed
+        result (Optional[str]): Output URL once finished
+        error (Optional[str]): Error of a failed conversion
+        created_at (float): When the conversion was started, UNIX time
+        updated_at (float): Last update, UNIX time
+    """
+    id: str
+    payload: Optional[dict]
+    step: Optional[str]
+    state: str
+    result: Optional[str]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+
+def payload_dict(payload: parameters.NewConversionParameters) -> Dict[str, Any]:
+    """Parameters of a conversion as stored, local paths kept, file contents dropped"""
+    data = payload.dict(exclude_none=True)
+    if isinstance(payload.file, pathlib.Path):
+        data['file'] = str(payload.file)
+    elif isinstance(payload.file, (bytes, io.IOBase)) or payload.input in ('base64', 'raw'):
+        data.pop('file', None)
+    return data
+
+
+class JobStore:
+    """ SQLite Job Store
+
+    Records every conversion started through a client, its last known step
+    and result URL. The database is in WAL mode and writes are buffered, then
+    committed together every {batch_size} writes or {flush_interval} seconds.
+    Lookups by ID or state are indexed.
+
+        store = JobStore("jobs.sqlite3")
+        convertio = ConvertIO(api_key=..., job_store=store)
+
+        # after a restart
+        with StatusPoller(convertio) as poller:
+            futures = store.resume(convertio, poller, on_finished=collect)
+
+    Args:
+        path (str): Database file, created if missing
+        batch_size (int): Buffered writes committed together
+        flush_interval (float): Seconds a buffered write may wait, bounds what a crash loses
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._inserts: Dict[str, Dict[str, Any]] = {}
+        self._updates: Dict[str, Dict[str, Any]] = {}
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically,
+                                         name="convertio-jobs", daemon=True)
+        self._flusher.start()
+
+    def __enter__(self) -> "JobStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Commit buffered writes and close the database"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            self._flush()
+            self._connection.close()
+
+    def add(self, conversion_id: str, payload: parameters.NewConversionParameters) -> None:
+        """Record a started conversion"""
+        now = time.time()
+        row = {
+            'id': conversion_id,
+            'payload': json.dumps(payload_dict(payload)),
+            'step': None,
+            'state': RUNNING,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        with self._lock:
+            self._inserts[conversion_id] = row
+            self._flush_if_full()
+
+    def update(self, conversion_id: str, **fields: Optional[str]) -> None:
+        """ Record new {fields} of a conversion, ignored for unknown conversions
+
+        Args:
+            step, state, result, error (Optional[str]): Fields to set
+        """
+        unknown = set(fields) - set(UPDATABLE_COLUMNS)
+        if unknown:
+            raise TypeError("Can't update %s" % ", ".join(sorted(unknown)))
+        with self._lock:
+            pending = self._inserts.get(conversion_id)
+            if pending is None:
+                pending = self._updates.setdefault(conversion_id, {})
+            if pending.get('state') == COLLECTED:
+                # Collected jobs stay collected, even if their status is observed again
+                fields.pop('state', None)
+            pending.update(fields)
+            pending['updated_at'] = time.time()
+            self._flush_if_full()
+
+    def observe_status(self, conversion_id: str, status: Union[
+        responses.GetStatusResponse, responses.ErrorResponse
+    ]) -> None:
+        """Record a status response of a conversion"""
+        if isinstance(status, responses.ErrorResponse):
+            # Server and key errors don't tell anything about the conversion
+            if status.code < 500 and status.code not in KEY_ERROR_CODES:
+                self.update(conversion_id, state=FAILED, error=status.error)
+        elif status.data.step == 'finish':
+            output = status.data.output
+            # Output is an empty list until the conversion has one
+            url = output.url if not isinstance(output, list) else None
+            self.update(conversion_id, step=status.data.step, state=FINISHED, result=url)
+        else:
+            self.update(conversion_id, step=status.data.step)
+
+    def remove(self, conversion_id: str) -> None:
+        """Forget a conversion"""
+        with self._lock:
+            self._inserts.pop(conversion_id, None)
+            self._updates.pop(conversion_id, None)
+            self._connection.execute("DELETE FROM jobs WHERE id = ?", (conversion_id,))
+
+    def get(self, conversion_id: str) -> Optional[Job]:
+        """Recorded conversion {conversion_id}, None if unknown"""
+        with self._lock:
+            self._flush()
+            row = self._connection.execute(
+                "SELECT %s FROM jobs WHERE id = ?" % ", ".join(COLUMNS), (conversion_id,)
+            ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def jobs(self, state: Optional[str] = None) -> Iterator[Job]:
+        """Recorded conversions in {state}, or all, oldest first"""
+        with self._lock:
+            self._flush()
+        last = (-1.0, '')
+        while True:
+            # Keyset pagination, the database isn't locked between pages
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT %s FROM jobs WHERE %s (created_at, id) > (?, ?) "
+                    "ORDER BY created_at, id LIMIT ?" % (
+                        ", ".join(COLUMNS), "state = ? AND" if state else ""
+                    ),
+                    ((state,) if state else ()) + last + (FETCH_SIZE,)
+                ).fetchall()
+            for row in rows:
+                yield self._job(row)
+            if len(rows) < FETCH_SIZE:
+                return
+            last = (rows[-1][6], rows[-1][0])
+
+    def count(self, state: Optional[str] = None) -> int:
+        """Number of recorded conversions in {state}, or all"""
+        with self._lock:
+            self._flush()
+            if state is None:
+                return self._connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ?", (state,)
+            ).fetchone()[0]
+
+    def flush(self) -> None:
+        """Commit buffered writes"""
+        with self._lock:
+            self._flush()
+
+    def resume(
+        self,
+        convertio_client: "ConvertIO",
+        poller: "StatusPoller",
+        on_finished: Callable[[Job], None],
+        *,
+        cleanup: bool = False
+    ) -> List["Future[Job]"]:
+        """ Re-attach to recorded conversions
+
+        Running conversions are watched by {poller}. {on_finished} is called with
+        every finished conversion not collected yet, once it finishes or right away,
+        to download its result. If it returns, the job is marked collected and,
+        with {cleanup}, the conversion is deleted from the API and forgotten.
+        If it raises, the job stays finished for the next resume.
+
+        Returns:
+            Futures resolved with each job once it's collected or failed
+        """
+        futures = []
+        for job in self.jobs(RUNNING):
+            future: Future = Future()
+            poller.watch(job.id, callback=lambda status, job=job, future=future: self._ended(
+                convertio_client, job, status, on_finished, cleanup, future
+            ))
+            futures.append(future)
+        for job in self.jobs(FINISHED):
+            future = Future()
+            self._collect(convertio_client, job, on_finished, cleanup, future)
+            futures.append(future)
+        return futures
+
+    def _ended( # pylint: disable=too-many-arguments
+        self,
+        convertio_client: "ConvertIO",
+        job: Job,
+        status: Union[responses.GetStatusResponse, responses.ErrorResponse],
+        on_finished: Callable[[Job], None],
+        cleanup: bool,
+        future: Future
+    ) -> None:
+        self.observe_status(job.id, status)
+        job = self.get(job.id) or job
+        if job.state != FINISHED:
+            future.set_result(job)
+            return
+        self._collect(convertio_client, job, on_finished, cleanup, future)
+
+    def _collect( # pylint: disable=too-many-arguments
+        self,
+        convertio_client: "ConvertIO",
+        job: Job,
+        on_finished: Callable[[Job], None],
+        cleanup: bool,
+        future: Future
+    ) -> None:
+        try:
+            on_finished(job)
+        except Exception as exception: # pylint: disable=broad-except
+            logging.exception("JobStore: collecting %s failed", job.id)
+            future.set_exception(exception)
+            return
+        self.update(job.id, state=COLLECTED)
+        if cleanup:
+            convertio_client.delete_or_cancel_conversion(
+                payload=parameters.DeleteCancelParameters(id=job.id)
+            )
+            self.remove(job.id)
+        future.set_result(job.copy(update={'state': COLLECTED}))
+
+    @staticmethod
+    def _job(row: tuple) -> Job:
+        values = dict(zip(COLUMNS, row))
+        values['payload'] = json.loads(values['payload']) if values['payload'] else None
+        return Job(**values)
+
+    def _flush_if_full(self) -> None:
+        if len(self._inserts) + len(self._updates) >= self.batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._inserts and not self._updates:
+            return
+        inserts = [tuple(row[column] for column in COLUMNS) for row in self._inserts.values()]
+        updates = [
+            tuple(fields.get(column) for column in UPDATABLE_COLUMNS)
+            + (fields['updated_at'], conversion_id)
+            for conversion_id, fields in self._updates.items()
+        ]
+        self._inserts.clear()
+        self._updates.clear()
+        with self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO jobs (%s) VALUES (%s)" % (
+                    ", ".join(COLUMNS), ", ".join("?" * len(COLUMNS))
+                ),
+                inserts
+            )
+            self._connection.executemany(
+                "UPDATE jobs SET %s, updated_at = ? WHERE id = ?" % ", ".join(
+                    ("state = CASE state WHEN '%s' THEN state ELSE COALESCE(?, state) END"
+                     % COLLECTED) if column == 'state' else
+                    "%s = COALESCE(?, %s)" % (column, column) for column in UPDATABLE_COLUMNS
+                ),
+                updates
+            )
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                self._flush()
@@ -0,0 +1,151 @@
+"""Job Store tests"""
+import os
+import tempfile
+import time
+import unittest
+
+from . import client, jobs
+from .models import parameters, responses
+from .poller import StatusPoller
+from .testing import FakeConvertIO
+
+
+PAYLOAD = parameters.NewConversionParameters(file="http://file_url/a.png", outputformat="pdf")
+
+
+class TestJobStore(unittest.TestCase):
+    """Test JobStore"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, "jobs.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_persisted(self):
+        """test jobs survive reopening the store, in WAL mode"""
+        with jobs.JobStore(self.path) as store:
+            store.add("a", PAYLOAD)
+            store.update("a", step="convert")
+            store.add("b", parameters.NewConversionParameters(
+                file=b"content", input="base64", filename="b.png", outputformat="pdf"
+            ))
+            store.update("b", step="finish", state=jobs.FINISHED, result="http://host/b.pdf")
+            store.update("unknown", state=jobs.FAILED)
+
+        with jobs.JobStore(self.path) as store:
+            job = store.get("a")
+            self.assertEqual((job.state, job.step), (jobs.RUNNING, "convert"))
+            self.assertEqual(job.payload, {"file": "http://file_url/a.png", "input": "url",
+                                           "outputformat": "pdf"})
+            self.assertEqual(store.get("b").result, "http://host/b.pdf")
+            self.assertNotIn("file", store.get("b").payload)
+            self.assertIsNone(store.get("unknown"))
+            self.assertEqual(store.count(), 2)
+            connection = store._connection # pylint: disable=protected-access
+            self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_collected_stays_collected(self):
+        """test observing a finished status again doesn't undo a collection"""
+        finished = responses.GetStatusResponse(code=200, status="ok", data={
+            "id": "a", "step": "finish", "step_percent": 100, "minutes": 1,
+            "output": {"url": "http://host/a.pdf", "size": "1"}
+        })
+        with jobs.JobStore(self.path) as store:
+            store.add("a", PAYLOAD)
+            store.update("a", state=jobs.COLLECTED)
+            store.observe_status("a", finished)
+            self.assertEqual(store.get("a").state, jobs.COLLECTED)
+            store.observe_status("a", finished)
+            self.assertEqual(store.get("a").state, jobs.COLLECTED)
+            store.observe_status("a", responses.ErrorResponse(code=503, status="error", error="x"))
+            self.assertEqual(store.get("a").error, None)
+
+    def test_key_errors_not_failed(self):
+        """test rejected key or rate limited status requests leave the job running"""
+        with jobs.JobStore(self.path) as store:
+            store.add("a", PAYLOAD)
+            for code in (401, 403, 429, 503):
+                store.observe_status("a", responses.ErrorResponse(code=code, status="error",
+                                                                  error="x"))
+            self.assertEqual(store.get("a").state, jobs.RUNNING)
+
+            store.observe_status("a", responses.ErrorResponse(code=404, status="error",
+                                                              error="x"))
+            self.assertEqual((store.get("a").state, store.get("a").error), (jobs.FAILED, "x"))
+
+    def test_many_jobs(self):
+        """test hundreds of thousands of jobs are written in batches and looked up by index"""
+        with jobs.JobStore(self.path, batch_size=5000) as store:
+            started = time.monotonic()
+            for index in range(200000):
+                store.add("%032x" % index, PAYLOAD)
+            for index in range(0, 200000, 100):
+                store.update("%032x" % index, state=jobs.FINISHED)
+            store.flush()
+            written = time.monotonic() - started
+
+            started = time.monotonic()
+            for index in range(0, 200000, 997):
+                self.assertIsNotNone(store.get("%032x" % index))
+            finished = list(store.jobs(jobs.FINISHED))
+            looked_up = time.monotonic() - started
+
+            connection = store._connection # pylint: disable=protected-access
+            plan = " ".join(row[-1] for row in connection.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM jobs WHERE state = ? ORDER BY created_at, id",
+                (jobs.FINISHED,)
+            ))
+
+        self.assertEqual(len(finished), 2000)
+        self.assertEqual(len({job.id for job in finished}), 2000)
+        self.assertIn("jobs_state", plan)
+        self.assertLess(written, 30)
+        self.assertLess(looked_up, 5)
+
+
+class TestResume(unittest.TestCase):
+    """Test resuming conversions after a restart"""
+
+    def test_resume(self):
+        """test running jobs are watched, finished ones collected, then cleaned up"""
+        fake = FakeConvertIO(convert_time=0.3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "jobs.sqlite3")
+            with jobs.JobStore(path) as store, client.ConvertIO(
+                api_key="test", transport=fake.transport(), job_store=store
+            ) as convertio_client:
+                ids = [convertio_client.new_conversion(payload=PAYLOAD).data.id for _ in range(3)]
+                time.sleep(0.3)
+                # Observed finished, then the worker stopped before collecting it
+                convertio_client.get_conversion_status(
+                    payload=parameters.GetStatusParameters(id=ids[0])
+                )
+                # Collected before the worker stopped
+                convertio_client.get_result_file(payload=parameters.GetResultParameters(id=ids[1]))
+                convertio_client.new_conversion(payload=PAYLOAD)
+                del fake.conversions[list(fake.conversions)[-1]]
+
+            collected = []
+            with jobs.JobStore(path) as store, client.ConvertIO(
+                api_key="test", transport=fake.transport(), job_store=store
+            ) as convertio_client, StatusPoller(convertio_client, max_interval=0.1) as poller:
+                futures = store.resume(
+                    convertio_client, poller,
+                    on_finished=lambda job: collected.append(job.id),
+                    cleanup=True
+                )
+                results = [future.result(timeout=5) for future in futures]
+
+                self.assertEqual(sorted(collected), sorted([ids[0], ids[2]]))
+                self.assertEqual(sorted(job.state for job in results),
+                                 [jobs.COLLECTED, jobs.COLLECTED, jobs.FAILED])
+                self.assertEqual([job.id for job in store.jobs()], [ids[1]] + [
+                    job.id for job in results if job.state == jobs.FAILED
+                ])
+                self.assertNotIn(ids[0], fake.conversions)
+
+
+if __name__ == "__main__":
+    unittest.main()
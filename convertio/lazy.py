@@ -0,0 +1,37 @@
+"""
+    Lazy Imports
+    Modules imported on first attribute access, so importing the client
+    doesn't pay for the features a process never uses.
+"""
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """ Module imported on first attribute access
+
+        responses = LazyModule('convertio.models.responses')
+        responses.ErrorResponse  # imports convertio.models.responses
+
+    Args:
+        name (str): Absolute module name
+    """
+
+    def __getattr__(self, attribute: str):
+        # Only called for attributes not copied yet, the import is thread-safe
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+    def __dir__(self):
+        return dir(importlib.import_module(self.__name__))
+
+    def __repr__(self) -> str:
+        return "<lazy module %r>" % self.__name__
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """{name} module if already imported, a `LazyModule` otherwise"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,81 @@
+"""Lazy Imports tests"""
+import subprocess
+import sys
+import unittest
+
+from . import lazy
+
+
+# Modules `import convertio.client` must not load
+DEFERRED_MODULES = (
+    'asyncio',
+    'concurrent.futures',
+    'pydantic',
+    'orjson',
+    'convertio.bulk',
+    'convertio.cache',
+    'convertio.decode',
+    'convertio.models.parameters',
+    'convertio.models.responses',
+    'convertio.records',
+    'convertio.singleflight',
+)
+
+# Import time of convertio.client in microseconds, httpx excluded
+IMPORT_BUDGET = 100_000
+
+
+def import_times(statement: str) -> dict:
+    """Cumulative import time per module of {statement}, from `-X importtime`"""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestLazyModule(unittest.TestCase):
+    """Test LazyModule"""
+
+    def test_imported_on_access(self):
+        """test the module is imported on first attribute access"""
+        module = lazy.LazyModule('json')
+
+        self.assertEqual(module.dumps([1]), '[1]')
+        self.assertIn('loads', dir(module))
+
+    def test_already_imported(self):
+        """test modules already imported are returned as is"""
+        self.assertIs(lazy.lazy_import('unittest'), unittest)
+        self.assertIsInstance(lazy.lazy_import('convertio.not_imported'), lazy.LazyModule)
+
+
+class TestImportTime(unittest.TestCase):
+    """Guard the cold-start cost of the client"""
+
+    def test_client_defers_heavy_modules(self):
+        """test importing the client loads none of the deferred modules"""
+        times = import_times("import convertio.client")
+
+        self.assertIn('convertio.client', times)
+        self.assertEqual([name for name in DEFERRED_MODULES if name in times], [])
+        self.assertLess(times['convertio.client'] - times.get('httpx', 0), IMPORT_BUDGET)
+
+    def test_package_exports(self):
+        """test `import convertio` loads nothing until a name is used"""
+        subprocess.run([sys.executable, '-c', "\n".join([
+            "import sys, convertio",
+            "assert 'convertio.client' not in sys.modules",
+            "convertio.ConvertIO",
+            "assert 'convertio.client' in sys.modules",
+            "assert 'convertio.models.responses' not in sys.modules",
+        ])], check=True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,12 @@
+"""
+    Request parameters and response models, imported on first access
+"""
+import importlib
+
+__all__ = ['parameters', 'responses']
+
+
+def __getattr__(name: str):
+    if name not in __all__:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    return importlib.import_module('.' + name, __name__)
@@ -1,6 +1,10 @@
 """Test Parameters"""
+import io
+import pathlib
 import unittest
 
+import pydantic
+
 from . import parameters, responses
 
 
@@ -34,7 +38,8 @@ class TestParameters(unittest.TestCase):
                 "ocr_settings": {
                     "page_nums": "1,2,3",
                     "langs": ["ara", "heb"]
-                }
+                },
+                "callback_url": "http://callback_url"
             }
         }
 
@@ -45,6 +50,21 @@ class TestParameters(unittest.TestCase):
             {"input": "url", **data}
         )
 
+    def test_new_conversion_local_file(self):
+        """Test NewConversionParameters with local files"""
+        for file in (pathlib.Path("file.png"), io.BytesIO(b"content")):
+            new_conversion = parameters.NewConversionParameters(
+                file=file,
+                filename="file.png",
+                outputformat="pdf",
+                input="base64"
+            )
+
+            self.assertIs(new_conversion.file, file)
+
+            with self.assertRaises(pydantic.ValidationError):
+                parameters.NewConversionParameters(file=file, outputformat="pdf")
+
 
 class TestResponses(unittest.TestCase):
     """Test ConverIO responses"""
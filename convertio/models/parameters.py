@@ -1,7 +1,9 @@
 """Conversion models"""
 # pylint: disable=too-few-public-methods
-from typing import Optional
+from typing import Any, Optional, Union
 from enum import Enum
+import io
+import pathlib
 
 import pydantic
 
@@ -30,11 +32,13 @@ class ConversionStatus(Enum):
 
 
 class OCRParameters(pydantic.BaseModel):
-    """ Conversion Options [OCR]
+    """ Conversion Options [OCR, Callback]
     
     Args:
         ocr_enabled (Optional[bool]): Setting it to true enables OCR
         ocr_settings (Optional[Settings]): Required, if ocr_enable = True
+        callback_url (Optional[str]): URL notified when the conversion is finished or failed,
+                                      called with `id` and `step` parameters
     """
     class OCRSettings(pydantic.BaseModel):
         """ Settings
@@ -51,6 +55,7 @@ class OCRParameters(pydantic.BaseModel):
 
     ocr_enabled: Optional[bool]
     ocr_settings: Optional[OCRSettings]
+    callback_url: Optional[str]
 
 
 class NewConversionParameters(pydantic.BaseModel):
@@ -64,8 +69,10 @@ class NewConversionParameters(pydantic.BaseModel):
                         raw,
                         base64,
                         upload
-        file (str): URL of the input file (if input=url),
-                    or file content (if input = raw/base64)
+        file (str|bytes|Path|IOBase): URL of the input file (if input=url),
+                    or file content (if input = raw/base64).
+                    With input = base64, a local `pathlib.Path` or binary file object
+                    is base64-encoded incrementally while the request is sent
         filename (Optional[str]): Input filename including extension (file.ext).
                                   Required if input = raw/base64
         outputformat (str): Output format, to which the file should be converted to.
@@ -76,7 +83,7 @@ class NewConversionParameters(pydantic.BaseModel):
                                   and callback example here:
                                    https://developers.convertio.co/tr/api/docs/#options_callback
     """
-    file: str|bytes
+    file: Union[str, bytes, pathlib.Path, io.IOBase]
     filename: Optional[str]
     outputformat: str
     options: Optional[OCRParameters]
@@ -85,6 +92,16 @@ class NewConversionParameters(pydantic.BaseModel):
     class Config:
         """Config"""
         use_enum_values = True
+        arbitrary_types_allowed = True
+
+    @pydantic.root_validator(skip_on_failure=True)
+    @classmethod
+    def validate_file(cls, values: dict) -> dict:
+        """Valdiate local files are only used with input = base64"""
+        if (not isinstance(values["file"], (str, bytes))
+                and values["input"] != AllowedConversionInputs.BASE64.value):
+            raise ValueError("local files require input = base64")
+        return values
 
 
 class DirectFileParameters(pydantic.BaseModel):
@@ -93,9 +110,12 @@ class DirectFileParameters(pydantic.BaseModel):
     Args:
         id (str): Conversion ID, obtained on POST call to /convert
         filename (str): Input filename including extension (file.ext)
+        file (Optional[Any]): File to upload: local path, binary file object, bytes
+                              or iterable of byte chunks. (default: local file {filename})
     """
     id: str
     filename: str
+    file: Optional[Any]
 
 
 class GetStatusParameters(pydantic.BaseModel):
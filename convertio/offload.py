@@ -0,0 +1,250 @@
+"""
+    Process Offload
+    Base64 decoding and encoding of large payloads in a process pool, so they
+    don't hold the GIL of threads sending requests. Payloads go through shared
+    memory, not pickled copies.
+"""
+from typing import Callable, Optional, Tuple, Union
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+import asyncio
+import binascii
+import json
+import multiprocessing
+import threading
+
+from .models import responses
+
+
+# Payloads below this size in bytes are processed on the calling thread
+THRESHOLD = 8 * 1024 * 1024
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def default_context():
+    """ Multiprocessing context of the workers
+
+    'forkserver' where available, 'spawn' otherwise: the pool starts on first
+    use, usually from a process already running request threads, which
+    'fork' would copy mid-operation (held locks included).
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _decode(source_name: str, size: int, target_name: str) -> Tuple[int, None]:
+    """Decode base64 {source_name} into {target_name}, in a worker"""
+    source = shared_memory.SharedMemory(name=source_name)
+    target = shared_memory.SharedMemory(name=target_name)
+    try:
+        with source.buf[:size] as data:
+            decoded = binascii.a2b_base64(data)
+        target.buf[:len(decoded)] = decoded
+        return len(decoded), None
+    finally:
+        source.close()
+        target.close()
+
+
+def _encode(source_name: str, size: int, target_name: str) -> Tuple[int, None]:
+    """Encode {source_name} as base64 into {target_name}, in a worker"""
+    source = shared_memory.SharedMemory(name=source_name)
+    target = shared_memory.SharedMemory(name=target_name)
+    try:
+        with source.buf[:size] as data:
+            encoded = binascii.b2a_base64(data, newline=False)
+        target.buf[:len(encoded)] = encoded
+        return len(encoded), None
+    finally:
+        source.close()
+        target.close()
+
+
+def _decode_result(source_name: str, size: int, target_name: str) -> Tuple[int, dict]:
+    """Parse a `get_result_file` body, decoded content into {target_name}, in a worker"""
+    source = shared_memory.SharedMemory(name=source_name)
+    target = shared_memory.SharedMemory(name=target_name)
+    try:
+        with source.buf[:size] as data:
+            body = json.loads(bytes(data))
+        decoded = binascii.a2b_base64(body['data'].pop('content'))
+        target.buf[:len(decoded)] = decoded
+        return len(decoded), body
+    finally:
+        source.close()
+        target.close()
+
+
+def _result_response(body: dict, content: bytes) -> responses.GetResultResponse:
+    """GetResultResponse of a parsed {body}, {content} already decoded"""
+    # Validating the content would base64-decode it again
+    return responses.GetResultResponse.construct(
+        code=body['code'],
+        status=body['status'],
+        data=responses.GetResultResponse.Data.construct(
+            id=body['data']['id'],
+            type=body['data'].get('type'),
+            encode=body['data'].get('encode'),
+            content=content
+        )
+    )
+
+
+class _Shared:
+    """Shared memory blocks of a single offloaded call"""
+
+    def __init__(self, data: Buffer, target_size: int):
+        self.size = len(data)
+        self.source = shared_memory.SharedMemory(create=True, size=max(self.size, 1))
+        try:
+            self.target = shared_memory.SharedMemory(create=True, size=max(target_size, 1))
+        except BaseException:
+            self._release(self.source)
+            raise
+        self.source.buf[:self.size] = data
+
+    def result(self, size: int) -> bytes:
+        """First {size} bytes written by the worker"""
+        return bytes(self.target.buf[:size])
+
+    @staticmethod
+    def _release(block: shared_memory.SharedMemory) -> None:
+        block.close()
+        block.unlink()
+
+    def release(self) -> None:
+        """Free both blocks"""
+        self._release(self.source)
+        self._release(self.target)
+
+
+class ProcessOffload:
+    """ Process pool for base64 work on large payloads
+
+    `binascii` holds the GIL while decoding or encoding, so a few large results
+    decoded by worker threads stall every other thread of the process. Payloads
+    of {threshold} bytes or more are copied into shared memory and processed by
+    one of {workers} processes, smaller ones on the calling thread. The pool is
+    started on first use.
+
+        with ProcessOffload() as offload:
+            convertio = ConvertIO(api_key=..., offload=offload)
+            convertio.get_result_file(payload)  # parsed and decoded in the pool
+
+    Hashing isn't offloaded: `hashlib` already releases the GIL on large buffers.
+
+    Args:
+        workers (Optional[int]): Number of worker processes, one per CPU by default
+        threshold (int): Size in bytes from which payloads are offloaded
+        mp_context (Optional[BaseContext]): Multiprocessing context of the workers,
+                                            `default_context()` if None
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        threshold: int = THRESHOLD,
+        mp_context=None
+    ):
+        self.workers = workers
+        self.threshold = threshold
+        self.mp_context = mp_context
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ProcessOffload":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _submit(self, function: Callable, shared: _Shared) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=self.mp_context or default_context()
+                )
+            return self._executor.submit(
+                function, shared.source.name, shared.size, shared.target.name
+            )
+
+    @staticmethod
+    def _release(shared: _Shared, future: Optional[Future]) -> None:
+        """Free {shared} once the worker running {future} is done with it"""
+        if future is None or future.done():
+            shared.release()
+        else:
+            # The caller was interrupted, the worker may still attach to the blocks
+            future.add_done_callback(lambda _: shared.release())
+
+    def _run(self, function: Callable, data: Buffer, target_size: int):
+        shared, future = _Shared(data, target_size), None
+        try:
+            future = self._submit(function, shared)
+            size, extra = future.result()
+            return shared.result(size), extra
+        finally:
+            self._release(shared, future)
+
+    async def _arun(self, function: Callable, data: Buffer, target_size: int):
+        shared, future = _Shared(data, target_size), None
+        try:
+            future = self._submit(function, shared)
+            size, extra = await asyncio.wrap_future(future)
+            return shared.result(size), extra
+        finally:
+            self._release(shared, future)
+
+    def b64decode(self, data: Union[Buffer, str]) -> bytes:
+        """Decode base64 {data}, in the pool if it's large, like `base64.decodebytes`"""
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        if len(data) < self.threshold:
+            return binascii.a2b_base64(data)
+        return self._run(_decode, data, len(data) * 3 // 4 + 3)[0]
+
+    def b64encode(self, data: Buffer) -> bytes:
+        """Encode {data} as base64, in the pool if it's large, like `base64.b64encode`"""
+        if len(data) < self.threshold:
+            return binascii.b2a_base64(data, newline=False)
+        return self._run(_encode, data, 4 * -(-len(data) // 3))[0]
+
+    def parse_result(self, content: bytes) -> responses.GetResultResponse:
+        """ GetResultResponse of a `get_result_file` response body
+
+        JSON parsing and base64 decoding run in the pool if {content} is large.
+        """
+        if len(content) < self.threshold:
+            return responses.GetResultResponse(**json.loads(content))
+        decoded, body = self._run(_decode_result, content, len(content) * 3 // 4 + 3)
+        return _result_response(body, decoded)
+
+    async def ab64decode(self, data: Union[Buffer, str]) -> bytes:
+        """Async counterpart of `b64decode`"""
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        if len(data) < self.threshold:
+            return binascii.a2b_base64(data)
+        return (await self._arun(_decode, data, len(data) * 3 // 4 + 3))[0]
+
+    async def ab64encode(self, data: Buffer) -> bytes:
+        """Async counterpart of `b64encode`"""
+        if len(data) < self.threshold:
+            return binascii.b2a_base64(data, newline=False)
+        return (await self._arun(_encode, data, 4 * -(-len(data) // 3)))[0]
+
+    async def aparse_result(self, content: bytes) -> responses.GetResultResponse:
+        """Async counterpart of `parse_result`"""
+        if len(content) < self.threshold:
+            return responses.GetResultResponse(**json.loads(content))
+        decoded, body = await self._arun(_decode_result, content, len(content) * 3 // 4 + 3)
+        return _result_response(body, decoded)
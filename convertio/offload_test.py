@@ -0,0 +1,121 @@
+"""Process Offload tests"""
+import asyncio
+import base64
+import json
+import os
+import unittest
+import warnings
+
+from . import client, offload
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+DATA = os.urandom(300 * 1024 + 1)
+
+
+class TestProcessOffload(unittest.TestCase):
+    """Test ProcessOffload"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.offload = offload.ProcessOffload(workers=2, threshold=64 * 1024)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.offload.close()
+
+    def test_b64(self):
+        """test large and small payloads match base64"""
+        for data in (DATA, DATA[:100], b""):
+            with self.subTest(size=len(data)):
+                encoded = self.offload.b64encode(data)
+                self.assertEqual(encoded, base64.b64encode(data))
+                self.assertEqual(self.offload.b64decode(encoded), data)
+                self.assertEqual(self.offload.b64decode(encoded.decode()), data)
+
+    def test_decode_with_newlines(self):
+        """test decoding ignores line breaks, like base64.decodebytes"""
+        self.assertEqual(self.offload.b64decode(base64.encodebytes(DATA)), DATA)
+
+    def test_parse_result(self):
+        """test result bodies are parsed and decoded in the pool"""
+        body = json.dumps({"code": 200, "status": "ok", "data": {
+            "id": "abc", "encode": "base64", "content": base64.b64encode(DATA).decode()
+        }}).encode()
+
+        result = self.offload.parse_result(body)
+
+        self.assertEqual(result, responses.GetResultResponse(**json.loads(body)))
+
+    def test_invalid(self):
+        """test worker errors are raised to the caller"""
+        with self.assertRaises(ValueError):
+            self.offload.parse_result(b"{" * (128 * 1024))
+
+    def test_shared_memory_released(self):
+        """test no shared memory block is left behind"""
+        before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.offload.b64decode(self.offload.b64encode(DATA))
+        after = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+        self.assertEqual(after - before, set())
+
+    def test_default_context(self):
+        """test workers aren't forked from the calling process by default"""
+        self.assertIn(offload.default_context().get_start_method(), ("forkserver", "spawn"))
+
+    def test_cancelled_shared_memory_released(self):
+        """test shared memory outlives a cancelled call until its worker ends"""
+        before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        encoded = base64.b64encode(DATA * 8)
+
+        async def cancel():
+            task = asyncio.ensure_future(self.offload.ab64decode(encoded))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            asyncio.run(cancel())
+            # Waits for the worker, the blocks are freed once it's done
+            self.assertEqual(self.offload.b64decode(encoded), DATA * 8)
+            self.offload.close()
+        after = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+        self.assertEqual(after - before, set())
+
+    def test_client(self):
+        """test get_result_file offloads large results"""
+        fake = FakeConvertIO(result_size=len(DATA))
+        with client.ConvertIO(api_key="test", transport=fake.transport(),
+                              offload=self.offload) as convertio_client:
+            result = convertio_client.convert(
+                parameters.NewConversionParameters(file="http://file_url/a.doc",
+                                                   outputformat="pdf"),
+                poll_interval=0
+            )
+
+        self.assertIsInstance(result, responses.GetResultResponse)
+        self.assertEqual(result.data.content, b"\0" * len(DATA))
+
+    def test_async(self):
+        """test async counterparts with concurrent calls"""
+        async def run():
+            return await asyncio.gather(
+                self.offload.ab64decode(base64.b64encode(DATA)),
+                self.offload.ab64decode(base64.b64encode(DATA[1:])),
+                self.offload.ab64encode(DATA)
+            )
+
+        decoded, shifted, encoded = asyncio.run(run())
+
+        self.assertEqual((decoded, shifted, encoded), (DATA, DATA[1:], base64.b64encode(DATA)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,407 @@
+"""
+    Multi-file Outputs
+    Conversions with several output files (e.g. a multi-page DOC to JPG) have
+    `output.files` set and `output.url` pointing at a ZIP of them. The files are
+    either extracted from the ZIP entry by entry while it streams, or fetched
+    from `output.url/<file.ext>` concurrently, and handed back as each is written.
+"""
+# pylint: disable=too-many-instance-attributes
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, urlparse
+import asyncio
+import os
+import pathlib
+import struct
+import zipfile
+import zlib
+
+import httpx
+import pydantic
+
+from . import download
+from .models import responses
+
+
+# Ways of fetching multi-file outputs
+ZIP = 'zip'
+PARALLEL = 'parallel'
+MODES = (ZIP, PARALLEL)
+
+# Output files downloaded at once in parallel mode
+CONCURRENCY = 4
+
+# Suffix of files being written
+PARTIAL_SUFFIX = '.part'
+
+LOCAL_FILE_HEADER = b'PK\x03\x04'
+CENTRAL_DIRECTORY_HEADER = b'PK\x01\x02'
+END_OF_CENTRAL_DIRECTORY = b'PK\x05\x06'
+DATA_DESCRIPTOR = b'PK\x07\x08'
+LOCAL_FILE_HEADER_SIZE = 30
+ZIP64_EXTRA_ID = 0x0001
+FLAG_ENCRYPTED = 0x0001
+FLAG_DATA_DESCRIPTOR = 0x0008
+FLAG_UTF8 = 0x0800
+
+
+class OutputFile(pydantic.BaseModel):
+    """ Downloaded output file
+
+    Args:
+        name (str): File name, as in `output.files` or the ZIP
+        path (str): Where the file was written
+        size (int): Size in bytes
+    """
+    name: str
+    path: str
+    size: int
+
+
+def file_names(output: Union[responses.GetStatusResponse.Data.Output, list]) -> List[str]:
+    """Names of the files of a multi-file {output}, empty for single-file outputs"""
+    if isinstance(output, list) or not output.files:
+        return []
+    return list(output.files)
+
+
+def target_path(directory: Union[str, os.PathLike], name: str) -> pathlib.Path:
+    """Path of the output file {name} in {directory}, refusing names escaping it"""
+    root = pathlib.Path(directory).resolve()
+    path = (root / name).resolve()
+    if root not in path.parents:
+        raise ValueError("Output file name %r escapes %s" % (name, root))
+    return path
+
+
+class _Entry: # pylint: disable=too-few-public-methods
+    """ZIP entry being extracted, written to a partial file renamed once verified"""
+    __slots__ = ('name', 'path', 'partial', 'file', 'crc', 'checksum', 'size', 'remaining',
+                 'descriptor', 'zip64', 'decompressor')
+
+    def __init__(self, name: str, path: Optional[pathlib.Path], descriptor: bool, zip64: bool):
+        self.name = name
+        self.path = path
+        self.partial = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.partial = path.with_name(path.name + PARTIAL_SUFFIX)
+        # Directory entries have no file, their data is discarded
+        self.file = open( # pylint: disable=consider-using-with
+            self.partial if self.partial is not None else os.devnull, 'wb'
+        )
+        self.crc = 0
+        self.checksum = 0
+        self.size = 0
+        self.remaining: Optional[int] = None
+        self.descriptor = descriptor
+        self.zip64 = zip64
+        self.decompressor = None
+
+
+class ZipExtractor:
+    """ Streaming ZIP extraction
+
+    Fed the ZIP chunk by chunk, writes each entry as soon as its data went
+    through, using the local file headers instead of the central directory at
+    the end. Memory use is bounded by the chunk size, whatever the ZIP size.
+    Stored and deflated entries are supported, with data descriptors and ZIP64.
+
+        extractor = ZipExtractor("pages/")
+        for chunk in response.iter_bytes():
+            for output_file in extractor.feed(chunk):
+                ...
+        extractor.close()
+
+    Args:
+        directory (str|PathLike): Directory receiving the files
+        chunk_size (int): Largest piece of decompressed data held at once
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike], chunk_size: int = download.CHUNK_SIZE):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._state: Callable[[List[OutputFile]], bool] = self._header
+        self._finished = False
+        self._entry: Optional[_Entry] = None
+
+    def feed(self, data: bytes) -> List[OutputFile]:
+        """Extract {data}, returns the files completed with it"""
+        if self._finished:
+            return []
+        self._buffer += data
+        completed: List[OutputFile] = []
+        try:
+            while not self._finished and self._state(completed):
+                pass
+        except BaseException:
+            self._abort()
+            raise
+        return completed
+
+    def close(self, abort: bool = False) -> None:
+        """ End of the ZIP, raises `zipfile.BadZipFile` if it was cut
+
+        With {abort}, the entry being written is removed and nothing is raised.
+        """
+        if not self._finished:
+            self._abort()
+            if not abort:
+                raise zipfile.BadZipFile("ZIP stream ended in the middle of an entry")
+
+    def _abort(self) -> None:
+        if self._entry is not None:
+            self._entry.file.close()
+            if self._entry.partial is not None:
+                os.remove(self._entry.partial)
+            self._entry = None
+
+    def _take(self, size: int) -> bytes:
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _header(self, completed: List[OutputFile]) -> bool: # pylint: disable=unused-argument
+        if len(self._buffer) < 4:
+            return False
+        signature = bytes(self._buffer[:4])
+        if signature in (CENTRAL_DIRECTORY_HEADER, END_OF_CENTRAL_DIRECTORY):
+            # Every entry went through, the rest is the directory of what was extracted
+            self._finished = True
+            self._buffer.clear()
+            return False
+        if signature != LOCAL_FILE_HEADER:
+            raise zipfile.BadZipFile("Bad local file header signature %r" % signature)
+        if len(self._buffer) < LOCAL_FILE_HEADER_SIZE:
+            return False
+        (_, flags, method, _, _, crc, compressed_size, _, name_length,
+         extra_length) = struct.unpack('<4xHHHHHIIIHH', self._buffer[:LOCAL_FILE_HEADER_SIZE])
+        if len(self._buffer) < LOCAL_FILE_HEADER_SIZE + name_length + extra_length:
+            return False
+        self._take(LOCAL_FILE_HEADER_SIZE)
+        name = self._take(name_length).decode('utf-8' if flags & FLAG_UTF8 else 'cp437')
+        extra = self._take(extra_length)
+        zip64 = False
+        for offset, field_id, field_size in _extra_fields(extra):
+            if field_id == ZIP64_EXTRA_ID and field_size >= 16:
+                compressed_size = struct.unpack_from('<QQ', extra, offset)[1]
+                zip64 = True
+        if flags & FLAG_ENCRYPTED:
+            raise zipfile.BadZipFile("Encrypted entry %r" % name)
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise zipfile.BadZipFile("Unsupported compression method %s of %r" % (method, name))
+        descriptor = bool(flags & FLAG_DATA_DESCRIPTOR)
+        if descriptor and method == zipfile.ZIP_STORED:
+            raise zipfile.BadZipFile("Stored entry %r has no size, it can't be streamed" % name)
+        path = None if name.endswith('/') else target_path(self.directory, name)
+        self._entry = _Entry(name, path, descriptor, zip64)
+        self._entry.crc = crc
+        self._entry.remaining = None if descriptor else compressed_size
+        if method == zipfile.ZIP_DEFLATED:
+            self._entry.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._state = self._data
+        return True
+
+    def _write(self, data: bytes) -> None:
+        entry = self._entry
+        entry.file.write(data)
+        entry.checksum = zlib.crc32(data, entry.checksum)
+        entry.size += len(data)
+
+    def _data(self, completed: List[OutputFile]) -> bool:
+        entry = self._entry
+        remaining = entry.remaining
+        decompressor = entry.decompressor
+        if decompressor is None:
+            data = self._take(remaining)
+            entry.remaining -= len(data)
+            self._write(data)
+            if entry.remaining:
+                return False
+        else:
+            if not self._buffer and remaining != 0:
+                return False
+            data = self._take(len(self._buffer) if remaining is None else remaining)
+            if remaining is not None:
+                entry.remaining -= len(data)
+            self._write(decompressor.decompress(data, self.chunk_size))
+            while decompressor.unconsumed_tail and not decompressor.eof:
+                self._write(decompressor.decompress(decompressor.unconsumed_tail, self.chunk_size))
+            if not decompressor.eof:
+                if entry.remaining == 0:
+                    raise zipfile.BadZipFile("Truncated entry %r" % entry.name)
+                return False
+            self._buffer[:0] = decompressor.unused_data
+        if entry.descriptor:
+            self._state = self._descriptor
+            return True
+        self._complete(completed)
+        return True
+
+    def _descriptor(self, completed: List[OutputFile]) -> bool:
+        entry = self._entry
+        signed = self._buffer[:4] == DATA_DESCRIPTOR
+        size = (4 if signed else 0) + (20 if entry.zip64 else 12)
+        if len(self._buffer) < size:
+            return False
+        entry.crc = struct.unpack_from('<I', self._take(size), 4 if signed else 0)[0]
+        self._complete(completed)
+        return True
+
+    def _complete(self, completed: List[OutputFile]) -> None:
+        entry = self._entry
+        entry.file.close()
+        self._entry = None
+        self._state = self._header
+        if entry.checksum != entry.crc:
+            if entry.partial is not None:
+                os.remove(entry.partial)
+            raise zipfile.BadZipFile("Bad CRC-32 for entry %r" % entry.name)
+        if entry.path is None:
+            return
+        os.replace(entry.partial, entry.path)
+        completed.append(OutputFile(name=entry.name, path=str(entry.path),
+                                    size=entry.size))
+
+
+def _extra_fields(extra: bytes) -> Iterator[tuple]:
+    """(data offset, id, size) of the fields of a ZIP extra block"""
+    offset = 0
+    while offset + 4 <= len(extra):
+        field_id, field_size = struct.unpack_from('<HH', extra, offset)
+        yield offset + 4, field_id, field_size
+        offset += 4 + field_size
+
+
+def extract_zip(
+    chunks: Iterable[bytes],
+    directory: Union[str, os.PathLike],
+    chunk_size: int = download.CHUNK_SIZE
+) -> Iterator[OutputFile]:
+    """Extract the ZIP streamed as {chunks} into {directory}, yields each file once written"""
+    extractor = ZipExtractor(directory, chunk_size)
+    try:
+        for chunk in chunks:
+            yield from extractor.feed(chunk)
+    except BaseException:
+        # Closed before the end, or the chunks failed
+        extractor.close(abort=True)
+        raise
+    extractor.close()
+
+
+async def aextract_zip(
+    chunks: AsyncIterator[bytes],
+    directory: Union[str, os.PathLike],
+    chunk_size: int = download.CHUNK_SIZE
+) -> AsyncIterator[OutputFile]:
+    """Async counterpart of `extract_zip`"""
+    extractor = ZipExtractor(directory, chunk_size)
+    try:
+        async for chunk in chunks:
+            for output_file in extractor.feed(chunk):
+                yield output_file
+    except BaseException:
+        extractor.close(abort=True)
+        raise
+    extractor.close()
+
+
+def file_url(url: str, name: str) -> str:
+    """URL of the output file {name} of a multi-file output at {url}"""
+    return "%s/%s" % (url.rstrip('/'), quote(name))
+
+
+def single_name(url: str) -> str:
+    """Name of a single-file output, from its URL"""
+    return pathlib.PurePosixPath(urlparse(url).path).name or 'output'
+
+
+def fetch_file(
+    session: httpx.Client,
+    url: str,
+    name: str,
+    directory: Union[str, os.PathLike],
+    chunk_size: int = download.CHUNK_SIZE
+) -> OutputFile:
+    """Stream {url} to the file {name} in {directory}, renamed once complete"""
+    path = target_path(directory, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + PARTIAL_SUFFIX)
+    try:
+        size = download.stream_to(session, url, partial, chunk_size)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return OutputFile(name=name, path=str(path), size=size)
+
+
+async def afetch_file(
+    session: httpx.AsyncClient,
+    url: str,
+    name: str,
+    directory: Union[str, os.PathLike],
+    chunk_size: int = download.CHUNK_SIZE
+) -> OutputFile:
+    """Async counterpart of `fetch_file`"""
+    path = target_path(directory, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + PARTIAL_SUFFIX)
+    try:
+        size = await download.astream_to(session, url, partial, chunk_size)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return OutputFile(name=name, path=str(path), size=size)
+
+
+def fetch_files( # pylint: disable=too-many-arguments
+    session: httpx.Client,
+    url: str,
+    names: List[str],
+    directory: Union[str, os.PathLike],
+    concurrency: int = CONCURRENCY,
+    chunk_size: int = download.CHUNK_SIZE
+) -> Iterator[OutputFile]:
+    """ Fetch the output files {names} of a multi-file output at {url}
+
+    {concurrency} files are downloaded at once, each is yielded once written.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(fetch_file, session, file_url(url, name), name, directory, chunk_size)
+            for name in names
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+async def afetch_files( # pylint: disable=too-many-arguments
+    session: httpx.AsyncClient,
+    url: str,
+    names: List[str],
+    directory: Union[str, os.PathLike],
+    concurrency: int = CONCURRENCY,
+    chunk_size: int = download.CHUNK_SIZE
+) -> AsyncIterator[OutputFile]:
+    """Async counterpart of `fetch_files`"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(name: str) -> OutputFile:
+        async with semaphore:
+            return await afetch_file(session, file_url(url, name), name, directory, chunk_size)
+
+    tasks = [asyncio.ensure_future(fetch(name)) for name in names]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
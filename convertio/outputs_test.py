@@ -0,0 +1,247 @@
+"""Multi-file Outputs tests"""
+import asyncio
+import io
+import os
+import pathlib
+import tempfile
+import tracemalloc
+import unittest
+import zipfile
+
+from . import client, outputs
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+class Unseekable(io.RawIOBase):
+    """Write-only stream without seek/tell, zipfile then writes data descriptors"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.data += data
+        return len(data)
+
+
+def make_zip(files: dict, compression: int = zipfile.ZIP_DEFLATED, stream: bool = False,
+             force_zip64: bool = False) -> bytes:
+    """ZIP of {files}, written to an unseekable {stream} to get data descriptors"""
+    target = Unseekable() if stream else io.BytesIO()
+    with zipfile.ZipFile(target, 'w', compression) as archive:
+        for name, content in files.items():
+            with archive.open(name, 'w', force_zip64=force_zip64) as entry:
+                entry.write(content)
+    return bytes(target.data) if stream else target.getvalue()
+
+
+def chunked(data: bytes, size: int):
+    """{data} in chunks of {size} bytes"""
+    return (data[offset:offset + size] for offset in range(0, len(data), size))
+
+
+FILES = {
+    "page-1.jpg": b"first page" * 1000,
+    "page-2.jpg": os.urandom(5000),
+    "pages/page-3.jpg": b"",
+}
+
+
+class TestZipExtractor(unittest.TestCase):
+    """Test streaming ZIP extraction"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.root = pathlib.Path(self.directory.name)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def extract(self, data: bytes, chunk_size: int = 7):
+        """Extracted file names, checking their content"""
+        extracted = list(outputs.extract_zip(chunked(data, chunk_size), self.root))
+        for output_file in extracted:
+            self.assertEqual(pathlib.Path(output_file.path).read_bytes(), FILES[output_file.name])
+            self.assertEqual(output_file.size, len(FILES[output_file.name]))
+        return [output_file.name for output_file in extracted]
+
+    def test_extract(self):
+        """test stored, deflated, data descriptor and ZIP64 entries"""
+        for kwargs in (
+            {"compression": zipfile.ZIP_STORED},
+            {"compression": zipfile.ZIP_DEFLATED},
+            {"stream": True},
+            {"stream": True, "force_zip64": True},
+            {"force_zip64": True, "compression": zipfile.ZIP_STORED},
+        ):
+            with self.subTest(**kwargs):
+                self.assertEqual(self.extract(make_zip(FILES, **kwargs)), list(FILES))
+                self.assertEqual(list(self.root.rglob("*.part")), [])
+
+    def test_files_handed_back_as_written(self):
+        """test each file is yielded before the rest of the ZIP is received"""
+        data = make_zip(FILES)
+        extractor = outputs.ZipExtractor(self.root)
+        first_end = data.index(b"PK\x03\x04", 4)
+
+        completed = extractor.feed(data[:first_end + 4])
+
+        self.assertEqual([output_file.name for output_file in completed], ["page-1.jpg"])
+        self.assertFalse((self.root / "page-2.jpg").exists())
+
+    def test_bounded_memory(self):
+        """test extraction memory doesn't depend on the entry size"""
+        size = 64 * 1024 * 1024
+        data = make_zip({"large.bin": b"\0" * size}, stream=True)
+        tracemalloc.start()
+        try:
+            extracted = list(outputs.extract_zip(chunked(data, 64 * 1024), self.root, 64 * 1024))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(extracted[0].size, size)
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+    def test_truncated(self):
+        """test a cut ZIP raises and leaves no partial file"""
+        data = make_zip(FILES)
+
+        with self.assertRaises(zipfile.BadZipFile):
+            list(outputs.extract_zip(chunked(data[:len(data) // 2], 100), self.root))
+        self.assertEqual(list(self.root.rglob("*.part")), [])
+
+    def test_closed_early(self):
+        """test closing the extraction midway leaves no partial file open or behind"""
+        data = make_zip(FILES)
+        # The first entry and the start of the second one
+        split = data.index(b"PK\x03\x04", 4) + 100
+
+        extracted = outputs.extract_zip(iter([data[:split], data[split:]]), self.root)
+        self.assertEqual(next(extracted).name, "page-1.jpg")
+        extracted.close()
+
+        self.assertEqual(list(self.root.rglob("*.part")), [])
+
+        async def chunks():
+            yield data[:split]
+            yield data[split:]
+
+        async def first():
+            extracted = outputs.aextract_zip(chunks(), self.root)
+            output_file = await extracted.__anext__()
+            await extracted.aclose()
+            return output_file
+
+        self.assertEqual(asyncio.run(first()).name, "page-1.jpg")
+        self.assertEqual(list(self.root.rglob("*.part")), [])
+
+    def test_bad_crc(self):
+        """test corrupted entries raise"""
+        data = bytearray(make_zip({"a.txt": b"hello"}, compression=zipfile.ZIP_STORED))
+        data[data.index(b"hello")] = ord("j")
+
+        with self.assertRaises(zipfile.BadZipFile):
+            list(outputs.extract_zip([bytes(data)], self.root))
+        self.assertFalse((self.root / "a.txt").exists())
+
+    def test_unsafe_names(self):
+        """test entries escaping the directory are refused"""
+        data = make_zip({"../evil.txt": b"evil"})
+
+        with self.assertRaises(ValueError):
+            list(outputs.extract_zip([data], self.root))
+        self.assertFalse((self.root.parent / "evil.txt").exists())
+
+
+class TestDownloadResultFiles(unittest.TestCase):
+    """Test ConvertIO.download_result_files"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO(pages=5)
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport())
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.root = pathlib.Path(self.directory.name)
+
+    def tearDown(self) -> None:
+        self.convertio_client.close()
+        self.directory.cleanup()
+
+    def new_conversion(self) -> parameters.GetResultParameters:
+        """Start a conversion on the fake API"""
+        conversion = self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(file="http://file_url/a.doc",
+                                                       outputformat="jpg")
+        )
+        return parameters.GetResultParameters(id=conversion.data.id)
+
+    def check(self, files):
+        """Check every page was written"""
+        expected = self.fake.conversions[next(iter(self.fake.conversions))].files()
+        self.assertEqual(sorted(output_file.name for output_file in files), sorted(expected))
+        for output_file in files:
+            self.assertEqual(pathlib.Path(output_file.path).read_bytes(),
+                             expected[output_file.name])
+
+    def test_zip(self):
+        """test pages extracted from the streamed ZIP"""
+        files = list(self.convertio_client.download_result_files(self.new_conversion(), self.root))
+
+        self.check(files)
+        self.assertEqual(sum(path.startswith("/download/") for _, path in self.fake.requests), 1)
+
+    def test_parallel(self):
+        """test pages fetched individually"""
+        files = list(self.convertio_client.download_result_files(
+            self.new_conversion(), self.root, mode="parallel", concurrency=3
+        ))
+
+        self.check(files)
+        self.assertEqual(sum(path.startswith("/download/") for _, path in self.fake.requests), 5)
+
+    def test_single_file(self):
+        """test single-file outputs are streamed as is"""
+        self.fake.pages = 1
+
+        files = list(self.convertio_client.download_result_files(
+            self.new_conversion(), self.root, mode="parallel"
+        ))
+
+        self.assertEqual([output_file.name for output_file in files], ["a.jpg"])
+        self.assertEqual((self.root / "a.jpg").read_bytes(), b"\0" * self.fake.result_size)
+
+    def test_not_ready(self):
+        """test unfinished conversions return an ErrorResponse"""
+        self.fake.convert_time = 60
+
+        response = self.convertio_client.download_result_files(self.new_conversion(), self.root)
+
+        self.assertIsInstance(response, responses.ErrorResponse)
+
+    def test_async(self):
+        """test both modes with the async client"""
+        async def download(mode: str):
+            async with client.AsyncConvertIO(
+                api_key="test", transport=self.fake.transport()
+            ) as convertio_client:
+                conversion = await convertio_client.new_conversion(
+                    payload=parameters.NewConversionParameters(file="http://file_url/a.doc",
+                                                               outputformat="jpg")
+                )
+                files = await convertio_client.download_result_files(
+                    parameters.GetResultParameters(id=conversion.data.id),
+                    self.root / mode, mode=mode
+                )
+                return [output_file async for output_file in files]
+
+        for mode in outputs.MODES:
+            with self.subTest(mode=mode):
+                self.fake.conversions.clear()
+                self.check(asyncio.run(download(mode)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+"""
+    Conversion Status Poller
+    Tracks the status of many conversions from a single scheduler thread,
+    adapting each conversion's poll interval to its progress.
+"""
+# pylint: disable=too-many-instance-attributes
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import pydantic
+
+from .models import parameters, responses
+
+if TYPE_CHECKING:
+    from .client import ConvertIO
+
+
+# Bounds of the poll interval in seconds
+MIN_INTERVAL = 0.25
+MAX_INTERVAL = 10.0
+
+# Interval multiplier while a conversion is queued or uploading
+BACKOFF = 2.0
+
+# Number of status requests in flight at once
+WORKERS = 8
+
+StatusResult = Union[responses.GetStatusResponse, responses.ErrorResponse]
+
+
+class PollerMetrics(pydantic.BaseModel):
+    """ Poller Metrics
+
+    Args:
+        watching (int): Conversions currently tracked
+        requests (int): Status requests sent
+        transport_errors (int): Status requests that raised
+        completed (int): Conversions that reached step 'finish'
+        failed (int): Conversions that ended with an ErrorResponse
+        requests_per_conversion (float): Status requests per ended conversion
+        request_latency_avg (float): Average status request latency in seconds
+        request_latency_max (float): Maximum status request latency in seconds
+        completion_latency_avg (float): Average seconds between `watch` and completion
+    """
+    watching: int
+    requests: int
+    transport_errors: int
+    completed: int
+    failed: int
+    requests_per_conversion: float
+    request_latency_avg: float
+    request_latency_max: float
+    completion_latency_avg: float
+
+
+class _Watch:
+    """Polling state of a single conversion"""
+
+    def __init__(self, conversion_id: str, callback: Optional[Callable], interval: float):
+        self.id = conversion_id
+        self.future: Future = Future()
+        self.callback = callback
+        self.interval = interval
+        self.started_at = time.monotonic()
+        self.progress: Optional[Tuple[float, int]] = None
+
+
+class StatusPoller:
+    """ Multiplexed Status Poller
+
+    Polls every watched conversion from one scheduler, with a small pool of
+    workers sending the status requests. Each conversion gets its own interval:
+    it backs off while the conversion waits in queue or uploads, and during
+    'convert' it is derived from the observed progress rate, so polls get closer
+    as the conversion approaches 100%.
+
+        with StatusPoller(convertio) as poller:
+            future = poller.watch(conversion_id)
+            status = future.result()
+
+    Args:
+        convertio_client (ConvertIO): Client used for status requests
+        workers (int): Number of status requests in flight at once
+        min_interval (float): Shortest poll interval in seconds
+        max_interval (float): Longest poll interval in seconds
+        backoff (float): Interval multiplier while the conversion is queued/uploading
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        convertio_client: "ConvertIO",
+        *,
+        workers: int = WORKERS,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        backoff: float = BACKOFF
+    ):
+        self.convertio_client = convertio_client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._watches: Dict[str, _Watch] = {}
+        self._queue: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._requests = 0
+        self._transport_errors = 0
+        self._completed = 0
+        self._failed = 0
+        self._request_latency_total = 0.0
+        self._request_latency_max = 0.0
+        self._completion_latency_total = 0.0
+        self._thread = threading.Thread(target=self._run, name="convertio-poller", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "StatusPoller":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop polling, pending futures are cancelled"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        for watch in list(self._watches.values()):
+            watch.future.cancel()
+        self._watches.clear()
+
+    def watch(
+        self,
+        conversion_id: str,
+        callback: Optional[Callable[[StatusResult], None]] = None
+    ) -> "Future[StatusResult]":
+        """ Track a conversion until it ends
+
+        Args:
+            conversion_id (str): Conversion ID, obtained on POST call to /convert
+            callback (Optional[Callable]): Called with the final GetStatusResponse
+                                           or ErrorResponse
+        Returns:
+            Future resolved with the final GetStatusResponse (step 'finish')
+            or the ErrorResponse of a failed conversion.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("StatusPoller is closed")
+            if conversion_id in self._watches:
+                return self._watches[conversion_id].future
+            watch = _Watch(conversion_id, callback, self.min_interval)
+            self._watches[conversion_id] = watch
+            self._schedule(watch, 0)
+        return watch.future
+
+    def unwatch(self, conversion_id: str) -> None:
+        """Stop tracking a conversion, its future is cancelled"""
+        with self._condition:
+            watch = self._watches.pop(conversion_id, None)
+        if watch is not None:
+            watch.future.cancel()
+
+    def metrics(self) -> PollerMetrics:
+        """Snapshot of the poller metrics"""
+        with self._condition:
+            ended = self._completed + self._failed
+            return PollerMetrics(
+                watching=len(self._watches),
+                requests=self._requests,
+                transport_errors=self._transport_errors,
+                completed=self._completed,
+                failed=self._failed,
+                requests_per_conversion=self._requests / ended if ended else 0.0,
+                request_latency_avg=(self._request_latency_total / self._requests
+                                     if self._requests else 0.0),
+                request_latency_max=self._request_latency_max,
+                completion_latency_avg=self._completion_latency_total / ended if ended else 0.0
+            )
+
+    def next_interval(self, watch: _Watch, status: responses.GetStatusResponse) -> float:
+        """ Seconds until the next status request of a conversion still in progress
+
+        Args:
+            watch (_Watch): Polling state, `interval` holds the previous interval
+            status (GetStatusResponse): Latest status of the conversion
+        """
+        if status.data.step != 'convert':
+            return min(max(watch.interval * self.backoff, self.min_interval), self.max_interval)
+        now = time.monotonic()
+        percent = int(status.data.step_percent or 0)
+        if watch.progress is None or percent <= watch.progress[1]:
+            if watch.progress is None:
+                watch.progress = (now, percent)
+            # No measurable progress yet, assume the remaining part takes as long
+            # as a max interval scaled by what's left.
+            interval = self.max_interval * (100 - percent) / 100
+        else:
+            started, started_percent = watch.progress
+            rate = (percent - started_percent) / (now - started)
+            # Poll at half the estimated time left, so completion is noticed early
+            interval = (100 - percent) / rate / 2
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _schedule(self, watch: _Watch, delay: float) -> None:
+        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), watch.id))
+        self._condition.notify()
+
+    def _run(self) -> None:
+        with self._condition:
+            while not self._closed:
+                now = time.monotonic()
+                while self._queue and self._queue[0][0] <= now:
+                    _, _, conversion_id = heapq.heappop(self._queue)
+                    watch = self._watches.get(conversion_id)
+                    if watch is not None:
+                        self._executor.submit(self._poll, watch)
+                timeout = self._queue[0][0] - now if self._queue else None
+                self._condition.wait(timeout)
+
+    def _poll(self, watch: _Watch) -> None:
+        started = time.monotonic()
+        try:
+            status = self.convertio_client.get_conversion_status(
+                payload=parameters.GetStatusParameters(id=watch.id)
+            )
+        except Exception: # pylint: disable=broad-except
+            status = None
+        latency = time.monotonic() - started
+        with self._condition:
+            if self._watches.get(watch.id) is not watch:
+                return
+            self._requests += 1
+            self._request_latency_total += latency
+            self._request_latency_max = max(self._request_latency_max, latency)
+            if status is None:
+                self._transport_errors += 1
+                watch.interval = min(watch.interval * self.backoff, self.max_interval)
+                self._schedule(watch, watch.interval)
+                return
+            if (isinstance(status, responses.GetStatusResponse)
+                    and status.data.step != 'finish'):
+                watch.interval = self.next_interval(watch, status)
+                self._schedule(watch, watch.interval)
+                return
+            del self._watches[watch.id]
+            if isinstance(status, responses.ErrorResponse):
+                self._failed += 1
+            else:
+                self._completed += 1
+            self._completion_latency_total += time.monotonic() - watch.started_at
+        watch.future.set_result(status)
+        if watch.callback is not None:
+            try:
+                watch.callback(status)
+            except Exception: # pylint: disable=broad-except
+                logging.exception("StatusPoller callback failed for %s", watch.id)
@@ -0,0 +1,105 @@
+"""Conversion Status Poller tests"""
+import unittest
+from unittest import mock
+
+from . import client, poller
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+def status(step: str, step_percent: int) -> responses.GetStatusResponse:
+    """GetStatusResponse at {step}"""
+    return responses.GetStatusResponse(
+        code=200,
+        status="ok",
+        data={"id": "abc", "step": step, "step_percent": step_percent, "minutes": 1, "output": []}
+    )
+
+
+class TestStatusPoller(unittest.TestCase):
+    """Test StatusPoller"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO(minutes=1000, convert_time=0.5)
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport())
+        self.poller = poller.StatusPoller(
+            self.convertio_client,
+            min_interval=0.02,
+            max_interval=0.5
+        )
+
+    def tearDown(self) -> None:
+        self.poller.close()
+        self.convertio_client.close()
+
+    def new_conversion(self) -> str:
+        """Start a conversion on the fake API"""
+        return self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                       outputformat="pdf")
+        ).data.id
+
+    def test_watch_many(self):
+        """test many conversions complete with few status requests"""
+        conversion_ids = [self.new_conversion() for _ in range(200)]
+        completed = []
+
+        futures = [self.poller.watch(conversion_id, callback=completed.append)
+                   for conversion_id in conversion_ids]
+        results = [future.result(timeout=10) for future in futures]
+
+        self.assertTrue(all(result.data.step == "finish" for result in results))
+        self.assertEqual(len(completed), 200)
+        metrics = self.poller.metrics()
+        self.assertEqual(metrics.completed, 200)
+        self.assertEqual(metrics.watching, 0)
+        # Polling every min_interval would take ~25 requests per conversion
+        self.assertLess(metrics.requests_per_conversion, 10)
+
+    def test_watch_error(self):
+        """test conversions ending with an ErrorResponse"""
+        future = self.poller.watch("unknown")
+
+        self.assertIsInstance(future.result(timeout=5), responses.ErrorResponse)
+        self.assertEqual(self.poller.metrics().failed, 1)
+
+    def test_watch_transport_error(self):
+        """test transport errors are retried"""
+        conversion_id = self.new_conversion()
+        get_conversion_status = self.convertio_client.get_conversion_status
+        side_effect = iter([ConnectionError()])
+
+        def flaky_get_conversion_status(payload):
+            for exception in side_effect:
+                raise exception
+            return get_conversion_status(payload=payload)
+
+        with mock.patch.object(self.convertio_client, 'get_conversion_status',
+                               side_effect=flaky_get_conversion_status):
+            result = self.poller.watch(conversion_id).result(timeout=5)
+
+        self.assertEqual(result.data.step, "finish")
+        self.assertEqual(self.poller.metrics().transport_errors, 1)
+
+    def test_unwatch(self):
+        """test unwatch cancels the future"""
+        conversion_id = self.new_conversion()
+        future = self.poller.watch(conversion_id)
+
+        self.poller.unwatch(conversion_id)
+
+        self.assertTrue(future.cancelled())
+
+    def test_next_interval(self):
+        """test interval adapts to the conversion step"""
+        watch = poller._Watch("abc", None, 1.0) # pylint: disable=protected-access
+
+        self.assertEqual(self.poller.next_interval(watch, status("wait", 0)), 0.5)
+        watch.interval = 0.1
+        self.assertEqual(self.poller.next_interval(watch, status("wait", 0)), 0.2)
+        self.assertEqual(self.poller.next_interval(watch, status("convert", 90)), 0.05)
+        self.assertEqual(self.poller.next_interval(watch, status("convert", 99)), 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
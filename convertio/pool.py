@@ -0,0 +1,626 @@
+"""
+    API Key Pool
+    Spreads conversions over several API keys, weighing each by its minutes
+    left, recent errors and conversions in flight.
+"""
+# pylint: disable=too-few-public-methods
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Union
+import collections
+import os
+import threading
+
+import pydantic
+
+from . import bulk, download, outputs, upload
+from .client import AsyncConvertIO, ConvertIO
+from .models import parameters, responses
+from .ratelimit import MinutesLedger, MinutesReserveError
+
+
+# Error returned when every key is drained
+POOL_EXHAUSTED_ERROR = "Every API key of the pool is drained"
+
+# Weight of the last request in a key's error rate
+ERROR_DECAY = 0.2
+
+# Share of its weight a failing key keeps, so it gets probed again
+ERROR_FLOOR = 0.05
+
+# Ended conversions whose key is remembered, so they can still be deleted
+FINISHED_OWNERS = 10000
+
+
+class KeyMetrics(pydantic.BaseModel):
+    """ Metrics of a pooled API key
+
+    Args:
+        api_key (str): Last 4 characters of the key
+        remaining (Optional[int]): Estimated minutes left, None until the API reported a balance
+        in_flight (int): Conversions started and not ended, plus pending new conversions
+        error_rate (float): Moving average of failed requests, 0 to 1
+        started (int): Conversions started with the key
+        drained (Optional[str]): Why the key is drained, None if in use
+    """
+    api_key: str
+    remaining: Optional[int]
+    in_flight: int
+    error_rate: float
+    started: int
+    drained: Optional[str]
+
+
+class _Key:
+    """Balancing state of a single API key"""
+
+    def __init__(self, client: Union[ConvertIO, AsyncConvertIO]):
+        if client.ledger is None:
+            client.ledger = MinutesLedger()
+        self.client = client
+        self.conversions: Set[str] = set()
+        self.pending = 0
+        self.error_rate = 0.0
+        self.started = 0
+        self.drained: Optional[str] = None
+
+    @property
+    def in_flight(self) -> int:
+        """Conversions started and not ended, plus pending new conversions"""
+        return len(self.conversions) + self.pending
+
+    def weight(self, unknown_minutes: int) -> float:
+        """Share of new conversions, 0 if the key can't take any"""
+        remaining = self.client.ledger.remaining
+        if remaining is None:
+            remaining = unknown_minutes
+        if self.drained is not None or remaining <= 0:
+            return 0.0
+        return remaining * max(1.0 - self.error_rate, ERROR_FLOOR) / (1 + self.in_flight)
+
+    def record(self, failed: bool) -> None:
+        """Add the outcome of a request to the error rate"""
+        self.error_rate += ERROR_DECAY * (float(failed) - self.error_rate)
+
+    def metrics(self) -> KeyMetrics:
+        """Snapshot of the key metrics"""
+        return KeyMetrics(
+            api_key=self.client.api_key[-4:],
+            remaining=self.client.ledger.remaining,
+            in_flight=self.in_flight,
+            error_rate=self.error_rate,
+            started=self.started,
+            drained=self.drained
+        )
+
+
+def _failed(result) -> bool:
+    """Whether {result} tells the key is unhealthy, as opposed to a bad request"""
+    return isinstance(result, responses.ErrorResponse) and (
+        result.code >= 500 or result.code == 429
+    )
+
+
+def _ended(result) -> bool:
+    """Whether a status {result} tells the conversion won't change anymore"""
+    if isinstance(result, responses.ErrorResponse):
+        return not _failed(result)
+    return result.data.step == 'finish'
+
+
+class _Pool:
+    """Key selection and conversion ownership shared by the sync and async pools"""
+
+    def __init__(self, clients: Iterable[Union[ConvertIO, AsyncConvertIO]]):
+        self.keys = [_Key(client) for client in clients]
+        if not self.keys:
+            raise ValueError("A pool needs at least one client")
+        self._owners: Dict[str, _Key] = {}
+        self._finished: "collections.OrderedDict[str, None]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _select(self, excluded: List[_Key]) -> Optional[_Key]:
+        """Heaviest key not in {excluded}, counted as pending, None if every key is drained"""
+        with self._lock:
+            # Keys without a reported balance weigh as much as the richest one
+            known = [key.client.ledger.remaining for key in self.keys]
+            unknown_minutes = max([minutes for minutes in known if minutes is not None] + [1])
+            weights = [
+                (key.weight(unknown_minutes), -key.in_flight, -index)
+                for index, key in enumerate(self.keys) if key not in excluded
+            ]
+            if not weights or max(weights)[0] <= 0:
+                return None
+            key = self.keys[-max(weights)[2]]
+            key.pending += 1
+            return key
+
+    def _started(self, key: _Key, result) -> bool:
+        """Record a new conversion or `convert` {result}, returns whether to try another key"""
+        with self._lock:
+            key.pending -= 1
+            if isinstance(result, MinutesReserveError):
+                # Refused by the key's ledger before sending anything
+                key.drained = str(result)
+                return True
+            key.record(isinstance(result, BaseException) or _failed(result))
+            if isinstance(result, (responses.NewConversionResponse, responses.GetResultResponse)):
+                key.started += 1
+                self._owners[result.data.id] = key
+                if isinstance(result, responses.NewConversionResponse):
+                    key.conversions.add(result.data.id)
+                else:
+                    self._retire(result.data.id)
+                remaining = key.client.ledger.remaining
+                if remaining is not None and remaining <= 0:
+                    key.drained = "No conversion minutes left"
+                return False
+            if isinstance(result, responses.ErrorResponse) and result.code == 401:
+                # Invalid key, no minutes left or reserve reached: nothing was started
+                key.drained = result.error
+                return True
+            return False
+
+    def _observe(self, key: _Key, conversion_id: str, result, ended: bool = False) -> None:
+        """Record a follow-up request {result}, ending the conversion if {ended}"""
+        with self._lock:
+            key.record(isinstance(result, Exception) or _failed(result))
+            if ended:
+                key.conversions.discard(conversion_id)
+                self._retire(conversion_id)
+
+    def _retire(self, conversion_id: str) -> None:
+        """Forget the oldest ended conversions past FINISHED_OWNERS, lock held"""
+        self._finished[conversion_id] = None
+        self._finished.move_to_end(conversion_id)
+        while len(self._finished) > FINISHED_OWNERS:
+            self._owners.pop(self._finished.popitem(last=False)[0], None)
+
+    def _exhausted(self) -> responses.ErrorResponse:
+        return responses.ErrorResponse(code=401, status='error', error=POOL_EXHAUSTED_ERROR)
+
+    def _owner(self, conversion_id: str) -> _Key:
+        with self._lock:
+            key = self._owners.get(conversion_id)
+        if key is None:
+            raise KeyError("Conversion %s wasn't started by this pool" % conversion_id)
+        return key
+
+    def _forget(self, conversion_id: str) -> None:
+        with self._lock:
+            key = self._owners.pop(conversion_id, None)
+            self._finished.pop(conversion_id, None)
+            if key is not None:
+                key.conversions.discard(conversion_id)
+
+    def assign(self, conversion_id: str, api_key: str) -> None:
+        """Route the follow-up requests of {conversion_id} to {api_key}, i.e. after a restart"""
+        with self._lock:
+            for key in self.keys:
+                if key.client.api_key == api_key:
+                    self._owners[conversion_id] = key
+                    return
+        raise KeyError("API key not in the pool")
+
+    def restore(self, api_key: str) -> None:
+        """Use a drained key again, i.e. after topping up its minutes"""
+        with self._lock:
+            for key in self.keys:
+                if key.client.api_key == api_key:
+                    key.drained = None
+                    key.error_rate = 0.0
+                    key.client.ledger.balance = None
+
+    def owner(self, conversion_id: str) -> str:
+        """API key that started {conversion_id}"""
+        return self._owner(conversion_id).client.api_key
+
+    def metrics(self) -> List[KeyMetrics]:
+        """Snapshot of the metrics of every key"""
+        with self._lock:
+            return [key.metrics() for key in self.keys]
+
+
+class ConvertIOPool(_Pool):
+    """ Pool of ConvertIO clients, one per API key
+
+    `new_conversion` and `convert` go to the key with the largest weight:
+    its estimated minutes left (from the balance reported by its last new
+    conversion, through a `MinutesLedger`), scaled down by its recent error
+    rate and by the conversions it has in flight. Keys rejecting a new
+    conversion with code 401 (invalid key, no minutes left) or whose ledger
+    refuses it (`MinutesReserveError`) are drained and the conversion is
+    started with the next key, unless its input is a file object that can't
+    be rewound. Requests about a conversion always use the key that started
+    it; the keys of the last FINISHED_OWNERS ended conversions are kept.
+
+        with ConvertIOPool.from_keys(["key-1", "key-2"]) as pool:
+            conversion = pool.new_conversion(payload)
+            pool.get_conversion_status(parameters.GetStatusParameters(id=conversion.data.id))
+
+    Args:
+        clients (Iterable[ConvertIO]): One client per API key, given a `MinutesLedger`
+                                       if they have none
+    """
+
+    @classmethod
+    def from_keys(cls, api_keys: Iterable[str], **kwargs) -> "ConvertIOPool":
+        """Pool of clients created with {kwargs} for each of {api_keys}"""
+        return cls(ConvertIO(api_key=api_key, **kwargs) for api_key in api_keys)
+
+    def __enter__(self) -> "ConvertIOPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close every client"""
+        for key in self.keys:
+            key.client.close()
+
+    def client_for(self, conversion_id: str) -> ConvertIO:
+        """Client of the key that started {conversion_id}"""
+        return self._owner(conversion_id).client
+
+    def new_conversion(
+        self,
+        payload: parameters.NewConversionParameters
+    ) -> Union[responses.NewConversionResponse, responses.ErrorResponse]:
+        """Start a New Conversion with the heaviest key, see `ConvertIO.new_conversion`"""
+        rewind = upload.rewinder(payload.file)
+        tried: List[_Key] = []
+        while True:
+            key = self._select(tried)
+            if key is None:
+                return self._exhausted()
+            tried.append(key)
+            try:
+                result = key.client.new_conversion(payload=payload)
+            except MinutesReserveError as exception:
+                self._started(key, exception)
+                continue
+            except BaseException as exception:
+                self._started(key, exception)
+                raise
+            if not self._started(key, result) or rewind is None:
+                # A file object read by the refused request can't be sent again
+                return result
+            rewind()
+
+    def direct_file_upload(
+        self,
+        payload: parameters.DirectFileParameters,
+        **kwargs
+    ) -> Union[responses.DirectFileResponse, responses.ErrorResponse]:
+        """Direct File Upload For Conversion, see `ConvertIO.direct_file_upload`"""
+        key = self._owner(payload.id)
+        try:
+            result = key.client.direct_file_upload(payload, **kwargs)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result)
+        return result
+
+    def get_conversion_status(
+        self,
+        payload: parameters.GetStatusParameters
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """Get Status of the Conversion, see `ConvertIO.get_conversion_status`"""
+        key = self._owner(payload.id)
+        try:
+            result = key.client.get_conversion_status(payload=payload)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result, ended=_ended(result))
+        return result
+
+    def get_result_file(
+        self,
+        payload: parameters.GetResultParameters
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        """Get Result File Content, see `ConvertIO.get_result_file`"""
+        key = self._owner(payload.id)
+        try:
+            result = key.client.get_result_file(payload=payload)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result,
+                      ended=isinstance(result, responses.GetResultResponse))
+        return result
+
+    def delete_or_cancel_conversion(
+        self,
+        payload: parameters.DeleteCancelParameters
+    ) -> Union[responses.DeleteCancelResponse, responses.ErrorResponse]:
+        """Delete File/Cancel Conversion, see `ConvertIO.delete_or_cancel_conversion`"""
+        key = self._owner(payload.id)
+        try:
+            result = key.client.delete_or_cancel_conversion(payload=payload)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result)
+        if isinstance(result, responses.DeleteCancelResponse) or result.code == 404:
+            self._forget(payload.id)
+        return result
+
+    def download_result_file(
+        self,
+        payload: parameters.GetResultParameters,
+        destination: download.Destination,
+        **kwargs
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """Download Result File, see `ConvertIO.download_result_file`"""
+        key = self._owner(payload.id)
+        try:
+            result = key.client.download_result_file(payload, destination, **kwargs)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result, ended=_ended(result))
+        return result
+
+    def download_result_files(
+        self,
+        payload: parameters.GetResultParameters,
+        directory: Union[str, os.PathLike],
+        **kwargs
+    ) -> Union[Iterator[outputs.OutputFile], responses.ErrorResponse]:
+        """Download Result Files, see `ConvertIO.download_result_files`"""
+        key = self._owner(payload.id)
+        result = key.client.download_result_files(payload, directory, **kwargs)
+        self._observe(key, payload.id, result,
+                      ended=not isinstance(result, responses.ErrorResponse))
+        return result
+
+    def convert(
+        self,
+        payload: parameters.NewConversionParameters,
+        **kwargs
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        """ Convert a File with the heaviest key
+
+            Runs `ConvertIO.convert` with the selected key, moving to the next
+            one if the conversion couldn't be started with it (code 401, ledger reserve).
+        """
+        rewind = upload.rewinder(payload.file)
+        tried: List[_Key] = []
+        while True:
+            key = self._select(tried)
+            if key is None:
+                return self._exhausted()
+            tried.append(key)
+            try:
+                result = key.client.convert(payload=payload, **kwargs)
+            except MinutesReserveError as exception:
+                self._started(key, exception)
+                continue
+            except BaseException as exception:
+                self._started(key, exception)
+                raise
+            if not self._started(key, result) or rewind is None:
+                # A file object read by the refused request can't be sent again
+                return result
+            rewind()
+
+    def convert_many(
+        self,
+        payloads: Iterable[parameters.NewConversionParameters],
+        concurrency: Optional[int] = None,
+        **kwargs
+    ) -> Iterator[bulk.ConversionResult]:
+        """Convert many Files concurrently over every key, see `ConvertIO.convert_many`"""
+        return bulk.convert_many(
+            self, payloads, concurrency=concurrency or bulk.CONCURRENCY * len(self.keys),
+            **kwargs
+        )
+
+    def delete_many(
+        self,
+        conversion_ids: Iterable[str],
+        concurrency: Optional[int] = None
+    ) -> bulk.DeleteReport:
+        """Delete Files/Cancel Conversions concurrently, see `ConvertIO.delete_many`"""
+        return bulk.delete_many(self, conversion_ids, concurrency=concurrency or bulk.CONCURRENCY)
+
+
+class AsyncConvertIOPool(_Pool):
+    """ Pool of AsyncConvertIO clients, one per API key
+
+    Async counterpart of `ConvertIOPool`, every request is a coroutine:
+
+        async with AsyncConvertIOPool.from_keys(["key-1", "key-2"]) as pool:
+            conversion = await pool.new_conversion(payload)
+
+    Args:
+        clients (Iterable[AsyncConvertIO]): One client per API key, given a `MinutesLedger`
+                                            if they have none
+    """
+
+    @classmethod
+    def from_keys(cls, api_keys: Iterable[str], **kwargs) -> "AsyncConvertIOPool":
+        """Pool of clients created with {kwargs} for each of {api_keys}"""
+        return cls(AsyncConvertIO(api_key=api_key, **kwargs) for api_key in api_keys)
+
+    async def __aenter__(self) -> "AsyncConvertIOPool":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close every client"""
+        for key in self.keys:
+            await key.client.aclose()
+
+    def client_for(self, conversion_id: str) -> AsyncConvertIO:
+        """Client of the key that started {conversion_id}"""
+        return self._owner(conversion_id).client
+
+    async def new_conversion(
+        self,
+        payload: parameters.NewConversionParameters
+    ) -> Union[responses.NewConversionResponse, responses.ErrorResponse]:
+        """Start a New Conversion with the heaviest key, see `AsyncConvertIO.new_conversion`"""
+        rewind = upload.rewinder(payload.file)
+        tried: List[_Key] = []
+        while True:
+            key = self._select(tried)
+            if key is None:
+                return self._exhausted()
+            tried.append(key)
+            try:
+                result = await key.client.new_conversion(payload=payload)
+            except MinutesReserveError as exception:
+                self._started(key, exception)
+                continue
+            except BaseException as exception:
+                self._started(key, exception)
+                raise
+            if not self._started(key, result) or rewind is None:
+                # A file object read by the refused request can't be sent again
+                return result
+            rewind()
+
+    async def direct_file_upload(
+        self,
+        payload: parameters.DirectFileParameters,
+        **kwargs
+    ) -> Union[responses.DirectFileResponse, responses.ErrorResponse]:
+        """Direct File Upload For Conversion, see `AsyncConvertIO.direct_file_upload`"""
+        key = self._owner(payload.id)
+        try:
+            result = await key.client.direct_file_upload(payload, **kwargs)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result)
+        return result
+
+    async def get_conversion_status(
+        self,
+        payload: parameters.GetStatusParameters
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """Get Status of the Conversion, see `AsyncConvertIO.get_conversion_status`"""
+        key = self._owner(payload.id)
+        try:
+            result = await key.client.get_conversion_status(payload=payload)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result, ended=_ended(result))
+        return result
+
+    async def get_result_file(
+        self,
+        payload: parameters.GetResultParameters
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        """Get Result File Content, see `AsyncConvertIO.get_result_file`"""
+        key = self._owner(payload.id)
+        try:
+            result = await key.client.get_result_file(payload=payload)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result,
+                      ended=isinstance(result, responses.GetResultResponse))
+        return result
+
+    async def delete_or_cancel_conversion(
+        self,
+        payload: parameters.DeleteCancelParameters
+    ) -> Union[responses.DeleteCancelResponse, responses.ErrorResponse]:
+        """Delete File/Cancel Conversion, see `AsyncConvertIO.delete_or_cancel_conversion`"""
+        key = self._owner(payload.id)
+        try:
+            result = await key.client.delete_or_cancel_conversion(payload=payload)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result)
+        if isinstance(result, responses.DeleteCancelResponse) or result.code == 404:
+            self._forget(payload.id)
+        return result
+
+    async def download_result_file(
+        self,
+        payload: parameters.GetResultParameters,
+        destination: download.Destination,
+        **kwargs
+    ) -> Union[responses.GetStatusResponse, responses.ErrorResponse]:
+        """Download Result File, see `AsyncConvertIO.download_result_file`"""
+        key = self._owner(payload.id)
+        try:
+            result = await key.client.download_result_file(payload, destination, **kwargs)
+        except Exception as exception:
+            self._observe(key, payload.id, exception)
+            raise
+        self._observe(key, payload.id, result, ended=_ended(result))
+        return result
+
+    async def download_result_files(
+        self,
+        payload: parameters.GetResultParameters,
+        directory: Union[str, os.PathLike],
+        **kwargs
+    ) -> Union[AsyncIterator[outputs.OutputFile], responses.ErrorResponse]:
+        """Download Result Files, see `AsyncConvertIO.download_result_files`"""
+        key = self._owner(payload.id)
+        result = await key.client.download_result_files(payload, directory, **kwargs)
+        self._observe(key, payload.id, result,
+                      ended=not isinstance(result, responses.ErrorResponse))
+        return result
+
+    async def convert(
+        self,
+        payload: parameters.NewConversionParameters,
+        **kwargs
+    ) -> Union[responses.GetResultResponse, responses.ErrorResponse]:
+        """ Convert a File with the heaviest key
+
+            Runs `AsyncConvertIO.convert` with the selected key, moving to the
+            next one if the conversion couldn't be started with it (code 401, ledger reserve).
+        """
+        rewind = upload.rewinder(payload.file)
+        tried: List[_Key] = []
+        while True:
+            key = self._select(tried)
+            if key is None:
+                return self._exhausted()
+            tried.append(key)
+            try:
+                result = await key.client.convert(payload=payload, **kwargs)
+            except MinutesReserveError as exception:
+                self._started(key, exception)
+                continue
+            except BaseException as exception:
+                self._started(key, exception)
+                raise
+            if not self._started(key, result) or rewind is None:
+                # A file object read by the refused request can't be sent again
+                return result
+            rewind()
+
+    def convert_many(
+        self,
+        payloads: Iterable[parameters.NewConversionParameters],
+        concurrency: Optional[int] = None,
+        **kwargs
+    ) -> AsyncIterator[bulk.ConversionResult]:
+        """Convert many Files concurrently over every key, see `AsyncConvertIO.convert_many`"""
+        return bulk.aconvert_many(
+            self, payloads, concurrency=concurrency or bulk.CONCURRENCY * len(self.keys),
+            **kwargs
+        )
+
+    async def delete_many(
+        self,
+        conversion_ids: Iterable[str],
+        concurrency: Optional[int] = None
+    ) -> bulk.DeleteReport:
+        """Delete Files/Cancel Conversions concurrently, see `AsyncConvertIO.delete_many`"""
+        return await bulk.adelete_many(
+            self, conversion_ids, concurrency=concurrency or bulk.CONCURRENCY
+        )
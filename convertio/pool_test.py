@@ -0,0 +1,156 @@
+"""API Key Pool tests"""
+import asyncio
+import io
+import os
+import unittest
+from unittest import mock
+
+from . import client, pool
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+PAYLOAD = parameters.NewConversionParameters(file="http://file_url/a.doc", outputformat="pdf")
+
+
+class TestConvertIOPool(unittest.TestCase):
+    """Test ConvertIOPool"""
+
+    def setUp(self) -> None:
+        self.fakes = [FakeConvertIO(minutes=100), FakeConvertIO(minutes=300)]
+        self.pool = pool.ConvertIOPool(
+            client.ConvertIO(api_key="key-%s" % index, transport=fake.transport())
+            for index, fake in enumerate(self.fakes)
+        )
+
+    def tearDown(self) -> None:
+        self.pool.close()
+
+    def started(self):
+        """Conversions started per key"""
+        return [metrics.started for metrics in self.pool.metrics()]
+
+    def test_weighted_by_minutes_and_in_flight(self):
+        """test keys get new conversions in proportion to their minutes left"""
+        for _ in range(40):
+            self.assertIsInstance(self.pool.new_conversion(PAYLOAD),
+                                  responses.NewConversionResponse)
+
+        first, second = self.started()
+        self.assertEqual(first + second, 40)
+        self.assertGreater(second, 2 * first)
+        self.assertEqual([metrics.in_flight for metrics in self.pool.metrics()], [first, second])
+
+    def test_follow_ups_use_owner(self):
+        """test requests about a conversion go to the key that started it"""
+        conversion_ids = [self.pool.new_conversion(PAYLOAD).data.id for _ in range(4)]
+
+        for conversion_id in conversion_ids:
+            status = self.pool.get_conversion_status(
+                parameters.GetStatusParameters(id=conversion_id)
+            )
+            self.assertEqual(status.data.step, 'finish')
+            owner = self.fakes[int(self.pool.owner(conversion_id)[-1])]
+            self.assertIn(conversion_id, owner.conversions)
+
+        self.assertEqual([metrics.in_flight for metrics in self.pool.metrics()], [0, 0])
+        with self.assertRaises(KeyError):
+            self.pool.get_conversion_status(parameters.GetStatusParameters(id="unknown"))
+
+    def test_drain_exhausted_keys(self):
+        """test keys out of minutes are drained and the conversion moves on"""
+        self.fakes[0].minutes = 0
+        self.fakes[1].minutes = 3
+
+        results = [self.pool.new_conversion(PAYLOAD) for _ in range(3)]
+
+        self.assertEqual([type(result) for result in results[:2]],
+                         [responses.NewConversionResponse] * 2)
+        self.assertEqual(results[2].error, pool.POOL_EXHAUSTED_ERROR)
+        self.assertEqual([metrics.drained for metrics in self.pool.metrics()],
+                         ["No convertion minutes left", "No conversion minutes left"])
+
+        self.fakes[0].minutes = 10
+        self.pool.restore("key-0")
+        self.assertIsInstance(self.pool.new_conversion(PAYLOAD), responses.NewConversionResponse)
+
+    def test_drained_key_file_input(self):
+        """test a file object is sent whole to the next key, or not at all if it can't rewind"""
+        self.fakes[0].minutes = 0
+        data = b"%PDF" * 1000
+
+        result = self.pool.new_conversion(parameters.NewConversionParameters(
+            input="base64", file=io.BytesIO(data), filename="a.doc", outputformat="pdf"
+        ))
+
+        self.assertEqual(self.fakes[1].conversions[result.data.id].content, data)
+
+        self.pool.restore("key-0")
+        reader, writer = os.pipe()
+        os.write(writer, data)
+        os.close(writer)
+        with open(reader, "rb") as pipe:
+            result = self.pool.new_conversion(parameters.NewConversionParameters(
+                input="base64", file=pipe, filename="a.doc", outputformat="pdf"
+            ))
+
+        self.assertEqual(result.code, 401)
+        self.assertEqual(self.started(), [0, 1])
+
+    def test_finished_owners_bounded(self):
+        """test keys of ended conversions are forgotten past FINISHED_OWNERS"""
+        with mock.patch.object(pool, "FINISHED_OWNERS", 2):
+            results = [self.pool.convert(PAYLOAD, poll_interval=0) for _ in range(3)]
+
+        self.assertEqual(len(self.pool._owners), 2) # pylint: disable=protected-access
+        with self.assertRaises(KeyError):
+            self.pool.owner(results[0].data.id)
+        self.pool.owner(results[2].data.id)
+
+    def test_error_rate(self):
+        """test failing keys get fewer conversions"""
+        self.fakes[0].inject(status=503)
+
+        failed = self.pool.new_conversion(PAYLOAD)
+        self.pool.new_conversion(PAYLOAD)
+
+        self.assertEqual(failed.code, 503)
+        self.assertGreater(self.pool.metrics()[0].error_rate, 0)
+        self.assertEqual(self.started(), [0, 1])
+
+    def test_convert_and_delete_many(self):
+        """test bulk helpers run over the pool"""
+        payloads = [PAYLOAD] * 20
+
+        results = list(self.pool.convert_many(payloads, poll_interval=0))
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertGreater(min(self.started()), 0)
+        report = self.pool.delete_many(result.response.data.id for result in results)
+        self.assertEqual(len(report.deleted), 20)
+        self.assertEqual([len(fake.conversions) for fake in self.fakes], [0, 0])
+
+    def test_async(self):
+        """test the async pool starts and follows conversions"""
+        async def convert():
+            async with pool.AsyncConvertIOPool(
+                client.AsyncConvertIO(api_key="key-%s" % index, transport=fake.transport())
+                for index, fake in enumerate(self.fakes)
+            ) as async_pool:
+                conversions = await asyncio.gather(
+                    *(async_pool.new_conversion(PAYLOAD) for _ in range(8))
+                )
+                for conversion in conversions:
+                    await async_pool.get_conversion_status(
+                        parameters.GetStatusParameters(id=conversion.data.id)
+                    )
+                return async_pool.metrics()
+
+        metrics = asyncio.run(convert())
+
+        self.assertEqual(sum(key.started for key in metrics), 8)
+        self.assertEqual([key.in_flight for key in metrics], [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
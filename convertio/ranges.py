@@ -0,0 +1,457 @@
+"""
+    Ranged Downloads
+    Resumable downloads of result files with HTTP Range requests. A partial
+    file is continued where it stopped, after a dropped connection or a
+    restart, large files can be fetched as parallel segments, and the final
+    size is checked against `Output.size`.
+"""
+from typing import List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+import pathlib
+import re
+import threading
+import time
+
+import httpx
+
+from . import download
+from .retry import RetryPolicy
+
+
+# Suffix of the file being downloaded, renamed once complete
+PARTIAL_SUFFIX = '.part'
+
+# Suffix of the progress of segmented downloads, kept next to the partial file
+STATE_SUFFIX = '.part.json'
+
+# Smallest segment of a segmented download
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+
+# Bytes written to a segment between two saves of the progress
+CHECKPOINT_SIZE = 8 * 1024 * 1024
+
+# Retries of a dropped range, resumed from the last byte written
+RETRY = RetryPolicy(max_attempts=5, backoff=0.2, max_backoff=5.0)
+
+
+class DownloadSizeError(httpx.TransportError):
+    """The downloaded file doesn't have the size announced by the API"""
+
+
+class _RangesIgnored(Exception):
+    """The server answered a ranged request with the whole file"""
+
+
+def parse_content_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """First byte and total size of a `Content-Range: bytes first-last/total` header"""
+    match = re.fullmatch(r'\s*bytes\s+(\d+)-\d+/(\d+|\*)\s*', value)
+    if match is None:
+        return None, None
+    return int(match.group(1)), None if match.group(2) == '*' else int(match.group(2))
+
+
+class RangedDownload:
+    """ Ranged Download Plan
+
+    The file is written to `{path}.part` as a list of [next byte, end] ranges,
+    a single one continuing the partial file, or {segments} of at least
+    {min_segment_size} bytes if {size} is known. The URL, size and progress are
+    saved to `{path}.part.json`, a partial file without them is downloaded again.
+
+    Args:
+        url (str): URL of the file
+        path (str|PathLike): Destination file
+        size (Optional[int]): Expected size in bytes, as `Output.size`
+        segments (int): Ranges downloaded in parallel
+        min_segment_size (int): Smallest segment in bytes
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        url: str,
+        path: Union[str, os.PathLike],
+        size: Optional[int] = None,
+        segments: int = 1,
+        min_segment_size: int = MIN_SEGMENT_SIZE
+    ):
+        self.url = url
+        self.path = pathlib.Path(path)
+        self.size = size
+        self.partial = self.path.with_name(self.path.name + PARTIAL_SUFFIX)
+        self.state = self.path.with_name(self.path.name + STATE_SUFFIX)
+        self._lock = threading.Lock()
+        self.ranges = self._load() or self._plan(segments, min_segment_size)
+        # Progress as last saved, only counting bytes flushed to the partial file
+        self._saved = [list(byte_range) for byte_range in self.ranges]
+        self._unsaved = [0] * len(self.ranges)
+
+    @property
+    def segmented(self) -> bool:
+        """Whether the file is downloaded as several ranges"""
+        return len(self.ranges) > 1
+
+    def _load(self) -> Optional[List[list]]:
+        if not self.partial.exists():
+            self._discard_state()
+            return None
+        state = None
+        try:
+            with open(self.state, encoding='utf-8') as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            pass
+        offset = self.partial.stat().st_size
+        if not isinstance(state, dict) or state.get('url') != self.url or \
+                state.get('size') != self.size or \
+                (self.size is not None and offset > self.size):
+            # The partial file may come from another URL, or be padded for other ranges
+            self.discard()
+            return None
+        ranges = state['ranges']
+        if len(ranges) == 1:
+            # A single range isn't checkpointed, the partial file holds its progress
+            ranges[0][0] = offset
+        return ranges
+
+    def _plan(self, segments: int, min_segment_size: int) -> List[list]:
+        if self.size is None or segments <= 1 or self.size < 2 * min_segment_size:
+            ranges = [[0, self.size]]
+        else:
+            count = min(segments, self.size // min_segment_size)
+            step = -(-self.size // count)
+            ranges = [[start, min(start + step, self.size)] for start in range(0, self.size, step)]
+        # Saved before the file is written, a partial file is only resumed for the same URL
+        # and a restart never mistakes padding for downloaded bytes
+        self._save(ranges)
+        if len(ranges) > 1:
+            with open(self.partial, 'ab') as file:
+                file.truncate(self.size)
+        return ranges
+
+    def restart(self) -> None:
+        """Download the whole file again as a single range"""
+        self.ranges = [[0, self.size]]
+        self._saved = [[0, self.size]]
+        self._unsaved = [0]
+        self._save(self._saved)
+
+    def _save(self, ranges: List[list]) -> None:
+        """Replace the saved progress, a crash never leaves it half written"""
+        temporary = self.state.with_name(self.state.name + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'url': self.url, 'size': self.size, 'ranges': ranges}, file)
+        os.replace(temporary, self.state)
+
+    def _discard_state(self) -> None:
+        if self.state.exists():
+            self.state.unlink()
+
+    def pending(self) -> List[int]:
+        """Indexes of the ranges not downloaded yet"""
+        return [
+            index for index, (start, end) in enumerate(self.ranges)
+            if end is None or start < end
+        ]
+
+    def request_headers(self, index: int) -> dict:
+        """Headers of the request for range {index}, without Range for whole files"""
+        start, end = self.ranges[index]
+        if start == 0 and not self.segmented:
+            return {}
+        if end is None:
+            return {'Range': 'bytes=%s-' % start}
+        return {'Range': 'bytes=%s-%s' % (start, end - 1)}
+
+    def check_response(self, index: int, response: httpx.Response, headers: dict) -> bool:
+        """ Check the response to range {index}
+
+        Returns:
+            False if the range turned out to be complete already
+        """
+        start, end = self.ranges[index]
+        if response.status_code == 416 and end is None:
+            # Unknown size and nothing after the partial file, it was complete
+            self.ranges[index][1] = start
+            return False
+        response.raise_for_status()
+        if 'Range' in headers and response.status_code != 206:
+            if self.segmented:
+                raise _RangesIgnored()
+            self.ranges[index][0] = 0
+            return True
+        if response.status_code == 200 and self.size is not None:
+            length = response.headers.get('Content-Length')
+            if length is not None and int(length) != self.size:
+                raise DownloadSizeError(
+                    "File is %s bytes, %s were announced" % (length, self.size),
+                    request=response.request
+                )
+        if response.status_code == 206:
+            first, total = parse_content_range(response.headers.get('Content-Range', ''))
+            if first != start:
+                raise httpx.RemoteProtocolError(
+                    "%s answered with bytes from %s" % (headers['Range'], first),
+                    request=response.request
+                )
+            if self.size is not None and total is not None and total != self.size:
+                raise DownloadSizeError(
+                    "File is %s bytes, %s were announced" % (total, self.size),
+                    request=response.request
+                )
+        return True
+
+    def open(self, index: int):
+        """File positioned at the next byte of range {index}"""
+        start = self.ranges[index][0]
+        file = open( # pylint: disable=consider-using-with
+            self.partial, 'r+b' if self.partial.exists() else 'wb'
+        )
+        file.seek(start)
+        if not self.segmented:
+            # Anything after a single range is left over from an earlier attempt
+            file.truncate(start)
+        return file
+
+    def write(self, index: int, file, chunk: bytes) -> None:
+        """Write {chunk} of range {index} at the file position"""
+        end = self.ranges[index][1]
+        if end is not None:
+            chunk = chunk[:end - self.ranges[index][0]]
+        if not chunk:
+            return
+        file.write(chunk)
+        with self._lock:
+            self.ranges[index][0] += len(chunk)
+        self._unsaved[index] += len(chunk)
+        if self._unsaved[index] >= CHECKPOINT_SIZE:
+            self.checkpoint(index, file)
+
+    def checkpoint(self, index: int, file) -> None:
+        """Save the progress of range {index} of a segmented download, flushing {file} first"""
+        if not self.segmented:
+            return
+        file.flush()
+        self._unsaved[index] = 0
+        with self._lock:
+            self._saved[index][0] = self.ranges[index][0]
+            self._save(self._saved)
+
+    def check_complete(self, index: int, request: httpx.Request) -> None:
+        """Raise if range {index} ended before its last byte"""
+        start, end = self.ranges[index]
+        if end is not None and start < end:
+            raise httpx.ReadError("Connection closed at byte %s of %s" % (start, end),
+                                  request=request)
+        if end is None:
+            self.ranges[index][1] = start
+
+    def discard(self) -> None:
+        """Remove the partial file and its progress"""
+        if self.partial.exists():
+            self.partial.unlink()
+        self._discard_state()
+
+    def finish(self) -> int:
+        """Check the size and move the file in place, returns its size"""
+        size = self.partial.stat().st_size if self.partial.exists() else 0
+        if self.size is not None and size != self.size:
+            raise DownloadSizeError("Downloaded %s bytes, %s were announced" % (size, self.size))
+        os.replace(self.partial, self.path)
+        self._discard_state()
+        return size
+
+
+def _retry_delay(
+    retry: RetryPolicy,
+    attempt: int,
+    exception: Exception
+) -> Optional[float]:
+    """Seconds before retrying a range that failed with {exception}, None to give up"""
+    if isinstance(exception, DownloadSizeError):
+        return None
+    if isinstance(exception, httpx.HTTPStatusError):
+        if not retry.should_retry(attempt, True, response=exception.response):
+            return None
+        return retry.delay(attempt, exception.response)
+    if not retry.should_retry(attempt, True, exception=exception):
+        return None
+    return retry.delay(attempt)
+
+
+def _fetch_range(
+    session: httpx.Client,
+    plan: RangedDownload,
+    index: int,
+    chunk_size: int,
+    retry: RetryPolicy
+) -> None:
+    attempt = 0
+    while True:
+        attempt += 1
+        headers = plan.request_headers(index)
+        try:
+            with session.stream('GET', plan.url, headers=headers) as response:
+                if not plan.check_response(index, response, headers):
+                    return
+                with plan.open(index) as file:
+                    buffer = bytearray()
+                    try:
+                        for data in response.iter_bytes():
+                            buffer += data
+                            if len(buffer) >= chunk_size:
+                                plan.write(index, file, bytes(buffer))
+                                buffer.clear()
+                    finally:
+                        # Bytes received before a dropped connection are kept
+                        plan.write(index, file, bytes(buffer))
+                        plan.checkpoint(index, file)
+                plan.check_complete(index, response.request)
+            return
+        except (httpx.TransportError, httpx.HTTPStatusError) as exception:
+            delay = _retry_delay(retry, attempt, exception)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+
+async def _afetch_range(
+    session: httpx.AsyncClient,
+    plan: RangedDownload,
+    index: int,
+    chunk_size: int,
+    retry: RetryPolicy
+) -> None:
+    attempt = 0
+    while True:
+        attempt += 1
+        headers = plan.request_headers(index)
+        try:
+            async with session.stream('GET', plan.url, headers=headers) as response:
+                if not plan.check_response(index, response, headers):
+                    return
+                with plan.open(index) as file:
+                    buffer = bytearray()
+                    try:
+                        async for data in response.aiter_bytes():
+                            buffer += data
+                            if len(buffer) >= chunk_size:
+                                plan.write(index, file, bytes(buffer))
+                                buffer.clear()
+                    finally:
+                        # Bytes received before a dropped connection are kept
+                        plan.write(index, file, bytes(buffer))
+                        plan.checkpoint(index, file)
+                plan.check_complete(index, response.request)
+            return
+        except (httpx.TransportError, httpx.HTTPStatusError) as exception:
+            delay = _retry_delay(retry, attempt, exception)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+
+def fetch( # pylint: disable=too-many-arguments
+    session: httpx.Client,
+    url: str,
+    path: Union[str, os.PathLike],
+    size: Optional[int] = None,
+    segments: int = 1,
+    chunk_size: int = download.CHUNK_SIZE,
+    retry: Optional[RetryPolicy] = None,
+    min_segment_size: int = MIN_SEGMENT_SIZE
+) -> int:
+    """ Download {url} to {path}, resuming `{path}.part` if present
+
+    Dropped connections are resumed from the last byte written, up to
+    `retry.max_attempts` times per range. If it still fails, the partial file
+    is kept and the next call continues it.
+
+    Args:
+        session (httpx.Client): Client used for the download
+        url (str): URL of the file
+        path (str|PathLike): Destination file, written once complete
+        size (Optional[int]): Expected size in bytes, checked at the end
+        segments (int): Ranges downloaded in parallel, for files of known size
+        chunk_size (int): Size of the chunks written
+        retry (Optional[RetryPolicy]): Retries of each range (default: RETRY)
+        min_segment_size (int): Smallest segment in bytes
+    Returns:
+        Size of the file
+    """
+    retry = retry or RETRY
+    plan = RangedDownload(url, path, size, segments, min_segment_size)
+    try:
+        try:
+            _fetch_all(session, plan, chunk_size, retry)
+        except _RangesIgnored:
+            plan.restart()
+            _fetch_all(session, plan, chunk_size, retry)
+        return plan.finish()
+    except DownloadSizeError:
+        # Not the announced file, nothing worth resuming
+        plan.discard()
+        raise
+
+
+def _fetch_all(
+    session: httpx.Client,
+    plan: RangedDownload,
+    chunk_size: int,
+    retry: RetryPolicy
+) -> None:
+    pending = plan.pending()
+    if len(pending) <= 1:
+        for index in pending:
+            _fetch_range(session, plan, index, chunk_size, retry)
+        return
+    with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+        futures = [
+            executor.submit(_fetch_range, session, plan, index, chunk_size, retry)
+            for index in pending
+        ]
+        for future in futures:
+            future.result()
+
+
+async def afetch( # pylint: disable=too-many-arguments
+    session: httpx.AsyncClient,
+    url: str,
+    path: Union[str, os.PathLike],
+    size: Optional[int] = None,
+    segments: int = 1,
+    chunk_size: int = download.CHUNK_SIZE,
+    retry: Optional[RetryPolicy] = None,
+    min_segment_size: int = MIN_SEGMENT_SIZE
+) -> int:
+    """Async counterpart of `fetch`"""
+    retry = retry or RETRY
+    plan = RangedDownload(url, path, size, segments, min_segment_size)
+    try:
+        try:
+            await _afetch_all(session, plan, chunk_size, retry)
+        except _RangesIgnored:
+            plan.restart()
+            await _afetch_all(session, plan, chunk_size, retry)
+        return plan.finish()
+    except DownloadSizeError:
+        # Not the announced file, nothing worth resuming
+        plan.discard()
+        raise
+
+
+async def _afetch_all(
+    session: httpx.AsyncClient,
+    plan: RangedDownload,
+    chunk_size: int,
+    retry: RetryPolicy
+) -> None:
+    results = await asyncio.gather(*(
+        _afetch_range(session, plan, index, chunk_size, retry) for index in plan.pending()
+    ), return_exceptions=True)
+    # Every range ended before raising, so a restart doesn't race with them
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
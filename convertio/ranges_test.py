@@ -0,0 +1,212 @@
+"""Ranged Downloads tests"""
+import asyncio
+import base64
+import io
+import os
+import pathlib
+import tempfile
+import unittest
+
+import httpx
+
+from . import client, ranges
+from .models import parameters
+from .retry import RetryPolicy
+from .testing import FakeConvertIO
+
+
+CONTENT = os.urandom(1024 * 1024 + 123)
+
+# Segment size of CONTENT in 4 segments
+STEP = -(-len(CONTENT) // 4)
+
+NO_DELAY = RetryPolicy(max_attempts=5, backoff=0, jitter=False)
+
+
+class TestRangedDownloads(unittest.TestCase):
+    """Test resumable and segmented downloads"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO()
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport(),
+                                                 retry=NO_DELAY)
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = pathlib.Path(self.directory.name) / "result.pdf"
+        conversion = self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(
+                input="base64", file=base64.b64encode(CONTENT).decode(), filename="a.png",
+                outputformat="pdf"
+            )
+        )
+        self.payload = parameters.GetResultParameters(id=conversion.data.id)
+        self.url = "%s/download/%s/a.pdf" % (self.fake.base_url, conversion.data.id)
+
+    def tearDown(self) -> None:
+        self.convertio_client.close()
+        self.directory.cleanup()
+
+    def assert_downloaded(self):
+        """Check the result file and that nothing is left over"""
+        self.assertEqual(self.path.read_bytes(), CONTENT)
+        self.assertEqual(sorted(path.name for path in self.path.parent.iterdir()),
+                         ["result.pdf"])
+
+    def test_resume_dropped_connection(self):
+        """test a dropped download continues from the last byte written"""
+        self.fake.drop(after=1000, count=2)
+
+        self.convertio_client.download_result_file(self.payload, self.path, resume=True)
+
+        self.assert_downloaded()
+        self.assertEqual(self.fake.ranges, [None, "bytes=1000-1048698", "bytes=2000-1048698"])
+
+    def test_resume_across_calls(self):
+        """test a partial file left by a failed call is continued"""
+        self.convertio_client.retry = RetryPolicy(max_attempts=1)
+        self.fake.drop(after=5000)
+
+        with self.assertRaises(httpx.ReadError):
+            self.convertio_client.download_result_file(self.payload, self.path, resume=True)
+        self.assertEqual(self.path.with_name("result.pdf.part").stat().st_size, 5000)
+        self.convertio_client.download_result_file(self.payload, self.path, resume=True)
+
+        self.assert_downloaded()
+        self.assertEqual(self.fake.ranges[-1], "bytes=5000-1048698")
+
+    def test_partial_of_other_url(self):
+        """test a partial file left by another conversion is downloaded again"""
+        other = self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(
+                input="base64", file=base64.b64encode(CONTENT[::-1]).decode(),
+                filename="b.png", outputformat="pdf"
+            )
+        )
+        self.convertio_client.retry = RetryPolicy(max_attempts=1)
+        self.fake.drop(after=5000)
+        with self.assertRaises(httpx.ReadError):
+            self.convertio_client.download_result_file(
+                parameters.GetResultParameters(id=other.data.id), self.path, resume=True
+            )
+        self.assertTrue(self.path.with_name("result.pdf.part.json").exists())
+
+        self.convertio_client.download_result_file(self.payload, self.path, resume=True)
+
+        self.assert_downloaded()
+        self.assertIsNone(self.fake.ranges[-1])
+
+    def test_segments(self):
+        """test a file split into parallel ranges, with dropped segments resumed"""
+        self.fake.drop(after=1000, count=2)
+
+        size = ranges.fetch(self.convertio_client.session, self.url, self.path, len(CONTENT),
+                            segments=4, retry=NO_DELAY, min_segment_size=64 * 1024)
+
+        self.assertEqual(size, len(CONTENT))
+        self.assert_downloaded()
+        self.assertEqual(len(self.fake.ranges), 6)
+        starts = sorted(int(value.split("=")[1].split("-")[0]) for value in self.fake.ranges)
+        self.assertEqual(starts, sorted([0, STEP, 2 * STEP, 3 * STEP] + [1000, STEP + 1000]))
+
+    def test_segments_resume_across_calls(self):
+        """test segment progress is kept between calls"""
+        self.fake.drop(after=1000, count=4)
+        with self.assertRaises(httpx.ReadError):
+            ranges.fetch(self.convertio_client.session, self.url, self.path, len(CONTENT),
+                         segments=4, retry=RetryPolicy(max_attempts=1),
+                         min_segment_size=64 * 1024)
+        self.assertTrue(self.path.with_name("result.pdf.part.json").exists())
+
+        ranges.fetch(self.convertio_client.session, self.url, self.path, len(CONTENT),
+                     segments=4, retry=NO_DELAY, min_segment_size=64 * 1024)
+
+        self.assert_downloaded()
+        resumed = [int(value.split("=")[1].split("-")[0]) for value in self.fake.ranges[4:]]
+        self.assertEqual(sorted(resumed), [start + 1000 for start in range(0, len(CONTENT), STEP)])
+
+    def test_padded_partial_not_trusted(self):
+        """test a padded partial file is downloaded again without matching progress"""
+        state = self.path.with_name("result.pdf.part.json")
+        for name, change in (("other url", lambda: None),
+                             ("corrupt state", lambda: state.write_text("{")),
+                             ("missing state", state.unlink)):
+            with self.subTest(name):
+                self.fake.drop(after=1000, count=4)
+                with self.assertRaises(httpx.ReadError):
+                    ranges.fetch(self.convertio_client.session, self.url, self.path,
+                                 len(CONTENT), segments=4, retry=RetryPolicy(max_attempts=1),
+                                 min_segment_size=64 * 1024)
+                change()
+
+                ranges.fetch(self.convertio_client.session, self.url + "?other", self.path,
+                             len(CONTENT), segments=4, retry=NO_DELAY,
+                             min_segment_size=64 * 1024)
+
+                self.assert_downloaded()
+                self.path.unlink()
+
+    def test_server_without_ranges(self):
+        """test servers ignoring Range get the whole file again"""
+        self.fake.accept_ranges = False
+        self.path.with_name("result.pdf.part").write_bytes(b"stale" * 100)
+
+        self.convertio_client.download_result_file(self.payload, self.path, segments=4)
+
+        self.assert_downloaded()
+
+    def test_segmented_server_without_ranges(self):
+        """test segmented downloads fall back to a single request"""
+        self.fake.accept_ranges = False
+
+        ranges.fetch(self.convertio_client.session, self.url, self.path, len(CONTENT),
+                     segments=4, retry=NO_DELAY, min_segment_size=64 * 1024)
+
+        self.assert_downloaded()
+
+    def test_size_mismatch(self):
+        """test files not matching Output.size are discarded"""
+        for segments in (1, 4):
+            with self.subTest(segments=segments), self.assertRaises(ranges.DownloadSizeError):
+                ranges.fetch(self.convertio_client.session, self.url, self.path,
+                             len(CONTENT) + 1, segments=segments, retry=NO_DELAY,
+                             min_segment_size=64 * 1024)
+            self.assertEqual(list(self.path.parent.iterdir()), [])
+
+    def test_path_required(self):
+        """test resumable downloads refuse file objects"""
+        with self.assertRaises(TypeError):
+            self.convertio_client.download_result_file(self.payload, io.BytesIO(), resume=True)
+
+    def test_served_segments(self):
+        """test parallel segments over real connections"""
+        with self.fake.serve() as base_url, client.ConvertIO(
+            api_key="test", base_url=base_url, retry=NO_DELAY
+        ) as convertio_client:
+            self.fake.drop(after=70000)
+            url = self.url.replace(client.BASE_API_URL, base_url)
+            ranges.fetch(convertio_client.session, url, self.path, len(CONTENT), segments=4,
+                         min_segment_size=64 * 1024, retry=NO_DELAY)
+
+        self.assert_downloaded()
+        self.assertEqual(len(self.fake.ranges), 5)
+
+    def test_async(self):
+        """test resumable segmented downloads with the async client"""
+        self.fake.drop(after=1000, count=3)
+
+        async def download():
+            async with client.AsyncConvertIO(api_key="test", transport=self.fake.transport(),
+                                             retry=NO_DELAY) as convertio_client:
+                await ranges.afetch(convertio_client.session, self.url, self.path,
+                                    len(CONTENT), segments=3, retry=NO_DELAY,
+                                    min_segment_size=64 * 1024)
+                os.remove(self.path)
+                await convertio_client.download_result_file(self.payload, self.path,
+                                                            resume=True)
+
+        asyncio.run(download())
+
+        self.assert_downloaded()
+
+
+if __name__ == '__main__':
+    unittest.main()
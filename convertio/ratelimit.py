@@ -0,0 +1,214 @@
+"""
+    Rate Limiting
+    Token bucket shared by the threads and tasks of a client, and a ledger
+    of the API conversion minutes left on the balance.
+"""
+from typing import Dict, Iterable, Optional
+import asyncio
+import itertools
+import threading
+import time
+
+import pydantic
+
+from .models import responses
+
+
+# Minutes a conversion is assumed to cost until its usage is known
+MINUTES_ESTIMATE = 1
+
+
+class RateLimiterMetrics(pydantic.BaseModel):
+    """ Rate Limiter Metrics
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (float): Maximum burst
+        tokens (float): Tokens currently available, negative while callers wait
+        acquired (int): Tokens handed out
+        throttled (int): Acquisitions that had to wait
+        waited (float): Total seconds spent waiting
+    """
+    rate: float
+    capacity: float
+    tokens: float
+    acquired: int
+    throttled: int
+    waited: float
+
+
+class TokenBucket:
+    """ Token Bucket Rate Limiter
+
+    Every request takes a token, tokens refill at {rate} per second up to
+    {capacity}. Callers reserve their token up front and sleep until it is due,
+    so waiting threads and tasks are served in order.
+
+        convertio = ConvertIO(api_key=..., rate_limiter=TokenBucket(rate=10))
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (Optional[float]): Maximum burst (default: {rate})
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive, got %s" % rate)
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._acquired = 0
+        self._throttled = 0
+        self._waited = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take {tokens}, returns the seconds to wait before using them"""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            self._acquired += tokens
+            delay = max(0.0, -self._tokens / self.rate)
+            if delay:
+                self._throttled += 1
+                self._waited += delay
+        return delay
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Block until {tokens} are available"""
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """Wait on the event loop until {tokens} are available"""
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> RateLimiterMetrics:
+        """Snapshot of the rate limiter metrics"""
+        with self._lock:
+            self._refill()
+            return RateLimiterMetrics(
+                rate=self.rate,
+                capacity=self.capacity,
+                tokens=self._tokens,
+                acquired=self._acquired,
+                throttled=self._throttled,
+                waited=self._waited
+            )
+
+
+class MinutesReserveError(Exception):
+    """New conversion refused by a `MinutesLedger`, it would eat into the reserve"""
+
+
+class LedgerMetrics(pydantic.BaseModel):
+    """ Minutes Ledger Metrics
+
+    Args:
+        balance (Optional[int]): Last balance reported by the API
+        remaining (Optional[int]): Balance minus the usage of conversions started since
+        pending (int): Conversions started since the last balance report, or being started
+        rejected (int): Conversions rejected to keep the reserve
+    """
+    balance: Optional[int]
+    remaining: Optional[int]
+    pending: int
+    rejected: int
+
+
+class MinutesLedger:
+    """ API Minutes Ledger
+
+    Fed with the balance reported by every new conversion
+    (`NewConversionResponse.Data.minutes`), and with the minutes used by each
+    conversion (`ListConversionResponse.Data.minutes`). Conversions started after
+    the last balance report are charged {estimate} minutes until their usage is
+    known, and so are the ones being started from the moment they are allowed.
+    New conversions are rejected once the remaining minutes reach {reserve}.
+
+        convertio = ConvertIO(api_key=..., ledger=MinutesLedger(reserve=10))
+
+    Args:
+        reserve (int): Minutes kept on the balance
+        estimate (int): Minutes a conversion is assumed to cost until its usage is known
+    """
+
+    def __init__(self, reserve: int = 0, estimate: int = MINUTES_ESTIMATE):
+        self.reserve = reserve
+        self.estimate = estimate
+        self.balance: Optional[int] = None
+        self._pending: Dict[str, int] = {}
+        self._reserved: Dict[int, int] = {}
+        self._reservations = itertools.count(1)
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Estimated minutes left, None until the API reported a balance"""
+        with self._lock:
+            return self._remaining()
+
+    def _remaining(self) -> Optional[int]:
+        if self.balance is None:
+            return None
+        return self.balance - sum(self._pending.values()) - sum(self._reserved.values())
+
+    def allow(self) -> Optional[int]:
+        """ Charge a new conversion if it fits in the balance, counts rejections
+
+        Returns a reservation to pass to `observe_balance` once the conversion
+        is started, or to `release` if it wasn't. None if it was rejected.
+        """
+        with self._lock:
+            remaining = self._remaining()
+            if remaining is not None and remaining - self.estimate < self.reserve:
+                self._rejected += 1
+                return None
+            reservation = next(self._reservations)
+            self._reserved[reservation] = self.estimate
+            return reservation
+
+    def release(self, reservation: int) -> None:
+        """Refund a {reservation} whose conversion wasn't started, no-op once settled"""
+        with self._lock:
+            self._reserved.pop(reservation, None)
+
+    def observe_balance(
+        self,
+        conversion_id: str,
+        minutes: int,
+        reservation: Optional[int] = None
+    ) -> None:
+        """Record the balance reported when {conversion_id} was started, settling its reservation"""
+        with self._lock:
+            self._reserved.pop(reservation, None)
+            # The reported balance doesn't include this conversion yet
+            self.balance = minutes
+            self._pending = {conversion_id: self.estimate}
+
+    def observe_usage(self, conversions: Iterable[responses.ListConversionResponse.Data]) -> None:
+        """Record the minutes used by listed conversions"""
+        with self._lock:
+            for conversion in conversions:
+                if conversion.id in self._pending and conversion.status in ('finished', 'failed'):
+                    self._pending[conversion.id] = conversion.minutes
+
+    def metrics(self) -> LedgerMetrics:
+        """Snapshot of the ledger metrics"""
+        with self._lock:
+            return LedgerMetrics(
+                balance=self.balance,
+                remaining=self._remaining(),
+                pending=len(self._pending) + len(self._reserved),
+                rejected=self._rejected
+            )
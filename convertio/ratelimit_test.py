@@ -0,0 +1,167 @@
+"""Rate Limiting tests"""
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from . import client, ratelimit
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+def listed(conversion_id: str, status: str, minutes: int):
+    """Row of a ListConversionResponse"""
+    return responses.ListConversionResponse.Data(
+        id=conversion_id,
+        status=status,
+        minutes=minutes,
+        inputformat="PNG",
+        outputformat="PDF",
+        filename="a.png"
+    )
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test TokenBucket"""
+
+    def test_burst_then_rate(self):
+        """test capacity is available at once, then tokens come at rate"""
+        bucket = ratelimit.TokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: bucket.acquire(), range(15)))
+
+        self.assertGreaterEqual(time.monotonic() - started, 10 / 50 * 0.9)
+        metrics = bucket.metrics()
+        self.assertEqual(metrics.acquired, 15)
+        self.assertEqual(metrics.throttled, 10)
+
+    def test_acquire_async(self):
+        """test tasks share the bucket"""
+        bucket = ratelimit.TokenBucket(rate=100, capacity=1)
+
+        async def acquire_all():
+            await asyncio.gather(*[bucket.acquire_async() for _ in range(11)])
+
+        started = time.monotonic()
+        asyncio.run(acquire_all())
+
+        self.assertGreaterEqual(time.monotonic() - started, 10 / 100 * 0.9)
+
+    def test_invalid_rate(self):
+        """test a rate that never refills is refused"""
+        for rate in (0, -1):
+            with self.subTest(rate=rate), self.assertRaises(ValueError):
+                ratelimit.TokenBucket(rate=rate)
+
+
+class TestMinutesLedger(unittest.TestCase):
+    """Test MinutesLedger"""
+
+    def test_unknown_balance(self):
+        """test conversions are allowed until a balance is reported"""
+        ledger = ratelimit.MinutesLedger(reserve=100)
+
+        self.assertIsNone(ledger.remaining)
+        self.assertTrue(ledger.allow())
+
+    def test_balance_and_usage(self):
+        """test remaining minutes follow balance reports and listed usage"""
+        ledger = ratelimit.MinutesLedger(reserve=5)
+
+        ledger.observe_balance("a", 7)
+        self.assertEqual(ledger.remaining, 6)
+        reservation = ledger.allow()
+        self.assertEqual(ledger.remaining, 5)
+        ledger.release(reservation)
+
+        ledger.observe_usage([listed("a", "finished", 2), listed("b", "finished", 9)])
+        self.assertEqual(ledger.remaining, 5)
+        self.assertFalse(ledger.allow())
+
+        ledger.observe_usage([listed("a", "converting", 0)])
+        self.assertEqual(
+            ledger.metrics(),
+            ratelimit.LedgerMetrics(balance=7, remaining=5, pending=1, rejected=1)
+        )
+
+    def test_concurrent_reservations(self):
+        """test concurrent conversions are charged as soon as they are allowed"""
+        ledger = ratelimit.MinutesLedger(reserve=2)
+        ledger.observe_balance("a", 13)
+        barrier = threading.Barrier(20)
+
+        def allow(_):
+            barrier.wait()
+            return ledger.allow()
+
+        with ThreadPoolExecutor(20) as executor:
+            reservations = [reservation for reservation in executor.map(allow, range(20))
+                            if reservation is not None]
+
+        self.assertEqual(len(reservations), 10)
+        self.assertEqual(ledger.remaining, 2)
+        ledger.release(reservations[0])
+        ledger.observe_balance("b", 11, reservations[1])
+        ledger.release(reservations[1])
+        self.assertEqual(ledger.remaining, 11 - 1 - 8)
+        self.assertEqual(ledger.metrics().pending, 9)
+
+
+class TestClientLimits(unittest.TestCase):
+    """Test ConvertIO with a rate limiter and a ledger"""
+
+    def test_ledger_rejects_new_conversions(self):
+        """test new conversions are rejected before the balance runs out"""
+        fake = FakeConvertIO(minutes=6)
+        payload = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                     outputformat="pdf")
+        with client.ConvertIO(
+            api_key="test",
+            transport=fake.transport(),
+            ledger=ratelimit.MinutesLedger(reserve=2)
+        ) as convertio_client:
+            results = [convertio_client.new_conversion(payload=payload) for _ in range(3)]
+            for _ in range(3):
+                with self.assertRaisesRegex(ratelimit.MinutesReserveError,
+                                            client.MINUTES_RESERVE_ERROR):
+                    convertio_client.new_conversion(payload=payload)
+
+        self.assertTrue(all(isinstance(result, responses.NewConversionResponse)
+                            for result in results))
+        self.assertEqual(fake.minutes, 3)
+        self.assertEqual(convertio_client.ledger.metrics().rejected, 3)
+
+    def test_ledger_refunds_failed_conversions(self):
+        """test minutes reserved by a conversion that wasn't started are refunded"""
+        fake = FakeConvertIO(minutes=6)
+        fake.inject(status=400)
+        payload = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                     outputformat="pdf")
+        ledger = ratelimit.MinutesLedger()
+        ledger.observe_balance("a", 6)
+        with client.ConvertIO(api_key="test", transport=fake.transport(),
+                              ledger=ledger) as convertio_client:
+            failed = convertio_client.new_conversion(payload=payload)
+
+        self.assertEqual(failed.code, 400)
+        self.assertEqual(ledger.remaining, 5)
+
+    def test_rate_limiter_applies_to_every_request(self):
+        """test every endpoint takes a token"""
+        fake = FakeConvertIO()
+        limiter = ratelimit.TokenBucket(rate=1000)
+        with client.ConvertIO(api_key="test", transport=fake.transport(),
+                              rate_limiter=limiter) as convertio_client:
+            convertio_client.convert(
+                parameters.NewConversionParameters(file="http://file_url/a.png", outputformat="pdf")
+            )
+            convertio_client.list_conversions(parameters.ListConversionParameters(count=1))
+
+        self.assertEqual(limiter.metrics().acquired, len(fake.requests))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+"""
+    Compact Conversion Records
+    Column-oriented container of listed conversions, for keeping tens of
+    thousands of rows in memory, with `__slots__` row records and filtering
+    done over whole columns.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from array import array
+import itertools
+
+from . import decode
+from .models import responses
+
+
+# Columns with few distinct values, stored as codes into their values
+CATEGORICAL_COLUMNS = ('status', 'inputformat', 'outputformat')
+
+
+class ConversionRecord: # pylint: disable=too-few-public-methods
+    """ Listed conversion, without per-instance dict
+
+    Args:
+        id (str): Your Conversion ID
+        status (str): Conversion Status
+        minutes (int): API Minutes used by this conversion
+        inputformat (str): Input file format
+        outputformat (str): Output file format
+        filename (str): File name, if applicable
+        error (Optional[str]): User-friendly error string, in case of failed conversion
+    """
+    __slots__ = ('id', 'status', 'minutes', 'inputformat', 'outputformat', 'filename', 'error')
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        id: str, # pylint: disable=redefined-builtin
+        status: str,
+        minutes: int,
+        inputformat: str,
+        outputformat: str,
+        filename: str,
+        error: Optional[str] = None
+    ):
+        self.id = id
+        self.status = status
+        self.minutes = minutes
+        self.inputformat = inputformat
+        self.outputformat = outputformat
+        self.filename = filename
+        self.error = error
+
+    def __repr__(self) -> str:
+        return "ConversionRecord(%s)" % ", ".join(
+            "%s=%r" % (name, getattr(self, name)) for name in self.__slots__
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ConversionRecord) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def to_model(self) -> responses.ListConversionResponse.Data:
+        """Materialize as `ListConversionResponse.Data`"""
+        return decode.construct(
+            responses.ListConversionResponse.Data,
+            {name: getattr(self, name) for name in self.__slots__}
+        )
+
+
+class _Categorical:
+    """Column of repeated strings, stored as codes into the distinct values"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+        # One byte per row, two once the column has more than 256 distinct values
+        self.codes = array('B')
+
+    def append(self, value: str) -> None:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        if code > 255 and self.codes.typecode == 'B':
+            self.codes = array('H', self.codes)
+        self.codes.append(code)
+
+    def mask(self, wanted: Iterable[str]) -> bytes:
+        """One byte per row, 1 where the value is in {wanted}"""
+        lookup = bytearray(max(len(self.values), 256))
+        for value in wanted:
+            code = self.index.get(value)
+            if code is not None:
+                lookup[code] = 1
+        if self.codes.typecode == 'B':
+            # Maps every code to 0 or 1 in a single pass over the column
+            return self.codes.tobytes().translate(lookup[:256])
+        return bytes(map(lookup.__getitem__, self.codes))
+
+    def select(self, mask: bytes) -> "_Categorical":
+        column = _Categorical()
+        column.values = self.values
+        column.index = self.index
+        column.codes = array(self.codes.typecode, itertools.compress(self.codes, mask))
+        return column
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+
+class ConversionTable:
+    """ Column-oriented list of conversions
+
+    Holds `list_conversions` rows in a handful of columns instead of one model
+    per row: repeated strings (status, formats) as 1-byte codes, minutes as a
+    machine integer array, errors only for failed rows. Rows are materialized
+    as `ListConversionResponse.Data` on access.
+
+        table = convertio.list_conversions(payload, compact=True)
+        finished = table.filter(status='finished', outputformat='PDF')
+        for conversion in finished:  # ListConversionResponse.Data
+            ...
+
+    Args:
+        rows (Iterable[dict]): `ListConversionResponse` data rows
+        code (int): HTTP Status Code
+        status (str): Always 'ok'
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = (), code: int = 200, status: str = 'ok'):
+        self.code = code
+        self.status = status
+        self.ids: List[str] = []
+        self.filenames: List[str] = []
+        self.minutes = array('q')
+        self.columns = {name: _Categorical() for name in CATEGORICAL_COLUMNS}
+        self.errors: Dict[int, str] = {}
+        self.extend(rows)
+
+    @classmethod
+    def from_payload(cls, content: bytes) -> "ConversionTable":
+        """Table of a `ListConversionResponse` JSON payload"""
+        payload = decode.loads(content)
+        return cls(payload['data'], code=payload['code'], status=payload['status'])
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """Add a row, as listed by the API"""
+        if row.get('error') is not None:
+            self.errors[len(self.ids)] = row['error']
+        self.ids.append(row['id'])
+        self.filenames.append(row.get('filename', ''))
+        self.minutes.append(int(row['minutes']))
+        for name, column in self.columns.items():
+            column.append(row[name])
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Add rows, as listed by the API"""
+        for row in rows:
+            self.append(row)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def record(self, row: int) -> ConversionRecord:
+        """Row {row} as a `ConversionRecord`"""
+        if row < 0:
+            row += len(self)
+        return ConversionRecord(
+            self.ids[row],
+            self.columns['status'][row],
+            self.minutes[row],
+            self.columns['inputformat'][row],
+            self.columns['outputformat'][row],
+            self.filenames[row],
+            self.errors.get(row)
+        )
+
+    def records(self) -> Iterator[ConversionRecord]:
+        """Iterate rows as `ConversionRecord`"""
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def __getitem__(self, row: int) -> responses.ListConversionResponse.Data:
+        return self.record(row).to_model()
+
+    def __iter__(self) -> Iterator[responses.ListConversionResponse.Data]:
+        for row in range(len(self)):
+            yield self[row]
+
+    @property
+    def data(self) -> List[responses.ListConversionResponse.Data]:
+        """Every row materialized, as in `ListConversionResponse.data`"""
+        return list(self)
+
+    def to_response(self) -> responses.ListConversionResponse:
+        """Materialize as `ListConversionResponse`"""
+        return responses.ListConversionResponse.construct(
+            code=self.code,
+            status=self.status,
+            data=self.data
+        )
+
+    def filter(self, **conditions: Union[str, Iterable[str]]) -> "ConversionTable":
+        """ Rows matching every condition
+
+        Args:
+            status, inputformat, outputformat (str|Iterable[str]): Value, or any of values
+        """
+        mask = None
+        for name, wanted in conditions.items():
+            if name not in self.columns:
+                raise TypeError("Can't filter on %r, use one of %s" % (name, CATEGORICAL_COLUMNS))
+            column_mask = self.columns[name].mask([wanted] if isinstance(wanted, str) else wanted)
+            if mask is None:
+                mask = column_mask
+            else:
+                # AND of the two masks over the whole column at once
+                mask = (int.from_bytes(mask, 'little')
+                        & int.from_bytes(column_mask, 'little')).to_bytes(len(mask), 'little')
+        return self._select(mask if mask is not None else b'\1' * len(self))
+
+    def _select(self, mask: bytes) -> "ConversionTable":
+        table = ConversionTable(code=self.code, status=self.status)
+        table.ids = list(itertools.compress(self.ids, mask))
+        table.filenames = list(itertools.compress(self.filenames, mask))
+        table.minutes = array('q', itertools.compress(self.minutes, mask))
+        table.columns = {name: column.select(mask) for name, column in self.columns.items()}
+        if self.errors:
+            rows = itertools.compress(range(len(self)), mask)
+            table.errors = {
+                new_row: self.errors[row] for new_row, row in enumerate(rows) if row in self.errors
+            }
+        return table
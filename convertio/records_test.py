@@ -0,0 +1,116 @@
+"""Compact Conversion Records tests"""
+import json
+import tracemalloc
+import unittest
+
+from . import client, records
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+def rows(count: int) -> list:
+    """ListConversionResponse data rows"""
+    return [{
+        "id": "%032x" % index,
+        "status": ("finished", "converting", "failed")[index % 3],
+        "minutes": index % 2,
+        "inputformat": "PNG",
+        "outputformat": ("PDF", "JPG")[index % 2],
+        "filename": "file-%s.png" % index,
+        "error": "Conversion failed" if index % 3 == 2 else None
+    } for index in range(count)]
+
+
+class TestConversionTable(unittest.TestCase):
+    """Test ConversionTable"""
+
+    def test_rows_materialize_as_models(self):
+        """test rows are the models a ListConversionResponse holds"""
+        data = rows(6)
+        table = records.ConversionTable(data)
+        expected = responses.ListConversionResponse(code=200, status='ok', data=data)
+
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table[2], expected.data[2])
+        self.assertEqual(table[-1], expected.data[-1])
+        self.assertEqual(table.data, expected.data)
+        self.assertEqual(table.to_response(), expected)
+        self.assertEqual(table.record(2).error, "Conversion failed")
+
+    def test_filter(self):
+        """test filters on one or several columns, with one or several values"""
+        table = records.ConversionTable(rows(12))
+
+        finished = table.filter(status='finished')
+        self.assertEqual([row.id for row in finished], ["%032x" % i for i in (0, 3, 6, 9)])
+
+        failed_pdf = table.filter(status=['failed', 'unknown'], outputformat='JPG')
+        self.assertEqual([row.id for row in failed_pdf], ["%032x" % i for i in (5, 11)])
+        self.assertEqual(failed_pdf[0].error, "Conversion failed")
+        self.assertEqual(len(table.filter(inputformat='PDF')), 0)
+        self.assertEqual(len(table.filter()), 12)
+
+        with self.assertRaises(TypeError):
+            table.filter(filename='file-1.png')
+
+    def test_filter_many_values(self):
+        """test filters on columns with more distinct values than a byte holds"""
+        data = rows(600)
+        for index, row in enumerate(data):
+            row["inputformat"] = "F%s" % index
+        table = records.ConversionTable(data)
+
+        matching = table.filter(inputformat=["F3", "F300", "F599"], status='finished')
+
+        self.assertEqual([row.inputformat for row in matching], ["F3", "F300"])
+        self.assertEqual(matching.filter(inputformat="F300")[0].id, "%032x" % 300)
+
+    def test_from_payload(self):
+        """test a table decodes straight from the API payload"""
+        table = records.ConversionTable.from_payload(
+            json.dumps({"code": 200, "status": "ok", "data": rows(3)}).encode()
+        )
+
+        self.assertEqual((table.code, table.status, len(table)), (200, 'ok', 3))
+        self.assertEqual(list(table.records())[1], records.ConversionRecord(**rows(3)[1]))
+
+    def test_memory_per_row(self):
+        """test the table holds rows in a fraction of the models memory"""
+        data = rows(5000)
+
+        def measure(build):
+            tracemalloc.start()
+            result = build() # pylint: disable=unused-variable
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return size
+
+        models = measure(lambda: responses.ListConversionResponse(code=200, status='ok', data=data))
+        table = measure(lambda: records.ConversionTable(data))
+
+        self.assertLess(table * 10, models)
+
+
+class TestClientCompact(unittest.TestCase):
+    """Test ConvertIO.list_conversions with compact"""
+
+    def test_list_conversions(self):
+        """test the compact result lists the same conversions"""
+        fake = FakeConvertIO()
+        payload = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                     outputformat="pdf")
+        with client.ConvertIO(api_key="test", transport=fake.transport()) as convertio_client:
+            for _ in range(3):
+                convertio_client.new_conversion(payload=payload)
+            listed = convertio_client.list_conversions(parameters.ListConversionParameters(count=3))
+            table = convertio_client.list_conversions(
+                parameters.ListConversionParameters(count=3), compact=True
+            )
+
+        self.assertIsInstance(table, records.ConversionTable)
+        self.assertEqual(table.data, listed.data)
+        self.assertEqual(len(table.filter(status='finished', outputformat='PDF')), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+"""
+    Retries
+    Retry policy with jittered exponential backoff, and a per-host
+    circuit breaker shedding load while the API is unhealthy.
+"""
+from typing import Dict, FrozenSet, Optional
+from email.utils import parsedate_to_datetime
+import datetime
+import random
+import threading
+import time
+
+import httpx
+import pydantic
+
+
+# Error codes worth retrying, the request wasn't processed or the API is struggling
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Error codes a non-idempotent request can be retried on, the API didn't process it
+REJECTED_STATUS_CODES = frozenset({429})
+
+# Transport errors raised before the request was sent
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class RetryPolicy:
+    """ Retry Policy
+
+    Retries transport errors and error codes in {status_codes}, waiting
+    `backoff * 2 ** (attempt - 1)` seconds capped at {max_backoff}, with full jitter,
+    or what the `Retry-After` header asks for.
+
+    Requests that aren't idempotent (starting a conversion, uploading a file)
+    are only retried when they never reached the API: connection errors and
+    error codes in REJECTED_STATUS_CODES.
+
+    Args:
+        max_attempts (int): Attempts per request, including the first one
+        backoff (float): Base delay in seconds
+        max_backoff (float): Longest delay in seconds, `Retry-After` included
+        jitter (bool): Randomize delays between 0 and the backoff
+        status_codes (FrozenSet[int]): Error codes to retry
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: bool = True,
+        status_codes: FrozenSet[int] = RETRY_STATUS_CODES
+    ):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = status_codes
+
+    def should_retry(
+        self,
+        attempt: int,
+        idempotent: bool,
+        response: Optional[httpx.Response] = None,
+        exception: Optional[Exception] = None
+    ) -> bool:
+        """Whether to retry after {attempt} ended with {response} or {exception}"""
+        if attempt >= self.max_attempts:
+            return False
+        if exception is not None:
+            return isinstance(exception, CONNECT_ERRORS) or (
+                idempotent and isinstance(exception, httpx.TransportError)
+            )
+        if response.status_code not in self.status_codes:
+            return False
+        return idempotent or response.status_code in REJECTED_STATUS_CODES
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before the attempt following {attempt}"""
+        retry_after = retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Seconds asked by the `Retry-After` header, as seconds or an HTTP date"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request while the host circuit is open"""
+
+
+class CircuitState(pydantic.BaseModel):
+    """ Circuit State
+
+    Args:
+        state (str): closed, open or half-open
+        failures (int): Consecutive failures
+        rejected (int): Requests rejected while open
+    """
+    state: str
+    failures: int
+    rejected: int
+
+
+class _Circuit:
+    """Circuit of a single host"""
+
+    def __init__(self):
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+
+class CircuitBreaker:
+    """ Per-host Circuit Breaker
+
+    After {failure_threshold} consecutive failures (transport errors or retryable
+    error codes) the circuit of a host opens and requests fail fast with
+    `CircuitOpenError`. After {recovery_timeout} seconds a single trial request
+    is let through: success closes the circuit, failure opens it again.
+
+    Args:
+        failure_threshold (int): Consecutive failures opening the circuit
+        recovery_timeout (float): Seconds the circuit stays open before a trial
+        status_codes (FrozenSet[int]): Error codes counted as failures
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        status_codes: FrozenSet[int] = RETRY_STATUS_CODES
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.status_codes = status_codes
+        self._circuits: Dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, host: str) -> None:
+        """Raise `CircuitOpenError` if requests to {host} are shed"""
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            if circuit.opened_at is None:
+                return
+            if (time.monotonic() - circuit.opened_at >= self.recovery_timeout
+                    and not circuit.trial):
+                circuit.trial = True
+                return
+            circuit.rejected += 1
+        raise CircuitOpenError("Circuit open for %s" % host)
+
+    def record(
+        self,
+        host: str,
+        response: Optional[httpx.Response] = None,
+        exception: Optional[Exception] = None
+    ) -> None:
+        """Record the outcome of a request to {host}"""
+        failed = exception is not None or response.status_code in self.status_codes
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            if not failed:
+                circuit.failures = 0
+                circuit.opened_at = None
+                circuit.trial = False
+                return
+            circuit.failures += 1
+            if circuit.trial or circuit.failures >= self.failure_threshold:
+                circuit.opened_at = time.monotonic()
+                circuit.trial = False
+
+    def cancel_trial(self, host: str) -> None:
+        """Let another request try {host}, after one that ended without an outcome"""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None:
+                circuit.trial = False
+
+    def state(self, host: str) -> CircuitState:
+        """State of the circuit of {host}"""
+        with self._lock:
+            circuit = self._circuits.get(host, _Circuit())
+            if circuit.opened_at is None:
+                state = 'closed'
+            elif circuit.trial or time.monotonic() - circuit.opened_at >= self.recovery_timeout:
+                state = 'half-open'
+            else:
+                state = 'open'
+            return CircuitState(state=state, failures=circuit.failures, rejected=circuit.rejected)
@@ -0,0 +1,262 @@
+"""Retry and Circuit Breaker tests"""
+import asyncio
+import email.utils
+import io
+import os
+import pathlib
+import tempfile
+import time
+import unittest
+
+import httpx
+
+from . import client, retry
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+STATUS = parameters.GetStatusParameters(id="missing")
+NEW_CONVERSION = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                    outputformat="pdf")
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test RetryPolicy"""
+
+    def test_should_retry(self):
+        """test idempotency decides which failures are retried"""
+        policy = retry.RetryPolicy(max_attempts=3)
+        unavailable = httpx.Response(503)
+        throttled = httpx.Response(429)
+
+        self.assertTrue(policy.should_retry(1, True, response=unavailable))
+        self.assertFalse(policy.should_retry(3, True, response=unavailable))
+        self.assertFalse(policy.should_retry(1, True, response=httpx.Response(404)))
+        self.assertFalse(policy.should_retry(1, False, response=unavailable))
+        self.assertTrue(policy.should_retry(1, False, response=throttled))
+        self.assertTrue(policy.should_retry(1, False, exception=httpx.ConnectError("")))
+        self.assertFalse(policy.should_retry(1, False, exception=httpx.ReadTimeout("")))
+        self.assertTrue(policy.should_retry(1, True, exception=httpx.ReadTimeout("")))
+
+    def test_delay(self):
+        """test exponential backoff, capped, and Retry-After"""
+        policy = retry.RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+
+        self.assertEqual([policy.delay(attempt) for attempt in range(1, 5)], [1, 2, 4, 5])
+        self.assertEqual(policy.delay(1, httpx.Response(503, headers={"Retry-After": "3"})), 3)
+        self.assertEqual(policy.delay(1, httpx.Response(503, headers={"Retry-After": "60"})), 5)
+        date = email.utils.formatdate(time.time() + 2, usegmt=True)
+        self.assertAlmostEqual(
+            policy.delay(1, httpx.Response(503, headers={"Retry-After": date})), 2, delta=1
+        )
+
+    def test_jitter(self):
+        """test jittered delays stay under the backoff"""
+        policy = retry.RetryPolicy(backoff=1)
+        delays = [policy.delay(3) for _ in range(100)]
+
+        self.assertTrue(all(0 <= delay <= 4 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test CircuitBreaker"""
+
+    def test_open_then_recover(self):
+        """test the circuit opens, sheds, then closes after a successful trial"""
+        breaker = retry.CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        for _ in range(2):
+            breaker.before_request("host")
+            breaker.record("host", response=httpx.Response(503))
+
+        self.assertEqual(breaker.state("host").state, 'open')
+        with self.assertRaises(retry.CircuitOpenError):
+            breaker.before_request("host")
+        breaker.before_request("other")
+
+        time.sleep(0.06)
+        breaker.before_request("host")
+        with self.assertRaises(retry.CircuitOpenError):
+            breaker.before_request("host")
+        breaker.record("host", response=httpx.Response(200))
+
+        self.assertEqual(breaker.state("host"),
+                         retry.CircuitState(state='closed', failures=0, rejected=2))
+
+    def test_failed_trial_reopens(self):
+        """test a failed trial opens the circuit again"""
+        breaker = retry.CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record("host", exception=httpx.ConnectError(""))
+        time.sleep(0.06)
+
+        self.assertEqual(breaker.state("host").state, 'half-open')
+        breaker.before_request("host")
+        breaker.record("host", response=httpx.Response(502))
+        self.assertEqual(breaker.state("host").state, 'open')
+
+
+class TestClientRetry(unittest.TestCase):
+    """Test ConvertIO with retries and a circuit breaker"""
+
+    def client(self, fake: FakeConvertIO, **kwargs) -> client.ConvertIO:
+        """Client of {fake}"""
+        return client.ConvertIO(api_key="test", transport=fake.transport(), **kwargs)
+
+    def test_retries_idempotent_requests(self):
+        """test status requests are retried, honouring Retry-After"""
+        fake = FakeConvertIO()
+        fake.inject(503, count=2, retry_after="0.05")
+        started = time.monotonic()
+
+        with self.client(fake, retry=retry.RetryPolicy()) as convertio_client:
+            result = convertio_client.get_conversion_status(payload=STATUS)
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(result.code, 404)
+        self.assertEqual(len(fake.requests), 3)
+
+    def test_new_conversion_not_retried_on_server_error(self):
+        """test a conversion that may have started isn't started twice"""
+        fake = FakeConvertIO()
+        fake.inject(500)
+
+        with self.client(fake, retry=retry.RetryPolicy(backoff=0)) as convertio_client:
+            result = convertio_client.new_conversion(payload=NEW_CONVERSION)
+
+        self.assertIsInstance(result, responses.ErrorResponse)
+        self.assertEqual(len(fake.requests), 1)
+
+    def test_new_conversion_retried_when_not_sent(self):
+        """test connection errors and throttling are retried on new conversions"""
+        fake = FakeConvertIO()
+        fake.inject(exception=httpx.ConnectError)
+        fake.inject(429)
+
+        with self.client(fake, retry=retry.RetryPolicy(backoff=0)) as convertio_client:
+            result = convertio_client.new_conversion(payload=NEW_CONVERSION)
+
+        self.assertIsInstance(result, responses.NewConversionResponse)
+        self.assertEqual(len(fake.requests), 3)
+        self.assertEqual(len(fake.conversions), 1)
+
+    def test_streamed_bodies_resent_whole(self):
+        """test retried uploads and base64 conversions send their whole body again"""
+        content = os.urandom(3 * 1024 * 1024 + 7)
+        directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        path = pathlib.Path(directory.name) / "a.png"
+        path.write_bytes(content)
+        for source in (path, io.BytesIO(content)):
+            with self.subTest(source=type(source).__name__):
+                fake = FakeConvertIO()
+                with self.client(fake, retry=retry.RetryPolicy(backoff=0)) as convertio_client:
+                    conversion = convertio_client.new_conversion(
+                        payload=parameters.NewConversionParameters(
+                            input="upload", file="upload", outputformat="pdf"
+                        )
+                    )
+                    fake.inject(429)
+                    uploaded = convertio_client.direct_file_upload(
+                        parameters.DirectFileParameters(id=conversion.data.id,
+                                                        filename="a.png", file=source)
+                    )
+                    if isinstance(source, io.BytesIO):
+                        source.seek(0)
+                    fake.inject(429)
+                    converted = convertio_client.new_conversion(
+                        payload=parameters.NewConversionParameters(
+                            input="base64", file=source, filename="b.png", outputformat="pdf"
+                        )
+                    )
+
+                self.assertEqual(uploaded.data.size, str(len(content)))
+                self.assertEqual(fake.conversions[conversion.data.id].content, content)
+                self.assertEqual(fake.conversions[converted.data.id].content, content)
+
+    def test_one_shot_bodies_not_retried(self):
+        """test bodies that can't be read again aren't retried"""
+        fake = FakeConvertIO()
+        with self.client(fake, retry=retry.RetryPolicy(backoff=0)) as convertio_client:
+            conversion = convertio_client.new_conversion(
+                payload=parameters.NewConversionParameters(
+                    input="upload", file="upload", outputformat="pdf"
+                )
+            )
+            fake.inject(429)
+            result = convertio_client.direct_file_upload(
+                parameters.DirectFileParameters(id=conversion.data.id, filename="a.png",
+                                                file=iter([b"one", b"two"]))
+            )
+
+        self.assertEqual(result.code, 429)
+        self.assertIsNone(fake.conversions[conversion.data.id].content)
+
+    def test_per_endpoint_policy(self):
+        """test endpoints without a policy aren't retried"""
+        fake = FakeConvertIO()
+        fake.inject(503, count=2)
+
+        with self.client(fake, retry={
+                'list_conversions': retry.RetryPolicy(backoff=0)
+        }) as convertio_client:
+            status = convertio_client.get_conversion_status(payload=STATUS)
+            listed = convertio_client.list_conversions(parameters.ListConversionParameters(count=1))
+
+        self.assertEqual(status.code, 503)
+        self.assertIsInstance(listed, responses.ListConversionResponse)
+        self.assertEqual(len(fake.requests), 3)
+
+    def test_circuit_breaker_sheds_requests(self):
+        """test requests fail fast once the circuit is open"""
+        fake = FakeConvertIO()
+        fake.inject(503, count=3)
+        breaker = retry.CircuitBreaker(failure_threshold=3)
+
+        with self.client(fake, retry=retry.RetryPolicy(max_attempts=5, backoff=0),
+                         circuit_breaker=breaker) as convertio_client:
+            with self.assertRaises(retry.CircuitOpenError):
+                convertio_client.get_conversion_status(payload=STATUS)
+            with self.assertRaises(retry.CircuitOpenError):
+                convertio_client.list_conversions(parameters.ListConversionParameters(count=1))
+
+        self.assertEqual(len(fake.requests), 3)
+        self.assertEqual(breaker.state("api.convertio.co").state, 'open')
+
+    def test_cancelled_trial(self):
+        """test a cancelled trial request lets the next request try again"""
+        fake = FakeConvertIO(latency=1)
+        breaker = retry.CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+
+        async def get_status(base_url):
+            host = httpx.URL(base_url).host
+            async with client.AsyncConvertIO(api_key="test", base_url=base_url,
+                                             circuit_breaker=breaker) as convertio_client:
+                breaker.record(host, exception=httpx.ConnectError(""))
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        convertio_client.get_conversion_status(payload=STATUS), 0.1
+                    )
+                breaker.before_request(host)
+
+        with fake.serve() as base_url:
+            asyncio.run(get_status(base_url))
+
+    def test_async_retry(self):
+        """test AsyncConvertIO retries the same way"""
+        fake = FakeConvertIO()
+        fake.inject(exception=httpx.ReadTimeout)
+
+        async def get_status():
+            async with client.AsyncConvertIO(
+                api_key="test",
+                transport=fake.transport(),
+                retry=retry.RetryPolicy(backoff=0)
+            ) as convertio_client:
+                return await convertio_client.get_conversion_status(payload=STATUS)
+
+        self.assertEqual(asyncio.run(get_status()).code, 404)
+        self.assertEqual(len(fake.requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
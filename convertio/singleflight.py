@@ -0,0 +1,91 @@
+"""
+    Single-Flight
+    Coalesce concurrent calls sharing a key into a single call,
+    every caller gets its result.
+"""
+from typing import Any, Awaitable, Callable, Dict
+from concurrent.futures import Future
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """ Thread-safe Single-Flight
+
+    The first caller of a key runs the function, callers arriving while it runs
+    wait for it and share its result (or exception). Once it returns, the key
+    is released and the next call runs the function again.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of keys in flight"""
+        return len(self._calls)
+
+    def do(self, key: str, function: Callable, *args, **kwargs) -> Any:
+        """Call `function(*args, **kwargs)` unless a call for {key} is in flight"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as exception:
+            future.set_exception(exception)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result
+
+
+class _Call: # pylint: disable=too-few-public-methods
+    """Call of an AsyncSingleFlight key and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """ Single-Flight for coroutines running on one event loop
+
+    The call runs as its own task, shared by every caller of the key. A
+    cancelled caller stops waiting for it, the call is only cancelled once
+    no caller is left.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+    def __len__(self) -> int:
+        """Number of keys in flight"""
+        return len(self._calls)
+
+    def _release(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, function: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """Await `function(*args, **kwargs)` unless a call for {key} is in flight"""
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(function(*args, **kwargs)))
+            call.task.add_done_callback(lambda _: self._release(key, call))
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # Every caller was cancelled, new callers start over
+                self._release(key, call)
+                call.task.cancel()
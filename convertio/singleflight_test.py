@@ -0,0 +1,173 @@
+"""Single-Flight tests"""
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from . import client, singleflight
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+def new_conversions(fake: FakeConvertIO) -> int:
+    """Number of conversions started on the fake API"""
+    return len([request for request in fake.requests if request == ("POST", "/convert")])
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test SingleFlight"""
+
+    def test_do_coalesces(self):
+        """test concurrent calls of a key run once"""
+        flight = singleflight.SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def function(value):
+            calls.append(value)
+            started.set()
+            time.sleep(0.1)
+            return value
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            leader = executor.submit(flight.do, "key", function, 1)
+            started.wait()
+            followers = [executor.submit(flight.do, "key", function, 2) for _ in range(9)]
+            results = [leader.result()] + [future.result() for future in followers]
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, [1] * 10)
+        self.assertEqual(len(flight), 0)
+
+    def test_do_exception(self):
+        """test exceptions are shared, the key is released"""
+        flight = singleflight.SingleFlight()
+
+        with self.assertRaises(ValueError):
+            flight.do("key", int, "not a number")
+
+        self.assertEqual(flight.do("key", int, "1"), 1)
+
+
+class TestConvertCoalesce(unittest.TestCase):
+    """Test ConvertIO.convert with coalesce"""
+
+    def test_identical_conversions(self):
+        """test N concurrent identical conversions start one upstream conversion"""
+        fake = FakeConvertIO(convert_time=0.2)
+        payload = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                     outputformat="pdf")
+        with client.ConvertIO(
+            api_key="test",
+            transport=fake.transport(),
+            coalesce=True
+        ) as convertio_client, ThreadPoolExecutor(max_workers=20) as executor:
+            futures = [
+                executor.submit(convertio_client.convert, payload, poll_interval=0.05)
+                for _ in range(20)
+            ]
+            results = [future.result() for future in futures]
+
+        self.assertEqual(new_conversions(fake), 1)
+        self.assertTrue(all(isinstance(result, responses.GetResultResponse) for result in results))
+
+    def test_different_conversions(self):
+        """test different conversions aren't coalesced"""
+        fake = FakeConvertIO(convert_time=0.1)
+        with client.ConvertIO(
+            api_key="test",
+            transport=fake.transport(),
+            coalesce=True
+        ) as convertio_client:
+            results = list(convertio_client.convert_many(
+                [
+                    parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                       outputformat=outputformat)
+                    for outputformat in ("pdf", "docx", "pdf")
+                ],
+                poll_interval=0.05
+            ))
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(new_conversions(fake), 2)
+
+
+class TestAsyncConvertCoalesce(unittest.IsolatedAsyncioTestCase):
+    """Test AsyncConvertIO.convert with coalesce"""
+
+    async def test_identical_conversions(self):
+        """test N concurrent identical conversions start one upstream conversion"""
+        fake = FakeConvertIO(convert_time=0.2)
+        payload = parameters.NewConversionParameters(file="http://file_url/a.png",
+                                                     outputformat="pdf")
+        async with client.AsyncConvertIO(
+            api_key="test",
+            transport=fake.transport(),
+            coalesce=True
+        ) as convertio_client:
+            results = await asyncio.gather(*[
+                convertio_client.convert(payload, poll_interval=0.05) for _ in range(50)
+            ])
+
+        self.assertEqual(new_conversions(fake), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+    async def test_leader_exception(self):
+        """test followers get the leader exception"""
+        flight = singleflight.AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.05)
+            raise ValueError()
+
+        results = await asyncio.gather(
+            *[flight.do("key", fail) for _ in range(3)],
+            return_exceptions=True
+        )
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_leader_cancelled(self):
+        """test cancelling the first caller doesn't cancel the others, nor the call"""
+        flight = singleflight.AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", slow))
+        follower = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        self.assertEqual(await follower, "done")
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(calls, [1])
+        self.assertEqual(len(flight), 0)
+
+    async def test_every_caller_cancelled(self):
+        """test the call is cancelled once no caller awaits it"""
+        flight = singleflight.AsyncSingleFlight()
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do("key", slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(len(flight), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+    Conversion Sweeper
+    Deletes finished and failed conversions once they are old enough, from a
+    background thread or on demand.
+"""
+# pylint: disable=too-many-instance-attributes
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Union
+import logging
+import threading
+import time
+
+from .bulk import CONCURRENCY, DeleteReport
+from .models import parameters, responses
+
+if TYPE_CHECKING:
+    from .client import ConvertIO
+
+
+# Statuses of the conversions swept
+SWEPT_STATUSES = ('finished', 'failed')
+
+# Seconds a conversion is kept after it is first seen finished or failed
+MIN_AGE = 3600.0
+
+# Conversions listed per status by a sweep
+LIST_COUNT = 10000
+
+SweepResult = Union[DeleteReport, responses.ErrorResponse]
+
+
+class Sweeper:
+    """ Conversion Sweeper
+
+    Each sweep lists the finished and failed conversions with `list_conversions`
+    and deletes those older than {min_age} with `ConvertIO.delete_many`. Listed
+    conversions carry no timestamps, so their age is counted from the first
+    sweep that saw them ended; {min_age}=0 deletes them on the first sweep.
+
+        with Sweeper(convertio, min_age=600) as sweeper:
+            sweeper.start(interval=60)
+            ...
+
+    Args:
+        convertio_client (ConvertIO): Client used for the requests
+        min_age (float): Seconds a conversion is kept after it is first seen ended
+        statuses (Iterable[str]): Statuses of the conversions to delete
+        concurrency (int): Maximum number of delete requests in flight
+        count (int): Conversions listed per status by a sweep
+        on_sweep (Optional[Callable]): Called with the result of every background sweep
+        clock (Callable[[], float]): Monotonic clock, in seconds
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        convertio_client: "ConvertIO",
+        *,
+        min_age: float = MIN_AGE,
+        statuses: Iterable[str] = SWEPT_STATUSES,
+        concurrency: int = CONCURRENCY,
+        count: int = LIST_COUNT,
+        on_sweep: Optional[Callable[[SweepResult], None]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.convertio_client = convertio_client
+        self.min_age = min_age
+        self.statuses = tuple(statuses)
+        self.concurrency = concurrency
+        self.count = count
+        self.on_sweep = on_sweep
+        self.clock = clock
+        self.last_result: Optional[SweepResult] = None
+        # When each ended conversion was first listed
+        self._seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "Sweeper":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def sweep(self) -> SweepResult:
+        """ Delete the ended conversions old enough
+
+        Returns:
+            DeleteReport of the deleted conversions, ErrorResponse if listing failed
+        """
+        with self._lock:
+            listed: List[str] = []
+            for status in self.statuses:
+                table = self.convertio_client.list_conversions(
+                    parameters.ListConversionParameters(status=status, count=self.count),
+                    compact=True
+                )
+                if isinstance(table, responses.ErrorResponse):
+                    self.last_result = table
+                    return table
+                listed.extend(table.ids)
+            now = self.clock()
+            # Conversions no longer listed were deleted elsewhere
+            self._seen = {
+                conversion_id: self._seen.get(conversion_id, now) for conversion_id in listed
+            }
+            due = [
+                conversion_id for conversion_id, seen in self._seen.items()
+                if now - seen >= self.min_age
+            ]
+            report = self.convertio_client.delete_many(due, concurrency=self.concurrency)
+            for conversion_id in report.deleted:
+                del self._seen[conversion_id]
+            for conversion_id, error in report.errors.items():
+                if error.code == 404:
+                    del self._seen[conversion_id]
+            self.last_result = report
+            return report
+
+    def start(self, interval: float) -> None:
+        """Sweep every {interval} seconds from a background thread, starting now"""
+        if self._thread is not None:
+            raise RuntimeError("Sweeper is already running")
+        self._closed.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="convertio-sweeper", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the background sweeps, waiting for the current one"""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._closed.is_set():
+            try:
+                result = self.sweep()
+            except Exception: # pylint: disable=broad-except
+                logging.exception("Sweeper: sweep failed")
+            else:
+                if isinstance(result, responses.ErrorResponse):
+                    logging.warning("Sweeper: listing failed: %s", result.error)
+                elif not result.ok:
+                    logging.warning("Sweeper: %d conversions not deleted",
+                                    len(result.errors) + len(result.exceptions))
+                if self.on_sweep is not None:
+                    self.on_sweep(result)
+            self._closed.wait(interval)
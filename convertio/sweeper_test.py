@@ -0,0 +1,73 @@
+"""Conversion Sweeper tests"""
+import threading
+import unittest
+
+from . import client, sweeper
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+class TestSweeper(unittest.TestCase):
+    """Test Sweeper"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO(convert_time=60)
+        self.fake.seed(30)
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport())
+        self.now = 0.0
+        self.sweeper = sweeper.Sweeper(self.convertio_client, min_age=100,
+                                       clock=lambda: self.now)
+
+    def tearDown(self) -> None:
+        self.sweeper.close()
+        self.convertio_client.close()
+
+    def test_min_age(self):
+        """test ended conversions are deleted once old enough, in-flight ones are kept"""
+        converting = self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(file="http://file_url/a.doc",
+                                                       outputformat="pdf")
+        ).data.id
+        failed = next(iter(self.fake.conversions))
+        self.fake.fail(failed)
+
+        self.assertEqual(len(self.sweeper.sweep()), 0)
+        self.now = 50
+        self.fake.seed(5)
+        self.assertEqual(len(self.sweeper.sweep()), 0)
+        self.now = 100
+        report = self.sweeper.sweep()
+
+        self.assertTrue(report.ok)
+        self.assertEqual(len(report.deleted), 30)
+        self.assertIn(failed, report.deleted)
+        self.assertEqual(len(self.fake.conversions), 6)
+        self.assertIn(converting, self.fake.conversions)
+        self.now = 150
+        self.assertEqual(len(self.sweeper.sweep().deleted), 5)
+
+    def test_listing_error(self):
+        """test failed listings are returned and delete nothing"""
+        self.fake.inject(status=401)
+
+        result = self.sweeper.sweep()
+
+        self.assertIsInstance(result, responses.ErrorResponse)
+        self.assertEqual(len(self.fake.conversions), 30)
+
+    def test_background(self):
+        """test the background thread sweeps and reports"""
+        self.sweeper.min_age = 0
+        swept = threading.Event()
+        self.sweeper.on_sweep = lambda result: swept.set()
+
+        self.sweeper.start(interval=60)
+        self.assertTrue(swept.wait(5))
+        self.sweeper.close()
+
+        self.assertEqual(len(self.sweeper.last_result.deleted), 30)
+        self.assertEqual(self.fake.conversions, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
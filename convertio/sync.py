@@ -0,0 +1,337 @@
+"""
+    Conversion Sync
+    Incremental view of the account's conversions: an indexed snapshot kept
+    up to date with small `list_conversions` queries, reporting only what
+    changed since the previous refresh.
+"""
+# pylint: disable=too-many-instance-attributes
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+
+import pydantic
+
+from .models import parameters, responses
+from .records import ConversionRecord, ConversionTable
+
+if TYPE_CHECKING:
+    from .client import ConvertIO
+
+
+# Kinds of changes
+NEW = 'new'
+STATUS = 'status'
+ERROR = 'error'
+REMOVED = 'removed'
+
+# Statuses a conversion can still leave
+IN_FLIGHT_STATUSES = ('uploading', 'converting')
+
+# Listed status of a conversion at a status step before 'finish', 'converting' otherwise
+STEP_STATUSES = {'wait': 'uploading', 'upload': 'uploading'}
+
+# Status error of a failed conversion
+FAILED_CODE = 422
+
+# Conversions listed by the first refresh
+INITIAL_COUNT = 10000
+
+# Initial room for new conversions in each query
+HEAD_COUNT = 10
+
+# Longest window listed at once, older in-flight conversions are checked by status
+MAX_WINDOW = 1000
+
+
+class Change(pydantic.BaseModel):
+    """ Change of a conversion between two refreshes
+
+    Args:
+        kind (str): new, status, error or removed
+        id (str): Conversion ID
+        status (str): Current status, last known one if removed
+        previous_status (Optional[str]): Status before the change, None for new conversions
+        error (Optional[str]): Error of a failed conversion
+    """
+    kind: str
+    id: str
+    status: str
+    previous_status: Optional[str]
+    error: Optional[str]
+
+
+class SyncMetrics(pydantic.BaseModel):
+    """ Sync Metrics
+
+    Args:
+        conversions (int): Conversions in the snapshot
+        in_flight (int): Conversions uploading or converting
+        requests (int): Requests sent
+        rows (int): Listed rows received
+        changes (int): Changes reported
+        head_count (int): Current room for new conversions in each query
+    """
+    conversions: int
+    in_flight: int
+    requests: int
+    rows: int
+    changes: int
+    head_count: int
+
+
+class ConversionSync:
+    """ Incremental `list_conversions` Sync
+
+    The API lists conversions newest first, and only uploading or converting
+    ones can still change. So after a first full listing, each refresh lists
+    the newest conversions down to the oldest in-flight one, plus room for
+    new conversions that grows when it fills up and shrinks back when it
+    doesn't. In-flight conversions too old for that window are checked with
+    narrowed `status=uploading` and `status=converting` queries, and those
+    that left both with a status request each. Rows go through the compact
+    listing, so a refresh costs a small request and work proportional to the
+    changes.
+
+        sync = ConversionSync(convertio)
+        sync.refresh()  # every known conversion, as `new`
+        ...
+        for change in sync.refresh():
+            if change.status == 'finished':
+                ...
+
+    Deleted conversions are reported while in flight; finished or failed ones
+    stay in the snapshot until `forget`.
+
+    Args:
+        convertio_client (ConvertIO): Client used for the queries
+        initial_count (int): Conversions listed by the first refresh
+        head_count (int): Initial room for new conversions in each query
+        max_window (int): Longest window listed by a refresh
+    """
+
+    def __init__(
+        self,
+        convertio_client: "ConvertIO",
+        *,
+        initial_count: int = INITIAL_COUNT,
+        head_count: int = HEAD_COUNT,
+        max_window: int = MAX_WINDOW
+    ):
+        self.convertio_client = convertio_client
+        self.initial_count = initial_count
+        self.min_head_count = head_count
+        self.head_count = head_count
+        self.max_window = max_window
+        self.records: Dict[str, ConversionRecord] = {}
+        # Listing order of the known conversions, larger is newer
+        self._sequence: Dict[str, int] = {}
+        self._next = 0
+        self._in_flight: Dict[str, int] = {}
+        self._loaded = False
+        self._requests = 0
+        self._rows = 0
+        self._changes = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, conversion_id: str) -> bool:
+        return conversion_id in self.records
+
+    def __iter__(self) -> Iterator[ConversionRecord]:
+        return iter(self.records.values())
+
+    def get(self, conversion_id: str) -> Optional[ConversionRecord]:
+        """Last known state of a conversion, None if unknown"""
+        return self.records.get(conversion_id)
+
+    def in_flight(self) -> List[ConversionRecord]:
+        """Conversions uploading or converting"""
+        return [self.records[conversion_id] for conversion_id in self._in_flight]
+
+    def forget(self, conversion_id: str) -> None:
+        """Remove a conversion from the snapshot, i.e. after deleting it"""
+        self.records.pop(conversion_id, None)
+        self._sequence.pop(conversion_id, None)
+        self._in_flight.pop(conversion_id, None)
+
+    def metrics(self) -> SyncMetrics:
+        """Snapshot of the sync metrics"""
+        return SyncMetrics(
+            conversions=len(self.records),
+            in_flight=len(self._in_flight),
+            requests=self._requests,
+            rows=self._rows,
+            changes=self._changes,
+            head_count=self.head_count
+        )
+
+    def refresh(self) -> Union[List[Change], responses.ErrorResponse]:
+        """ Refresh the snapshot
+
+        Returns:
+            Changes since the previous refresh, every listed conversion on the
+            first one, ErrorResponse if a query failed (the snapshot is kept)
+        """
+        changes: List[Change] = []
+        if not self._loaded:
+            table = self._list('all', self.initial_count)
+            if isinstance(table, responses.ErrorResponse):
+                return table
+            self._apply(table, changes)
+            self._loaded = True
+        else:
+            oldest = min(self._in_flight.values(), default=self._next)
+            span = self._next - oldest
+            if span + self.head_count > self.max_window:
+                result = self._refresh_narrowed(changes)
+            else:
+                result = self._refresh_window(span, changes)
+            if isinstance(result, responses.ErrorResponse):
+                return result
+        self._changes += len(changes)
+        return changes
+
+    def _list(self, status: str, count: int) -> Union[ConversionTable, responses.ErrorResponse]:
+        self._requests += 1
+        table = self.convertio_client.list_conversions(
+            parameters.ListConversionParameters(status=status, count=count), compact=True
+        )
+        if not isinstance(table, responses.ErrorResponse):
+            self._rows += len(table)
+        return table
+
+    def _list_head(
+        self,
+        span: int
+    ) -> Tuple[Union[ConversionTable, responses.ErrorResponse], int]:
+        """Newest conversions down to {span} known ones and every new one, and the count asked"""
+        head_count = self.head_count
+        while True:
+            count = span + head_count
+            table = self._list('all', count)
+            if isinstance(table, responses.ErrorResponse):
+                return table, count
+            new = sum(1 for conversion_id in table.ids if conversion_id not in self.records)
+            if new < head_count or len(table) < count:
+                break
+            # Filled with new conversions, the window may not reach the known ones
+            head_count *= 2
+        self.head_count = max(self.min_head_count, 2 * new)
+        return table, count
+
+    def _refresh_window(
+        self,
+        span: int,
+        changes: List[Change]
+    ) -> Optional[responses.ErrorResponse]:
+        table, count = self._list_head(span)
+        if isinstance(table, responses.ErrorResponse):
+            return table
+        oldest_listed = self._apply(table, changes)
+        listed = set(table.ids)
+        for conversion_id, sequence in list(self._in_flight.items()):
+            # Missing in-flight conversions listed past their position were deleted
+            if conversion_id not in listed and (len(table) < count or sequence > oldest_listed):
+                self._remove(conversion_id, changes)
+        return None
+
+    def _refresh_narrowed(self, changes: List[Change]) -> Optional[responses.ErrorResponse]:
+        table, _ = self._list_head(0)
+        if isinstance(table, responses.ErrorResponse):
+            return table
+        self._apply(table, changes)
+        unseen = set(self._in_flight) - set(table.ids)
+        if not unseen:
+            return None
+        for status in IN_FLIGHT_STATUSES:
+            count = len(self._in_flight) + self.head_count
+            while True:
+                listed = self._list(status, count)
+                if isinstance(listed, responses.ErrorResponse):
+                    return listed
+                if len(listed) < count:
+                    break
+                count *= 2
+            for record in listed.records():
+                if record.id in unseen:
+                    self._observe(record, changes)
+                    unseen.discard(record.id)
+        # Left both in-flight statuses since the previous refresh
+        for conversion_id in unseen:
+            self._requests += 1
+            status = self.convertio_client.get_conversion_status(
+                payload=parameters.GetStatusParameters(id=conversion_id)
+            )
+            self._observe_status(conversion_id, status, changes)
+        return None
+
+    def _apply(self, table: ConversionTable, changes: List[Change]) -> int:
+        """Observe the rows of {table}, returns the position of the oldest known one"""
+        for conversion_id in reversed(table.ids):
+            if conversion_id not in self._sequence:
+                self._sequence[conversion_id] = self._next
+                self._next += 1
+        oldest = self._next
+        for record in table.records():
+            oldest = min(oldest, self._sequence[record.id])
+            self._observe(record, changes)
+        return oldest
+
+    def _observe(self, record: ConversionRecord, changes: List[Change]) -> None:
+        previous = self.records.get(record.id)
+        self.records[record.id] = record
+        if record.status in IN_FLIGHT_STATUSES:
+            self._in_flight[record.id] = self._sequence.setdefault(record.id, self._next)
+        else:
+            self._in_flight.pop(record.id, None)
+        if previous is None:
+            kind = NEW
+        elif previous.status != record.status:
+            kind = STATUS
+        elif previous.error != record.error:
+            kind = ERROR
+        else:
+            return
+        changes.append(Change(
+            kind=kind,
+            id=record.id,
+            status=record.status,
+            previous_status=previous.status if previous is not None else None,
+            error=record.error
+        ))
+
+    def _observe_status(
+        self,
+        conversion_id: str,
+        status: Union[responses.GetStatusResponse, responses.ErrorResponse],
+        changes: List[Change]
+    ) -> None:
+        previous = self.records[conversion_id]
+        if isinstance(status, responses.ErrorResponse):
+            if status.code == 404:
+                self._remove(conversion_id, changes)
+                return
+            if status.code != FAILED_CODE:
+                # Key, rate limit and server errors don't tell anything about the conversion
+                return
+            current, minutes, error = 'failed', previous.minutes, status.error
+        elif status.data.step == 'finish':
+            current, minutes, error = 'finished', status.data.minutes, None
+        else:
+            current = STEP_STATUSES.get(status.data.step, 'converting')
+            minutes, error = previous.minutes, None
+        self._observe(ConversionRecord(
+            conversion_id, current, minutes, previous.inputformat, previous.outputformat,
+            previous.filename, error
+        ), changes)
+
+    def _remove(self, conversion_id: str, changes: List[Change]) -> None:
+        record = self.records[conversion_id]
+        self.forget(conversion_id)
+        changes.append(Change(
+            kind=REMOVED,
+            id=conversion_id,
+            status=record.status,
+            previous_status=record.status,
+            error=record.error
+        ))
+
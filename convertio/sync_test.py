@@ -0,0 +1,172 @@
+"""Conversion Sync tests"""
+import unittest
+
+from . import client, sync
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+class TestConversionSync(unittest.TestCase):
+    """Test ConversionSync"""
+
+    def setUp(self) -> None:
+        self.fake = FakeConvertIO(convert_time=60)
+        self.fake.seed(20)
+        self.convertio_client = client.ConvertIO(api_key="test", transport=self.fake.transport())
+        self.sync = sync.ConversionSync(self.convertio_client, head_count=4)
+
+    def tearDown(self) -> None:
+        self.convertio_client.close()
+
+    def new_conversion(self) -> str:
+        """Start a conversion on the fake API, converting until finish()"""
+        conversion = self.convertio_client.new_conversion(
+            payload=parameters.NewConversionParameters(file="http://file_url/a.doc",
+                                                       outputformat="pdf")
+        )
+        return conversion.data.id
+
+    def finish(self, conversion_id: str) -> None:
+        """Finish a converting conversion"""
+        self.fake.conversions[conversion_id].started_at -= self.fake.convert_time
+
+    def refresh(self):
+        """Changes of a refresh, as (kind, id, status) tuples"""
+        changes = self.sync.refresh()
+        self.assertNotIsInstance(changes, responses.ErrorResponse)
+        return [(change.kind, change.id, change.status) for change in changes]
+
+    def test_initial_load(self):
+        """test the first refresh reports every conversion as new"""
+        converting = self.new_conversion()
+
+        changes = self.refresh()
+
+        self.assertEqual(len(changes), 21)
+        self.assertEqual(changes[0], (sync.NEW, converting, 'converting'))
+        self.assertEqual({kind for kind, _, _ in changes}, {sync.NEW})
+        self.assertEqual(len(self.sync), 21)
+        self.assertEqual([record.id for record in self.sync.in_flight()], [converting])
+
+    def test_no_changes(self):
+        """test an idle refresh reports nothing and lists only the head"""
+        self.refresh()
+        rows = self.sync.metrics().rows
+
+        self.assertEqual(self.refresh(), [])
+        self.assertLessEqual(self.sync.metrics().rows - rows, 4)
+        self.assertEqual(self.sync.metrics().requests, 2)
+
+    def test_new_conversions(self):
+        """test new conversions are found, growing the head when it fills up"""
+        self.refresh()
+        created = [self.new_conversion() for _ in range(10)]
+
+        changes = self.refresh()
+
+        self.assertEqual(sorted(conversion_id for _, conversion_id, _ in changes), sorted(created))
+        self.assertEqual({kind for kind, _, _ in changes}, {sync.NEW})
+        self.assertGreaterEqual(self.sync.metrics().head_count, 10)
+        self.assertEqual(self.refresh(), [])
+        self.assertEqual(self.sync.metrics().head_count, 4)
+
+    def test_status_transitions(self):
+        """test in-flight conversions are followed until they finish"""
+        self.refresh()
+        first, second = self.new_conversion(), self.new_conversion()
+        self.refresh()
+        for _ in range(3):
+            self.new_conversion()
+        self.finish(first)
+        requests = self.sync.metrics().requests
+
+        changes = [change for change in self.refresh() if change[0] != sync.NEW]
+
+        self.assertEqual(changes, [(sync.STATUS, first, 'finished')])
+        self.assertEqual(self.sync.get(first).status, 'finished')
+        self.assertEqual(self.sync.metrics().requests - requests, 1)
+        self.finish(second)
+        self.assertEqual(self.refresh(), [(sync.STATUS, second, 'finished')])
+
+    def test_failed(self):
+        """test failed conversions carry their error"""
+        self.refresh()
+        conversion_id = self.new_conversion()
+        self.refresh()
+        self.fake.fail(conversion_id, "Unsupported input")
+
+        changes = self.sync.refresh()
+
+        self.assertEqual([(change.kind, change.status, change.previous_status, change.error)
+                          for change in changes],
+                         [(sync.STATUS, 'failed', 'converting', "Unsupported input")])
+        self.assertEqual(self.sync.in_flight(), [])
+
+    def test_removed(self):
+        """test deleted in-flight conversions are reported"""
+        self.refresh()
+        conversion_id = self.new_conversion()
+        self.refresh()
+        self.convertio_client.delete_or_cancel_conversion(
+            parameters.DeleteCancelParameters(id=conversion_id)
+        )
+
+        self.assertEqual(self.refresh(), [(sync.REMOVED, conversion_id, 'converting')])
+        self.assertNotIn(conversion_id, self.sync)
+
+    def test_narrowed(self):
+        """test old in-flight conversions are checked by status"""
+        self.sync = sync.ConversionSync(self.convertio_client, head_count=4, max_window=20)
+        stays, finishes, fails, deleted = [self.new_conversion() for _ in range(4)]
+        self.fake.seed(30)
+        self.refresh()
+        self.finish(finishes)
+        self.fake.fail(fails)
+        self.convertio_client.delete_or_cancel_conversion(
+            parameters.DeleteCancelParameters(id=deleted)
+        )
+        rows = self.sync.metrics().rows
+
+        changes = self.refresh()
+
+        self.assertEqual(sorted(changes), sorted([
+            (sync.STATUS, finishes, 'finished'),
+            (sync.STATUS, fails, 'failed'),
+            (sync.REMOVED, deleted, 'converting'),
+        ]))
+        self.assertEqual([record.id for record in self.sync.in_flight()], [stays])
+        self.assertLess(self.sync.metrics().rows - rows, 20)
+
+    def test_observed_status(self):
+        """test status responses map to listed statuses, key and rate errors are skipped"""
+        conversion_id = self.new_conversion()
+        self.refresh()
+        changes = []
+        observe_status = self.sync._observe_status # pylint: disable=protected-access
+
+        def observe(status):
+            observe_status(conversion_id, status, changes)
+            return self.sync.get(conversion_id).status
+
+        uploading = responses.GetStatusResponse(code=200, status="ok", data={
+            "id": conversion_id, "step": "upload", "step_percent": 0, "minutes": 0, "output": []
+        })
+        self.assertEqual(observe(uploading), 'uploading')
+        for code in (401, 403, 429, 503):
+            error = responses.ErrorResponse(code=code, status="error", error="x")
+            self.assertEqual(observe(error), 'uploading')
+        self.assertEqual(observe(responses.ErrorResponse(code=422, status="error", error="x")),
+                         'failed')
+        self.assertEqual([change.status for change in changes], ['uploading', 'failed'])
+
+    def test_error(self):
+        """test failed queries return an ErrorResponse and keep the snapshot"""
+        self.refresh()
+        self.fake.inject(status=401)
+
+        self.assertIsInstance(self.sync.refresh(), responses.ErrorResponse)
+        self.assertEqual(len(self.sync), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
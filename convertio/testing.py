@@ -0,0 +1,462 @@
+"""
+    Local stand-in for the Convertio API
+
+    `FakeConvertIO` implements the API endpoints used by the client in-process.
+    It can be mounted on a client through `httpx.MockTransport`:
+
+        fake = FakeConvertIO()
+        convertio = ConvertIO(api_key="test", transport=fake.transport())
+
+    or served over a real socket, to exercise connection pooling:
+
+        with fake.serve() as base_url:
+            convertio = ConvertIO(api_key="test", base_url=base_url)
+"""
+# pylint: disable=too-many-instance-attributes
+from typing import AsyncIterator, Dict, Iterator, Optional, Type
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base64
+import collections
+import io
+import json
+import threading
+import time
+import urllib.parse
+import uuid
+import zipfile
+
+import httpx
+
+
+# Size of the chunks result downloads are streamed in
+CHUNK_SIZE = 64 * 1024
+
+
+class ChunkedStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """ Response body served in chunks, to both sync and async clients
+
+    Args:
+        content (bytes): Body
+        chunk_size (int): Size of the chunks
+        drop_after (Optional[int]): Bytes sent before the connection drops, all by default
+    """
+
+    def __init__(self, content: bytes, chunk_size: int = CHUNK_SIZE,
+                 drop_after: Optional[int] = None):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.drop_after = drop_after
+
+    def __iter__(self) -> Iterator[bytes]:
+        end = len(self.content) if self.drop_after is None else self.drop_after
+        for offset in range(0, end, self.chunk_size):
+            yield self.content[offset:min(offset + self.chunk_size, end)]
+        if self.drop_after is not None:
+            raise httpx.ReadError("Injected disconnect")
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self:
+            yield chunk
+
+
+class Conversion: # pylint: disable=too-few-public-methods
+    """Conversion state kept by the fake server"""
+
+    def __init__(self, conversion_id: str, filename: str, outputformat: str):
+        self.id = conversion_id
+        self.filename = filename
+        self.outputformat = outputformat
+        self.inputformat = filename.rsplit('.', 1)[-1].upper() if '.' in filename else ''
+        self.content: Optional[bytes] = None
+        self.started_at: Optional[float] = None
+        self.callback_url: Optional[str] = None
+        self.pages = 1
+        self.error: Optional[str] = None
+
+    @property
+    def output_name(self) -> str:
+        """Output filename, a ZIP of the pages for multi-file outputs"""
+        if self.pages > 1:
+            return "%s.zip" % self.filename.rsplit('.', 1)[0]
+        return "%s.%s" % (self.filename.rsplit('.', 1)[0], self.outputformat.lower())
+
+    def files(self) -> Dict[str, bytes]:
+        """Output files of a multi-file output, by name"""
+        stem = self.filename.rsplit('.', 1)[0]
+        return {
+            "%s-%s.%s" % (stem, page, self.outputformat.lower()): b"page %d\n" % page + self.content
+            for page in range(1, self.pages + 1)
+        }
+
+    def output(self) -> bytes:
+        """Output file content"""
+        if self.pages == 1:
+            return self.content
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as output:
+            for name, content in self.files().items():
+                output.writestr(name, content)
+        return archive.getvalue()
+
+
+class FakeConvertIO:
+    """ Fake ConvertIO API
+
+    Result downloads honour `Range` headers, unless `accept_ranges` is set to
+    False, and the `Range` header of every download is recorded in `ranges`.
+    The most requests handled at once is recorded in `max_in_flight`, and
+    the connections accepted by `serve` in `connections`.
+
+    Args:
+        minutes (int): Conversion minutes available on the balance
+        convert_time (float): Seconds a conversion spends in the 'convert' step
+        result_size (int): Size in bytes of results for url inputs
+        latency (float): Seconds added to every response
+        pages (int): Output files per conversion, more than 1 makes multi-file outputs
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+        self,
+        minutes: int = 1000,
+        convert_time: float = 0.0,
+        result_size: int = 1024,
+        latency: float = 0.0,
+        pages: int = 1
+    ):
+        self.minutes = minutes
+        self.convert_time = convert_time
+        self.result_size = result_size
+        self.latency = latency
+        self.pages = pages
+        self.base_url = 'http://api.convertio.co'
+        self.conversions = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        self._callback_client: Optional[httpx.Client] = None
+        self._faults = collections.deque()
+        self._drops = collections.deque()
+        self.accept_ranges = True
+        self.ranges = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = 0
+
+    def transport(self) -> httpx.MockTransport:
+        """In-process transport for `httpx.Client`/`httpx.AsyncClient`"""
+        return httpx.MockTransport(self)
+
+    @contextmanager
+    def serve(self, host: str = '127.0.0.1', port: int = 0) -> Iterator[str]:
+        """Serve the fake API over HTTP/1.1 in a background thread, yields its base URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Translate http.server requests into `httpx.Request`"""
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock: # pylint: disable=protected-access
+                    fake.connections += 1
+
+            def handle_one_request(self):
+                self.raw_requestline = self.rfile.readline(65537)
+                if not self.raw_requestline or not self.parse_request():
+                    self.close_connection = True
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                request = httpx.Request(
+                    self.command,
+                    fake.base_url + self.path,
+                    headers=dict(self.headers.items()),
+                    content=self.rfile.read(length)
+                )
+                response = fake(request)
+                body = bytearray()
+                dropped = False
+                try:
+                    for chunk in response.stream:
+                        body += chunk
+                except httpx.TransportError:
+                    dropped = True
+                self.send_response(response.status_code)
+                for key, value in response.headers.items():
+                    if key.lower() not in ('content-length', 'transfer-encoding'):
+                        self.send_header(key, value)
+                self.send_header('Content-Length',
+                                 response.headers.get('Content-Length', str(len(body))))
+                self.end_headers()
+                self.wfile.write(body)
+                self.wfile.flush()
+                if dropped:
+                    # The announced body is cut short, as by a dropped connection
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        self.base_url = 'http://%s:%s' % server.server_address[:2]
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        try:
+            yield self.base_url
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def inject(
+        self,
+        status: int = 503,
+        count: int = 1,
+        retry_after: Optional[str] = None,
+        exception: Optional[Type[httpx.TransportError]] = None
+    ) -> None:
+        """ Fail the next {count} requests
+
+        Args:
+            status (int): HTTP status of the error responses
+            count (int): Number of requests to fail
+            retry_after (Optional[str]): Retry-After header of the error responses
+            exception (Optional[Type[httpx.TransportError]]): Raise it instead of responding
+        """
+        with self._lock:
+            self._faults.extend([(status, retry_after, exception)] * count)
+
+    def drop(self, after: int, count: int = 1) -> None:
+        """ Cut the next {count} result downloads after {after} bytes
+
+        Args:
+            after (int): Bytes of the body sent before the connection drops
+            count (int): Number of downloads to cut
+        """
+        with self._lock:
+            self._drops.extend([after] * count)
+
+    def fail(self, conversion_id: str, error: str = "Conversion failed") -> None:
+        """Make a conversion fail with {error}"""
+        with self._lock:
+            self.conversions[conversion_id].error = error
+
+    def seed(self, count: int, outputformat: str = 'pdf') -> None:
+        """Add {count} finished conversions of url inputs, as if converted earlier"""
+        started_at = time.monotonic() - self.convert_time
+        with self._lock:
+            for index in range(count):
+                conversion = Conversion(uuid.uuid4().hex, "file-%s.png" % index, outputformat)
+                conversion.content = b'\0' * self.result_size
+                conversion.started_at = started_at
+                self.conversions[conversion.id] = conversion
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return self._handle(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.strip('/').split('/')
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests.append((request.method, request.url.path))
+            fault = self._faults.popleft() if self._faults else None
+        if fault is not None:
+            status, retry_after, exception = fault
+            if exception is not None:
+                raise exception("Injected fault", request=request)
+            response = self._error(status, "Injected fault")
+            if retry_after is not None:
+                response.headers['Retry-After'] = retry_after
+            return response
+        if parts[:1] == ['download'] and len(parts) in (3, 4):
+            return self._download(request, parts[1], parts[3] if len(parts) == 4 else None)
+        if parts[:1] != ['convert']:
+            return self._error(404, "Endpoint not found")
+        if request.method == 'POST' and parts == ['convert']:
+            return self._new_conversion(request)
+        if request.method == 'POST' and parts == ['convert', 'list']:
+            return self._list_conversions(request)
+        if len(parts) < 2 or parts[1] not in self.conversions:
+            return self._error(404, "File not found")
+        conversion = self.conversions[parts[1]]
+        if request.method == 'PUT' and len(parts) == 3:
+            return self._upload(request, conversion, parts[2])
+        if request.method == 'GET' and parts[2:] == ['status']:
+            return self._status(conversion)
+        if request.method == 'GET' and parts[2:3] == ['dl']:
+            return self._result(conversion)
+        if request.method == 'DELETE' and len(parts) == 2:
+            with self._lock:
+                del self.conversions[conversion.id]
+            return self._ok(message="File deleted")
+        return self._error(404, "Endpoint not found")
+
+    @staticmethod
+    def _ok(**body) -> httpx.Response:
+        return httpx.Response(200, json={"code": 200, "status": "ok", **body})
+
+    @staticmethod
+    def _error(code: int, error: str) -> httpx.Response:
+        return httpx.Response(code, json={"code": code, "status": "error", "error": error})
+
+    def _new_conversion(self, request: httpx.Request) -> httpx.Response:
+        data = json.loads(request.content)
+        if not data.get('apikey'):
+            return self._error(401, "This API Key is invalid")
+        input_type = data.get('input', 'url')
+        filename = data.get('filename') or data['file'].rsplit('/', 1)[-1]
+        conversion = Conversion(uuid.uuid4().hex, filename, data['outputformat'])
+        conversion.pages = self.pages
+        if input_type == 'url':
+            conversion.content = b'\0' * self.result_size
+        elif input_type == 'base64':
+            conversion.content = base64.b64decode(data['file'])
+        elif input_type == 'raw':
+            conversion.content = data['file'].encode()
+        conversion.callback_url = (data.get('options') or {}).get('callback_url')
+        with self._lock:
+            if self.minutes <= 0:
+                return self._error(401, "No convertion minutes left")
+            self.conversions[conversion.id] = conversion
+            self.minutes -= 1
+            minutes = self.minutes
+        if conversion.content is not None:
+            self._start(conversion)
+        return self._ok(data={"id": conversion.id, "minutes": minutes})
+
+    def _upload(self, request: httpx.Request, conversion: Conversion, filename: str):
+        conversion.content = request.read()
+        conversion.filename = filename
+        self._start(conversion)
+        return self._ok(data={
+            "id": conversion.id,
+            "file": filename,
+            "size": str(len(conversion.content))
+        })
+
+    def _start(self, conversion: Conversion) -> None:
+        conversion.started_at = time.monotonic()
+        if conversion.callback_url:
+            timer = threading.Timer(self.convert_time, self._callback, args=(conversion,))
+            timer.daemon = True
+            timer.start()
+
+    def _callback(self, conversion: Conversion) -> None:
+        with self._lock:
+            if self._callback_client is None:
+                self._callback_client = httpx.Client()
+        self._callback_client.get(
+            conversion.callback_url,
+            params={"id": conversion.id, "step": "finished"}
+        )
+
+    def _step(self, conversion: Conversion):
+        if conversion.error is not None:
+            return 'failed', 0
+        if conversion.started_at is None:
+            return 'upload', 0
+        elapsed = time.monotonic() - conversion.started_at
+        if elapsed >= self.convert_time:
+            return 'finish', 100
+        return 'convert', int(100 * elapsed / self.convert_time)
+
+    def _status(self, conversion: Conversion) -> httpx.Response:
+        step, step_percent = self._step(conversion)
+        if step == 'failed':
+            return self._error(422, conversion.error)
+        output = []
+        if step == 'finish':
+            output = {
+                "url": "%s/download/%s/%s" % (self.base_url, conversion.id, conversion.output_name),
+                "size": str(len(conversion.output()))
+            }
+            if conversion.pages > 1:
+                output["files"] = {
+                    name: str(len(content)) for name, content in conversion.files().items()
+                }
+        return self._ok(data={
+            "id": conversion.id,
+            "step": step,
+            "step_percent": step_percent,
+            "minutes": 1,
+            "output": output
+        })
+
+    def _result(self, conversion: Conversion) -> httpx.Response:
+        if self._step(conversion)[0] != 'finish':
+            return self._error(422, ("File is not ready yet, finished with "
+                                     "errors or had been deleted (check file status)"))
+        return self._ok(data={
+            "id": conversion.id,
+            "encode": "base64",
+            "content": base64.b64encode(conversion.output()).decode()
+        })
+
+    def _download(
+        self,
+        request: httpx.Request,
+        conversion_id: str,
+        name: Optional[str] = None
+    ) -> httpx.Response:
+        conversion = self.conversions.get(conversion_id)
+        if conversion is None or self._step(conversion)[0] != 'finish':
+            return httpx.Response(404, request=request)
+        if name is None:
+            content = conversion.output()
+        else:
+            files = conversion.files() if conversion.pages > 1 else {}
+            content = files.get(urllib.parse.unquote(name))
+            if content is None:
+                return httpx.Response(404, request=request)
+        status = 200
+        headers = {"Accept-Ranges": "bytes"} if self.accept_ranges else {}
+        requested = request.headers.get('Range')
+        with self._lock:
+            self.ranges.append(requested)
+            drop_after = self._drops.popleft() if self._drops else None
+        if requested and self.accept_ranges:
+            start, _, end = requested.partition('=')[2].partition('-')
+            start, end = int(start), min(int(end or len(content) - 1), len(content) - 1)
+            if start >= len(content):
+                return httpx.Response(416, headers={"Content-Range": "bytes */%s" % len(content)})
+            status = 206
+            headers["Content-Range"] = "bytes %s-%s/%s" % (start, end, len(content))
+            content = content[start:end + 1]
+        headers["Content-Length"] = str(len(content))
+        return httpx.Response(
+            status,
+            headers=headers,
+            stream=ChunkedStream(content, drop_after=drop_after)
+        )
+
+    def _list_conversions(self, request: httpx.Request) -> httpx.Response:
+        data = json.loads(request.content)
+        status = data.get('status', 'all')
+        rows = []
+        for conversion in reversed(list(self.conversions.values())):
+            step = self._step(conversion)[0]
+            row_status = {
+                'upload': 'uploading', 'finish': 'finished', 'failed': 'failed'
+            }.get(step, 'converting')
+            if status not in ('all', row_status):
+                continue
+            rows.append({
+                "id": conversion.id,
+                "status": row_status,
+                "minutes": 1 if row_status == 'finished' else 0,
+                "inputformat": conversion.inputformat,
+                "outputformat": conversion.outputformat.upper(),
+                "filename": conversion.filename,
+                "error": conversion.error
+            })
+            if len(rows) >= data.get('count', len(self.conversions)):
+                break
+        return self._ok(data=rows)
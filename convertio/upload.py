@@ -0,0 +1,224 @@
+"""
+    File Uploads
+    Stream upload bodies in fixed-size chunks, so memory use
+    doesn't depend on the file size.
+"""
+from typing import AsyncIterator, BinaryIO, Callable, Iterable, Iterator, Optional, Union
+import base64
+import json
+import mmap
+import os
+
+from .lazy import lazy_import
+
+asyncio = lazy_import('asyncio')
+
+
+# Size of the chunks sent to the API
+CHUNK_SIZE = 1024 * 1024
+
+# Size of the chunks base64-encoded at once, a multiple of 3 so chunks encode without padding
+BASE64_CHUNK_SIZE = 3 * 256 * 1024
+
+Source = Union[str, os.PathLike, BinaryIO, bytes, Iterable[bytes]]
+
+# Called with the bytes sent so far and the total size, if known
+Progress = Callable[[int, Optional[int]], None]
+
+
+def source_size(source: Source) -> Optional[int]:
+    """Size of {source} in bytes, None for iterators of chunks"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if hasattr(source, 'read'):
+        try:
+            return os.fstat(source.fileno()).st_size - source.tell()
+        except (AttributeError, OSError, ValueError):
+            pass
+        try:
+            position = source.tell()
+            size = source.seek(0, os.SEEK_END) - position
+            source.seek(position)
+            return size
+        except (AttributeError, OSError):
+            return None
+    return None
+
+
+def rewinder(source: Source) -> Optional[Callable[[], None]]:
+    """Callable moving {source} back to where it is now, None if it can only be read once"""
+    if isinstance(source, (str, os.PathLike, bytes, bytearray, memoryview)):
+        return lambda: None
+    if hasattr(source, 'read'):
+        try:
+            if source.seekable():
+                position = source.tell()
+                return lambda: source.seek(position)
+        except (AttributeError, OSError, ValueError):
+            pass
+    return None
+
+
+class Body:
+    """ Streamed request body, rebuilt for every attempt of a request
+
+    Args:
+        source (Source): Content read by the body, rewound before each new attempt
+        make (Callable): Returns a fresh iterator of the body chunks
+    """
+
+    def __init__(self, source: Source, make: Callable[[], Union[Iterator[bytes],
+                                                                 AsyncIterator[bytes]]]):
+        self.make = make
+        self._rewind = rewinder(source)
+        self._started = False
+
+    @property
+    def replayable(self) -> bool:
+        """Whether the body can be sent again"""
+        return self._rewind is not None
+
+    def __call__(self) -> Union[Iterator[bytes], AsyncIterator[bytes]]:
+        if self._started:
+            if self._rewind is None:
+                raise RuntimeError("Body can only be sent once")
+            self._rewind()
+        self._started = True
+        return self.make()
+
+
+def _read_chunks(source: Source, chunk_size: int) -> Iterator[bytes]:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    content.madvise(mmap.MADV_SEQUENTIAL)
+                released = 0
+                for offset in range(0, len(content), chunk_size):
+                    yield content[offset:offset + chunk_size]
+                    # Drop pages already sent from the resident set
+                    end = (offset + chunk_size) // mmap.PAGESIZE * mmap.PAGESIZE
+                    if hasattr(mmap, 'MADV_DONTNEED') and end > released:
+                        content.madvise(mmap.MADV_DONTNEED, released,
+                                        min(end, len(content)) - released)
+                        released = end
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        content = memoryview(source)
+        for offset in range(0, len(content), chunk_size):
+            yield bytes(content[offset:offset + chunk_size])
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from source
+
+
+def iter_chunks(
+    source: Source,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[Progress] = None
+) -> Iterator[bytes]:
+    """ Read {source} in chunks of {chunk_size} bytes
+
+    Local files are memory-mapped, file objects are read from their current
+    position and iterables of chunks are passed through as is.
+
+    Args:
+        source (Source): Path, binary file object, bytes or iterable of chunks
+        chunk_size (int): Size of the chunks
+        progress (Optional[Progress]): Called after every chunk with the bytes
+                                       read so far and the total size, if known
+    """
+    total = source_size(source)
+    sent = 0
+    for chunk in _read_chunks(source, chunk_size):
+        sent += len(chunk)
+        if progress is not None:
+            progress(sent, total)
+        yield chunk
+
+
+async def aiter_chunks(
+    source: Source,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[Progress] = None
+) -> AsyncIterator[bytes]:
+    """Async counterpart of `iter_chunks`, as required by `httpx.AsyncClient`"""
+    total = source_size(source)
+    sent = 0
+    async for chunk in _aiter_in_thread(source, _read_chunks(source, chunk_size)):
+        sent += len(chunk)
+        if progress is not None:
+            progress(sent, total)
+        yield chunk
+
+
+async def _aiter_in_thread(source: Source, chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Pull {chunks} from a worker thread, unless {source} is already in memory"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        for chunk in chunks:
+            yield chunk
+        return
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _base64_json_prefix(fields: dict) -> bytes:
+    prefix = json.dumps(fields)[:-1]
+    return (prefix + (', ' if fields else '') + '"file": "').encode()
+
+
+def base64_json_size(fields: dict, source: Source) -> Optional[int]:
+    """Size of the `iter_base64_json` body in bytes, None if {source} size is unknown"""
+    size = source_size(source)
+    if size is None:
+        return None
+    return len(_base64_json_prefix(fields)) + 4 * -(-size // 3) + len(b'"}')
+
+
+def iter_base64_json(
+    fields: dict,
+    source: Source,
+    chunk_size: int = BASE64_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """ JSON object of {fields} with {source} base64-encoded as "file"
+
+    The body is produced incrementally: {source} is read and encoded chunk by
+    chunk, so the file is never held in memory, encoded or not.
+
+    Args:
+        fields (dict): JSON serializable fields of the object, besides "file"
+        source (Source): Path, binary file object, bytes or iterable of chunks
+        chunk_size (int): Size of the chunks read from {source}
+    """
+    yield _base64_json_prefix(fields)
+    remainder = b''
+    for chunk in iter_chunks(source, chunk_size):
+        if remainder:
+            chunk = remainder + chunk
+        cut = len(chunk) - len(chunk) % 3
+        remainder = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut] if remainder else chunk)
+    yield base64.b64encode(remainder) + b'"}'
+
+
+async def aiter_base64_json(
+    fields: dict,
+    source: Source,
+    chunk_size: int = BASE64_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Async counterpart of `iter_base64_json`, reading and encoding in a worker thread"""
+    async for chunk in _aiter_in_thread(source, iter_base64_json(fields, source, chunk_size)):
+        yield chunk
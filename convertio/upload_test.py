@@ -0,0 +1,247 @@
+"""File Uploads tests"""
+import asyncio
+import base64
+import io
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import tracemalloc
+import unittest
+
+import httpx
+
+from . import client, upload
+from .models import parameters, responses
+from .testing import FakeConvertIO
+
+
+class CountingTransport(httpx.BaseTransport):
+    """Transport consuming request bodies without keeping them"""
+
+    def __init__(self):
+        self.received = 0
+        self.headers = None
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.headers = request.headers
+        for chunk in request.stream:
+            self.received += len(chunk)
+        return httpx.Response(200, json={
+            "code": 200,
+            "status": "ok",
+            "data": {"id": "abc", "file": "file.bin", "size": str(self.received), "minutes": 10}
+        })
+
+
+class TestIterChunks(unittest.TestCase):
+    """Test upload.iter_chunks"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, "file.bin")
+        with open(self.path, "wb") as file:
+            file.write(b"0123456789")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_sources(self):
+        """test every kind of source is read in chunks"""
+        with open(self.path, "rb") as file:
+            sources = [self.path, file, b"0123456789", iter([b"0123", b"456", b"789"])]
+            chunks = [list(upload.iter_chunks(source, chunk_size=4)) for source in sources]
+
+        self.assertEqual(chunks[:3], [[b"0123", b"4567", b"89"]] * 3)
+        self.assertEqual(chunks[3], [b"0123", b"456", b"789"])
+
+    def test_source_size(self):
+        """test size of sources, None for iterators"""
+        with open(self.path, "rb") as file:
+            file.read(2)
+            self.assertEqual(upload.source_size(file), 8)
+        self.assertEqual(upload.source_size(self.path), 10)
+        self.assertEqual(upload.source_size(io.BytesIO(b"0123")), 4)
+        self.assertIsNone(upload.source_size(iter([b"0123"])))
+
+    def test_empty_file(self):
+        """test empty files yield no chunk"""
+        with open(self.path, "wb"):
+            pass
+
+        self.assertEqual(list(upload.iter_chunks(self.path)), [])
+
+    def test_progress(self):
+        """test progress is reported after every chunk"""
+        progress = []
+
+        list(upload.iter_chunks(self.path, chunk_size=4,
+                                progress=lambda *args: progress.append(args)))
+
+        self.assertEqual(progress, [(4, 10), (8, 10), (10, 10)])
+
+    def test_async_in_worker_thread(self):
+        """test async iterators read and encode off the event loop thread"""
+        threads = set()
+
+        def chunks():
+            for chunk in (b"0123", b"456", b"789"):
+                threads.add(threading.current_thread())
+                yield chunk
+
+        async def read():
+            with open(self.path, "rb") as file:
+                return ([chunk async for chunk in upload.aiter_chunks(file, chunk_size=4)],
+                        b"".join([chunk async for chunk in upload.aiter_base64_json({}, chunks())]))
+
+        read_chunks, body = asyncio.run(read())
+
+        self.assertEqual(read_chunks, [b"0123", b"4567", b"89"])
+        self.assertEqual(json.loads(body), {"file": base64.b64encode(b"0123456789").decode()})
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+class TestIterBase64Json(unittest.TestCase):
+    """Test upload.iter_base64_json"""
+
+    def test_body(self):
+        """test body is valid JSON whatever the chunk boundaries"""
+        content = bytes(range(256)) * 3
+        fields = {"apikey": "test", "input": "base64"}
+        sources = [
+            content,
+            io.BytesIO(content),
+            iter([content[:1], content[1:5], content[5:700], content[700:]])
+        ]
+
+        for source in sources:
+            body = b"".join(upload.iter_base64_json(fields, source, chunk_size=6))
+
+            self.assertEqual(
+                json.loads(body),
+                {**fields, "file": base64.b64encode(content).decode()}
+            )
+
+    def test_size(self):
+        """test predicted body size"""
+        fields = {"apikey": "test"}
+        for size in range(8):
+            content = b"x" * size
+
+            self.assertEqual(
+                upload.base64_json_size(fields, content),
+                len(b"".join(upload.iter_base64_json(fields, content)))
+            )
+
+
+class TestNewConversionBase64(unittest.TestCase):
+    """Test ConvertIO.new_conversion with a streamed base64 file"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = pathlib.Path(self.directory.name, "file.bin")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_new_conversion_path(self):
+        """test local file is base64-encoded into the request"""
+        self.path.write_bytes(b"_FILE_CONTENT_")
+        fake = FakeConvertIO()
+        with client.ConvertIO(api_key="test", transport=fake.transport()) as convertio_client:
+            conversion = convertio_client.new_conversion(
+                payload=parameters.NewConversionParameters(
+                    file=self.path, filename="file.bin", outputformat="pdf", input="base64"
+                )
+            )
+
+        self.assertIsInstance(conversion, responses.NewConversionResponse)
+        self.assertEqual(fake.conversions[conversion.data.id].content, b"_FILE_CONTENT_")
+
+    def test_new_conversion_bounded_memory(self):
+        """test peak memory doesn't grow with the file size"""
+        size = 64 * 1024 * 1024
+        with open(self.path, "wb") as file:
+            file.truncate(size)
+        transport = CountingTransport()
+
+        tracemalloc.start()
+        try:
+            with client.ConvertIO(api_key="test", transport=transport) as convertio_client:
+                convertio_client.new_conversion(
+                    payload=parameters.NewConversionParameters(
+                        file=self.path, filename="file.bin", outputformat="pdf", input="base64"
+                    )
+                )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(transport.received, int(transport.headers["Content-Length"]))
+        self.assertGreater(transport.received, size * 4 // 3)
+        self.assertLess(peak, 8 * 1024 * 1024)
+
+
+class TestDirectFileUpload(unittest.TestCase):
+    """Test ConvertIO.direct_file_upload"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, "file.bin")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_upload_path(self):
+        """test local file is uploaded to the fake API"""
+        with open(self.path, "wb") as file:
+            file.write(b"_FILE_CONTENT_")
+        fake = FakeConvertIO()
+        with client.ConvertIO(api_key="test", transport=fake.transport()) as convertio_client:
+            conversion = convertio_client.new_conversion(
+                payload=parameters.NewConversionParameters(
+                    file="", filename="file.bin", outputformat="pdf", input="upload"
+                )
+            )
+            response = convertio_client.direct_file_upload(
+                payload=parameters.DirectFileParameters(
+                    id=conversion.data.id,
+                    filename="file.bin",
+                    file=self.path
+                )
+            )
+
+        self.assertIsInstance(response, responses.DirectFileResponse)
+        self.assertEqual(response.data.size, "14")
+        self.assertEqual(fake.conversions[conversion.data.id].content, b"_FILE_CONTENT_")
+
+    def test_upload_bounded_memory(self):
+        """test peak memory doesn't grow with the file size"""
+        size = 64 * 1024 * 1024
+        with open(self.path, "wb") as file:
+            file.truncate(size)
+        transport = CountingTransport()
+        progress = []
+
+        tracemalloc.start()
+        try:
+            with client.ConvertIO(api_key="test", transport=transport) as convertio_client:
+                convertio_client.direct_file_upload(
+                    payload=parameters.DirectFileParameters(id="abc", filename="file.bin",
+                                                            file=self.path),
+                    chunk_size=256 * 1024,
+                    progress=lambda sent, total: progress.append(sent)
+                )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(transport.received, size)
+        self.assertEqual(transport.headers["Content-Length"], str(size))
+        self.assertEqual(progress[-1], size)
+        self.assertLess(peak, 4 * 1024 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()